@@ -0,0 +1,205 @@
+# vim: set ts=8 sw=4 sts=4 et ai tw=79:
+"""
+OXXA API Library in Python (oxxapy), licensed under the LGPLv3+.
+
+Copyright (C) 2021 Walter Doekes, OSSO B.V.
+
+See README.rst for more info.
+
+------------------------------------------------------------------------
+
+End-to-end throughput of the execution models, against the simulator
+
+Usage (from the repository root):
+
+    python3 -m benchmarks.bench_concurrency [--count 200] [--workers 8]
+        [--latency 0.02,0.1] [--output bench_concurrency.json]
+
+The same workloads (hydrate, autorenew and check, --count calls each)
+are run:
+- sequential: one Oxxapy, one call after another;
+- threaded: one Oxxapy shared by a ThreadPoolExecutor;
+- bulk: OxxapyBulkJob (bounded in-flight items, failures collected);
+- pooled: an OxxapyAccountPool instance (fair scheduler in front of
+  the shared transport).
+
+There is no asyncio interface; the threads above are the concurrent
+paths the library offers.
+
+The simulator runs in a separate process with a seeded lognormal
+latency, so the reported CPU time is that of the client alone. The
+numbers in benchmarks/results/ were made with the defaults.
+"""
+import json
+import platform
+import subprocess
+import sys
+from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from threading import Lock
+from time import perf_counter, process_time
+
+from oxxapy import Oxxapy, OxxapyAccountPool
+from oxxapy.bulk import OxxapyBulkJob
+from oxxapy.transport import OxxapyHttpTransport
+
+USERNAME = 'BENCH'
+PASSWORD = 'MD57a95bf926a0333f57705aeac07a362a2'
+
+MODES = ('sequential', 'threaded', 'bulk', 'pooled')
+
+
+def start_simulator(domains, latency, seed):
+    "Start the simulator in a subprocess; return (process, url)"
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'oxxapy.simulator', '--port', '0',
+         '--domains', str(domains), '--latency', latency,
+         '--seed', str(seed)],
+        stdout=subprocess.PIPE, universal_newlines=True)
+    line = process.stdout.readline()
+    return process, line.rsplit(' ', 1)[-1].strip()
+
+
+def workloads(count):
+    "Yield (name, items, func(api, item))"
+    # The simulated portfolio has domain000000.be .. domainNNNNNN.org.
+    names = [
+        f'domain{num:06d}.{("be", "com", "de", "eu", "nl", "org")[num % 6]}'
+        for num in range(count)]
+    yield 'hydrate', names, (
+        lambda api, name: api.domains.get(name)._update())
+    yield 'autorenew', [(name, num % 2 == 0) for num, name in enumerate(
+        names)], (lambda api, item: api.domains.get(item[0]).set_autorenew(
+            item[1]))
+    candidates = [
+        (name if num % 2 else f'free{num:06d}.nl')
+        for num, name in enumerate(names)]
+    yield 'check', candidates, (
+        lambda api, name: api.domains.get(name).is_free())
+
+
+def percentile(sorted_values, pct):
+    idx = min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100.0))
+    return sorted_values[idx]
+
+
+def run_mode(mode, url, items, func, workers):
+    "Return (latencies, connections_opened)"
+    latencies = []
+    lock = Lock()
+
+    def timed(api, item):
+        t0 = perf_counter()
+        func(api, item)
+        elapsed = perf_counter() - t0
+        with lock:
+            latencies.append(elapsed)
+
+    if mode == 'sequential':
+        api = Oxxapy(USERNAME, PASSWORD, api_url=url)
+        for item in items:
+            timed(api, item)
+    elif mode == 'threaded':
+        api = Oxxapy(
+            USERNAME, PASSWORD, api_url=url,
+            transport=OxxapyHttpTransport(max_idle=workers))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for future in [
+                    executor.submit(timed, api, item) for item in items]:
+                future.result()
+    elif mode == 'bulk':
+        api = Oxxapy(
+            USERNAME, PASSWORD, api_url=url,
+            transport=OxxapyHttpTransport(max_idle=workers))
+        result = OxxapyBulkJob(workers=workers).run(
+            items, (lambda item: timed(api, item)), key=str)
+        assert not result.failed, result
+    elif mode == 'pooled':
+        pool = OxxapyAccountPool(max_concurrency=workers, api_url=url)
+        pool.add('bench', USERNAME, PASSWORD)
+        api = pool['bench']
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for future in [
+                    executor.submit(timed, api, item) for item in items]:
+                future.result()
+    else:
+        raise ValueError(mode)
+
+    api.close()
+    return latencies, api._transport.connections_opened
+
+
+def run(count, workers, url, output=sys.stdout):
+    results = []
+    output.write(
+        '{:10s} {:10s} {:>8s} {:>8s} {:>8s} {:>8s} {:>6s} {:>8s}\n'.format(
+            'workload', 'mode', 'calls/s', 'p50 ms', 'p95 ms', 'p99 ms',
+            'conns', 'cpu s'))
+    for workload, items, func in workloads(count):
+        for mode in MODES:
+            cpu0, t0 = process_time(), perf_counter()
+            latencies, connections = run_mode(
+                mode, url, items, func, workers)
+            wall, cpu = perf_counter() - t0, process_time() - cpu0
+            latencies.sort()
+            result = {
+                'workload': workload, 'mode': mode, 'calls': len(items),
+                'workers': (1 if mode == 'sequential' else workers),
+                'seconds': wall, 'calls_per_sec': len(items) / wall,
+                'p50_ms': percentile(latencies, 50) * 1000,
+                'p95_ms': percentile(latencies, 95) * 1000,
+                'p99_ms': percentile(latencies, 99) * 1000,
+                'connections_opened': connections, 'cpu_seconds': cpu}
+            results.append(result)
+            output.write(
+                '{workload:10s} {mode:10s} {calls_per_sec:8.1f} '
+                '{p50_ms:8.1f} {p95_ms:8.1f} {p99_ms:8.1f} '
+                '{connections_opened:6d} {cpu_seconds:8.3f}\n'.format(
+                    **result))
+            output.flush()
+    return results
+
+
+def main():
+    parser = ArgumentParser(
+        description='Compare sequential, threaded and pooled API calls.')
+    parser.add_argument(
+        '--count', type=int, default=200,
+        help='calls per workload and mode (default: %(default)s)')
+    parser.add_argument(
+        '--workers', type=int, default=8,
+        help='threads for the concurrent modes (default: %(default)s)')
+    parser.add_argument(
+        '--latency', default='0.02,0.1',
+        help='simulated MEDIAN,P99 latency in seconds '
+             '(default: %(default)s)')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument(
+        '--output', default='bench_concurrency.json',
+        help='JSON results file (default: %(default)s)')
+    args = parser.parse_args()
+
+    process, url = start_simulator(args.count, args.latency, args.seed)
+    try:
+        results = run(args.count, args.workers, url)
+    finally:
+        process.terminate()
+        process.wait()
+
+    with open(args.output, 'w') as fp:
+        json.dump({
+            'benchmark': 'concurrency',
+            'date': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'machine': platform.machine(),
+            'count': args.count, 'workers': args.workers,
+            'latency': args.latency, 'seed': args.seed,
+            'results': results,
+        }, fp, indent=2)
+        fp.write('\n')
+
+
+if __name__ == '__main__':
+    main()
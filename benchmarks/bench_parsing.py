@@ -0,0 +1,194 @@
+# vim: set ts=8 sw=4 sts=4 et ai tw=79:
+"""
+OXXA API Library in Python (oxxapy), licensed under the LGPLv3+.
+
+Copyright (C) 2021 Walter Doekes, OSSO B.V.
+
+See README.rst for more info.
+
+------------------------------------------------------------------------
+
+Parsing and listing throughput on synthetic portfolios
+
+Usage (from the repository root):
+
+    python3 -m benchmarks.bench_parsing [--sizes 1000,10000,100000]
+        [--repeat 3] [--output bench_output.json]
+
+For every portfolio size, the steps between receiving the XML and
+having usable objects are timed separately. One op is one domain (or
+one hydrated domain for domain_inf), except for extract_order, which
+does not depend on the size: there one op is one call. The local
+identity search (as many identities as domains) counts one op per
+lookup. The time is the best of --repeat runs; the peak memory is
+measured in an extra run with tracemalloc enabled, so it does not slow
+down the timed runs.
+"""
+import gc
+import json
+import platform
+import sys
+import tracemalloc
+from argparse import ArgumentParser
+from datetime import datetime
+from itertools import islice
+from time import perf_counter
+
+from oxxapy import Oxxapy
+from oxxapy.core import OxxapyRequest
+from oxxapy.domain import OxxapyDomain
+from oxxapy.response import OxxapyResponse
+
+from .synthetic import (
+    domain_inf_xml, domain_list_xml, identity_list_xml, nsgroup_list_xml)
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+
+# Hydrating is one call per domain; this many is enough for a rate.
+HYDRATE_DOMAINS = 1000
+
+# A single extract_order() is too quick to time; time this many.
+EXTRACT_CALLS = 1000
+
+# Identity searches per run: half prefix lookups, half misspelt (fuzzy).
+SEARCH_LOOKUPS = 200
+
+
+class OxxapyFromBytes(Oxxapy):
+    """
+    OXXA API interface that answers from prepared XML
+
+    Everything above the transport is done like a real call: metrics,
+    parsing, building and caching.
+    """
+    def __init__(self, responses):
+        super().__init__('BENCH', 'MD57a95bf926a0333f57705aeac07a362a2')
+        self._responses = responses
+
+    def _xmlcall(self, command, **params):
+        req = OxxapyRequest(self._apiurl, command, params)
+        return OxxapyResponse.from_binstr(
+            self._responses[command], req).extract_order()
+
+
+def measure(func, repeat):
+    "Return (best seconds, peak bytes) of calling func()"
+    best = None
+    for i in range(repeat):
+        gc.collect()
+        t0 = perf_counter()
+        func()
+        elapsed = perf_counter() - t0
+        if best is None or elapsed < best:
+            best = elapsed
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return best, peak
+
+
+def benchmarks(size):
+    "Yield (name, ops, func) for a portfolio of size domains"
+    binxml = domain_list_xml(size)
+    responses = {
+        'domain_list': binxml,
+        'domain_inf': domain_inf_xml(0),
+        'identity_list': identity_list_xml(),
+        'nsgroup_list': nsgroup_list_xml(),
+    }
+    req = OxxapyRequest(
+        'https://BENCH/command.php', 'domain_list', {'records': -1})
+    response = OxxapyResponse.from_binstr(binxml, req)
+    xml_domains = response.extract_order().get_child(
+        'details').get_children('domain')
+
+    yield 'from_binstr', size, (
+        lambda: OxxapyResponse.from_binstr(binxml, req))
+    # Unwrapping the order does not depend on the size: one op is one
+    # call. Wrapping the domain elements does.
+    order = response.extract_order()
+    yield 'extract_order', EXTRACT_CALLS, (
+        lambda: [response.extract_order() for i in range(EXTRACT_CALLS)])
+    yield 'get_children', size, (
+        lambda: order.get_child('details').get_children('domain'))
+    yield 'domain_from_xml', size, (
+        lambda: [OxxapyDomain.from_xml(None, xml) for xml in xml_domains])
+    yield 'domains_filter', size, (
+        lambda: list(OxxapyFromBytes(responses).domains.all()))
+
+    def resolve():
+        api = OxxapyFromBytes(responses)
+        api.identities.all()
+        api.nsgroups.all()
+        for domain in api.domains.all():
+            (domain.reg_c, domain.admin_c, domain.tech_c, domain.bill_c,
+             domain.nsgroup)
+    yield 'resolve_contacts', size, resolve
+
+    api = OxxapyFromBytes(responses)
+    domains = list(islice(api.domains.all(), HYDRATE_DOMAINS))
+    yield 'domain_inf_hydrate', len(domains), (
+        lambda: [domain._update() for domain in domains])
+
+    api = OxxapyFromBytes(dict(
+        responses, identity_list=identity_list_xml(size)))
+    api.identities.search('alias0')  # lists and indexes them
+    queries = [
+        query for num in range(SEARCH_LOOKUPS // 2)
+        for query in (f'alias{num}', f'lastnmae{num}')]
+    yield 'identity_search', len(queries), (
+        lambda: [api.identities.search(query) for query in queries])
+
+
+def run(sizes, repeat, output=sys.stdout):
+    results = []
+    output.write('{:>8s}  {:20s} {:>12s} {:>12s} {:>10s}\n'.format(
+        'size', 'benchmark', 'ops/sec', 'seconds', 'peak MiB'))
+    for size in sizes:
+        for name, ops, func in benchmarks(size):
+            seconds, peak = measure(func, repeat)
+            results.append({
+                'size': size, 'benchmark': name, 'ops': ops,
+                'seconds': seconds, 'ops_per_sec': ops / seconds,
+                'peak_bytes': peak})
+            output.write('{:8d}  {:20s} {:12.0f} {:12.4f} {:10.1f}\n'.format(
+                size, name, ops / seconds, seconds, peak / 1048576.0))
+            output.flush()
+    return results
+
+
+def main():
+    parser = ArgumentParser(
+        description='Time OXXA XML parsing and listing on synthetic data.')
+    parser.add_argument(
+        '--sizes', default=','.join(str(i) for i in DEFAULT_SIZES),
+        help='comma separated portfolio sizes (default: %(default)s)')
+    parser.add_argument(
+        '--repeat', type=int, default=3,
+        help='timed runs per benchmark, best is kept (default: 3)')
+    parser.add_argument(
+        '--output', default='bench_output.json',
+        help='JSON results file (default: %(default)s)')
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    results = run(sizes, args.repeat)
+    with open(args.output, 'w') as fp:
+        json.dump({
+            'benchmark': 'parsing',
+            'date': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'machine': platform.machine(),
+            'results': results,
+        }, fp, indent=2)
+        fp.write('\n')
+
+
+if __name__ == '__main__':
+    main()
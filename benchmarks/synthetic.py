@@ -0,0 +1,146 @@
+# vim: set ts=8 sw=4 sts=4 et ai tw=79:
+"""
+OXXA API Library in Python (oxxapy), licensed under the LGPLv3+.
+
+Copyright (C) 2021 Walter Doekes, OSSO B.V.
+
+See README.rst for more info.
+
+------------------------------------------------------------------------
+
+Synthetic OXXA API responses for the benchmarks
+
+The XML has the exact shape of the real API responses (see
+assets/oxxa-api-v1.99.txt and tests/bogo_oxxapy.py), so the parser
+and the builders do the same work as they would in production. The
+output is deterministic for the same arguments.
+"""
+from datetime import date, timedelta
+from random import Random
+
+TLDS = ('nl', 'com', 'org', 'eu', 'be', 'de')
+
+_ORDER = '''\
+<?xml version="1.0" encoding="UTF-8"?>
+<channel>
+  <order>
+    <order_id>{order_id}</order_id><command>{command}</command>
+    <status_code>{status_code}</status_code>
+    <status_description>In DETAILS vind u de uitgebreide
+      informatie</status_description>
+    <price>0.00</price>
+    <details>
+{details}
+    </details>
+    <order_complete>TRUE</order_complete><done>TRUE</done>
+  </order>
+</channel>
+'''
+
+_DOMAIN = '''\
+      <domain>
+        <domainname>{name}</domainname><nsgroup>{nsgroup}</nsgroup>
+        <identity-registrant>{reg_c}</identity-registrant>
+        <identity-admin>{admin_c}</identity-admin>
+        <identity-tech>{tech_c}</identity-tech>
+        <identity-billing>{bill_c}</identity-billing>
+        <expire_date>{expire_date}</expire_date><autorenew>{autorenew}\
+</autorenew>
+      </domain>'''
+
+_IDENTITY = '''\
+      <identity>
+        <handle>{handle}</handle>
+        <alias>{alias}</alias>
+        <company_name>{company_name}</company_name>
+        <name>{name}</name>
+      </identity>'''
+
+_NSGROUP = '''\
+      <nsgroup>
+        <handle>{handle}</handle>
+        <alias>{alias}</alias>
+        <nameservers>
+          <ns1_fqdn>ns1.{alias}.example</ns1_fqdn>
+          <ns2_fqdn>ns2.{alias}.example</ns2_fqdn>
+          <ns3_fqdn>ns3.{alias}.example</ns3_fqdn>
+        </nameservers>
+      </nsgroup>'''
+
+
+def identity_handle(num):
+    return f'IDEN{num:05d}'
+
+
+def nsgroup_handle(num):
+    return f'NSGR{num:05d}'
+
+
+def domain_name(num):
+    return f'bench{num:06d}.{TLDS[num % len(TLDS)]}'
+
+
+def _order(command, status_code, details):
+    return _ORDER.format(
+        order_id=173714200, command=command, status_code=status_code,
+        details='\n'.join(details)).encode('utf-8')
+
+
+def domain_list_xml(domains, identities=500, nsgroups=20, seed=1):
+    "Return a domain_list response with domains domains"
+    rnd = Random(seed)
+    first_expiry = date(2022, 1, 1)
+    details = [
+        f'      <domains_total>{domains}</domains_total>'
+        f'<domains_found>{domains}</domains_found>']
+    for num in range(domains):
+        owner = identity_handle(rnd.randrange(identities))
+        contact = identity_handle(rnd.randrange(identities))
+        expiry = first_expiry + timedelta(days=rnd.randrange(365))
+        details.append(_DOMAIN.format(
+            name=domain_name(num),
+            nsgroup=nsgroup_handle(rnd.randrange(nsgroups)),
+            reg_c=owner, admin_c=contact, tech_c=contact, bill_c=contact,
+            expire_date=expiry.isoformat(),
+            autorenew=('Y' if rnd.random() < 0.9 else 'N')))
+    return _order('domain_list', 'XMLOK18', details)
+
+
+def identity_list_xml(identities=500):
+    "Return an identity_list response with identities identities"
+    details = [
+        f'      <identities_total>{identities}</identities_total>'
+        f'<identities_found>{identities}</identities_found>']
+    for num in range(identities):
+        details.append(_IDENTITY.format(
+            handle=identity_handle(num), alias=f'alias{num}',
+            company_name=f'Company {num} B.V.',
+            name=f'Lastname{num}, Firstname{num}'))
+    return _order('identity_list', 'XMLOK 22', details)
+
+
+def nsgroup_list_xml(nsgroups=20):
+    "Return an nsgroup_list response with nsgroups nsgroups"
+    details = [
+        f'      <nsgroups_total>{nsgroups}</nsgroups_total>'
+        f'<nsgroups_found>{nsgroups}</nsgroups_found>']
+    for num in range(nsgroups):
+        details.append(_NSGROUP.format(
+            handle=nsgroup_handle(num), alias=f'dns{num}'))
+    return _order('nsgroup_list', 'XMLOK 24', details)
+
+
+def domain_inf_xml(num, identities=500, nsgroups=20):
+    "Return a domain_inf response for domain_name(num)"
+    details = [
+        f'      <identity-registrant>{identity_handle(num % identities)}'
+        f'</identity-registrant>',
+        f'      <identity-admin>{identity_handle(0)}</identity-admin>',
+        f'      <identity-billing>{identity_handle(0)}</identity-billing>',
+        f'      <identity-tech>{identity_handle(0)}</identity-tech>',
+        '      <identity-reseller></identity-reseller>',
+        f'      <nsgroup>{nsgroup_handle(num % nsgroups)}</nsgroup>',
+        '      <expire_date>25-11-2022</expire_date>',
+        '      <autorenew>Y</autorenew>',
+        '      <dnssec>N</dnssec>']
+    return _order('domain_inf', 'XMLOK 7', details)
@@ -7,10 +7,12 @@ Copyright (C) 2021 Walter Doekes, OSSO B.V.
 
 BEWARE: This script is subject to change. Its interface is NOT stable.
 """
+import csv
 import os
 import sys
 
 from oxxapy import Oxxapy
+from oxxapy.core import API_URL
 
 
 def transfer_domain(api, domain, transfer_key, registrant, admin, tech,
@@ -92,8 +94,42 @@ def transfer_domain(api, domain, transfer_key, registrant, admin, tech,
         raise NotImplementedError(cart_purchase_obj.status)
 
 
+def transfer_bulk(api, fp, enduserip, workers=4):
+    """
+    Transfer all domains from the CSV file at once, through the cart
+
+    enduserip is the IP address of the end user, required by the API.
+
+    The CSV needs a header with these columns (reseller may be empty):
+
+        domain,epp,reg_c,admin_c,tech_c,bill_c,nsgroup,reseller
+        example.nl,S3cr3t,VQ0000000,VQ0000000,MH0000000,MH0000000,RG000000,
+    """
+    orders = (
+        dict((key, value.strip()) for key, value in row.items()
+             if value and value.strip())
+        for row in csv.DictReader(fp))
+    result = api.cart.bulk_order(orders, enduserip, producttype='transfer',
+                                 workers=workers)
+    for name, outcome in sorted(result.outcomes.items()):
+        print(name, outcome.status, outcome.code or '', outcome.message or '')
+    print(result)
+    return result
+
+
 def main():
-    api = Oxxapy(os.environ['OXXAPY_USER'], os.environ['OXXAPY_PASS'])
+    if '--profile' in sys.argv:
+        # Report time per layer (network, parse, ...) at exit. Setting
+        # OXXAPY_PROFILE=1 in the environment does the same.
+        from oxxapy import profiling
+        sys.argv.remove('--profile')
+        profiling.enable()
+
+    # Set OXXAPY_URL to use a different endpoint, like the simulator:
+    # python3 -m oxxapy.simulator
+    api = Oxxapy(
+        os.environ['OXXAPY_USER'], os.environ['OXXAPY_PASS'],
+        api_url=os.environ.get('OXXAPY_URL', API_URL))
 
     if sys.argv[1:] == ['id', 'ls']:
         for obj in sorted(api.identities.all(), key=(lambda x: x.alias)):
@@ -122,11 +158,23 @@ def main():
             reseller=api.resellers.get(sys.argv[8]),
             nsgroup=api.nsgroups.get(sys.argv[9]))
 
+    elif sys.argv[1:2] == ['transfer-bulk']:
+        assert len(sys.argv) == 4, ('csvfile|-', 'enduserip', sys.argv[2:])
+        if sys.argv[2] == '-':
+            result = transfer_bulk(api, sys.stdin, sys.argv[3])
+        else:
+            with open(sys.argv[2], newline='') as fp:
+                result = transfer_bulk(api, fp, sys.argv[3])
+        if result.failed:
+            exit(1)
+
     else:
         print('List identities:  id ls')
         print('List nameservers: ns ls')
         print('List resellers:   rsl ls')
         print('Transfer:         transfer ...')
+        print('Transfer many:    transfer-bulk CSVFILE ENDUSERIP')
+        print('Add --profile to get a timing report at exit.')
         print('Check the source for more help.')
         exit(1)
 
@@ -64,10 +64,14 @@ Example API call response:
   </channel>
 
 """
+from .cart import OxxapyCart
 from .core import OxxapyCore
+from .dns import OxxapyDns
 from .domain import OxxapyDomains
 from .identity import OxxapyIdentities
 from .nsgroup import OxxapyNsgroups
+from .order import OxxapyOrders
+from .pool import OxxapyAccountPool  # noqa: F401 (re-export)
 from .reseller import OxxapyResellers
 
 
@@ -90,9 +94,12 @@ class Oxxapy(OxxapyCore):
     But remember that the return value (OxxapyOrder) might not not be
     very stable yet.
     """
+    cart = OxxapyCart.as_property()
+    dns = OxxapyDns.as_property()
     domains = OxxapyDomains.as_property()
     identities = OxxapyIdentities.as_property()
     nsgroups = OxxapyNsgroups.as_property()
+    orders = OxxapyOrders.as_property()
     resellers = OxxapyResellers.as_property()
 
     def raw(self, command, **params):
@@ -0,0 +1,139 @@
+# vim: set ts=8 sw=4 sts=4 et ai tw=79:
+"""
+OXXA API Library in Python (oxxapy), licensed under the LGPLv3+.
+
+Copyright (C) 2021 Walter Doekes, OSSO B.V.
+
+See README.rst for more info.
+"""
+from collections import OrderedDict, deque
+from threading import Lock
+from time import monotonic
+
+from .exceptions import OxxapyCircuitOpenError, OxxapyTransportError
+
+
+class OxxapyCircuitBreaker:
+    """
+    Stops calling the API while it is failing
+
+    CLOSED: calls go through. After max_consecutive transport errors in
+    a row, or when at least max_error_rate of the last window calls
+    failed, the circuit opens.
+
+    OPEN: calls fail immediately with OxxapyCircuitOpenError, unless a
+    stale answer for the same read-only call is available. After
+    reset_timeout seconds the circuit goes half-open.
+
+    HALF_OPEN: at most probes calls are let through. A success closes
+    the circuit, a failure opens it again.
+
+    Only OxxapyTransportError counts as failure: an XMLERR is a valid
+    answer from a working API.
+    """
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half-open'
+
+    def __init__(self, max_consecutive=5, max_error_rate=0.5, window=20,
+                 reset_timeout=30, probes=1, max_stale=1000):
+        self.max_consecutive = max_consecutive
+        self.max_error_rate = max_error_rate
+        self.reset_timeout = reset_timeout
+        self.probes = probes
+        self.max_stale = max_stale
+
+        self.state = self.CLOSED
+        self._window = deque(maxlen=window)  # 1 if failed, else 0
+        self._consecutive = 0
+        self._opened_at = None
+        self._probing = 0
+        self._stale = OrderedDict()
+        self._lock = Lock()
+
+    def call(self, req, func, stale_key=None):
+        """
+        Call func() if the circuit allows it
+
+        If stale_key is set, a successful result is remembered, and
+        returned instead of failing while the circuit is open.
+        """
+        try:
+            probe = self._acquire(req)
+        except OxxapyCircuitOpenError:
+            stale = self._get_stale(stale_key)
+            if stale is None:
+                raise
+            return stale
+
+        try:
+            ret = func()
+        except OxxapyTransportError as e:
+            if isinstance(e, OxxapyCircuitOpenError):
+                raise
+            self._record(False, probe)
+            raise
+        except Exception:
+            self._release(probe)
+            raise
+        self._record(True, probe)
+        self._set_stale(stale_key, ret)
+        return ret
+
+    def _acquire(self, req):
+        with self._lock:
+            if self.state == self.OPEN:
+                if monotonic() - self._opened_at < self.reset_timeout:
+                    raise OxxapyCircuitOpenError(
+                        0, 'circuit open', req=req, binresp=b'')
+                self.state = self.HALF_OPEN
+                self._probing = 0
+            if self.state == self.HALF_OPEN:
+                if self._probing >= self.probes:
+                    raise OxxapyCircuitOpenError(
+                        0, 'circuit half-open', req=req, binresp=b'')
+                self._probing += 1
+                return True
+            return False
+
+    def _release(self, probe):
+        if probe:
+            with self._lock:
+                self._probing -= 1
+
+    def _record(self, success, probe):
+        with self._lock:
+            if probe:
+                self._probing -= 1
+            if success:
+                self._consecutive = 0
+                if probe:
+                    self.state = self.CLOSED
+                    self._window.clear()
+                self._window.append(0)
+                return
+
+            self._consecutive += 1
+            self._window.append(1)
+            if probe or self._consecutive >= self.max_consecutive or (
+                    len(self._window) == self._window.maxlen and
+                    sum(self._window) >= (
+                        self.max_error_rate * len(self._window))):
+                self.state = self.OPEN
+                self._opened_at = monotonic()
+
+    def _get_stale(self, key):
+        if key is None:
+            return None
+        with self._lock:
+            return self._stale.get(key)
+
+    def _set_stale(self, key, value):
+        if key is None or not self.max_stale:
+            return
+        with self._lock:
+            self._stale[key] = value
+            self._stale.move_to_end(key)
+            while len(self._stale) > self.max_stale:
+                self._stale.popitem(last=False)
+
+    def __repr__(self):
+        return f'<OxxapyCircuitBreaker({self.state})>'
@@ -0,0 +1,325 @@
+# vim: set ts=8 sw=4 sts=4 et ai tw=79:
+"""
+OXXA API Library in Python (oxxapy), licensed under the LGPLv3+.
+
+Copyright (C) 2021 Walter Doekes, OSSO B.V.
+
+See README.rst for more info.
+"""
+import json
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextvars import copy_context
+from datetime import datetime
+from time import monotonic, sleep
+
+from .diagnostics import bulk_calls
+from .exceptions import (
+    OxxapyDeadlineExceeded, OxxapyError, OxxapyTransactionError)
+from .tracing import bind_span
+
+# > <status_code>XMLERR 76</status_code>
+# > <status_description>
+# >   Domeinnaam reeds ingesteld met dit tech profiel
+# > </status_description>
+ALREADY_DONE_CODES = (76,)
+
+
+class OxxapyJournal:
+    """
+    Append-only JSON-lines file with the outcome of every bulk item
+
+    Every line looks like:
+
+        {"key": "example.nl", "status": "ok", "code": null, "message": null,
+         "time": "2021-08-11T12:34:56"}
+
+    Only the keys of the completed items are kept in memory.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.done = set()
+        self._load()
+        self._fp = open(path, 'a', encoding='utf-8')
+
+    def _load(self):
+        try:
+            fp = open(self.path, encoding='utf-8')
+        except FileNotFoundError:
+            return
+        with fp:
+            for line in fp:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Half written line from a crash; it will be redone.
+                    continue
+                if record['status'] == 'ok':
+                    self.done.add(record['key'])
+                else:
+                    self.done.discard(record['key'])
+
+    def write(self, key, status, code=None, message=None):
+        self._fp.write(json.dumps({
+            'key': key, 'status': status, 'code': code, 'message': message,
+            'time': datetime.now().isoformat(timespec='seconds'),
+        }) + '\n')
+        self._fp.flush()
+        if status == 'ok':
+            self.done.add(key)
+
+    def close(self):
+        self._fp.close()
+
+
+class OxxapyBulkResult:
+    "Counters of a bulk run, plus the most recent failures"
+    def __init__(self, keep_failures=100, total=None):
+        self.ok = 0
+        self.skipped = 0
+        self.failed = 0
+        self.failures = deque(maxlen=keep_failures)  # (key, code, message)
+        self.total = total  # number of items, if known
+        self.started = monotonic()
+
+    @property
+    def rate(self):
+        "Return the completed (not skipped) items per second"
+        elapsed = monotonic() - self.started
+        return (self.ok + self.failed) / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def eta(self):
+        "Return the estimated seconds left, or None if unknown"
+        rate = self.rate
+        if self.total is None or not rate:
+            return None
+        return (self.total - self.ok - self.failed - self.skipped) / rate
+
+    def summary(self):
+        "Return a progress line, like '120/800 done, 4.0/s, ETA 170s'"
+        done = self.ok + self.failed + self.skipped
+        total = '?' if self.total is None else self.total
+        eta = '?' if self.eta is None else f'{self.eta:.0f}s'
+        return (
+            f'{done}/{total} done ({self.failed} failed), '
+            f'{self.rate:.1f}/s, ETA {eta}')
+
+    def __repr__(self):
+        return (
+            f'<OxxapyBulkResult(ok={self.ok}, skipped={self.skipped}, '
+            f'failed={self.failed})>')
+
+
+class OxxapyBulkJob:
+    """
+    Run a mutation on many items concurrently, journaling every outcome
+
+    Example:
+
+        job = OxxapyBulkJob(journal='autorenew.journal', workers=4)
+        result = job.run(domains, (lambda domain: (
+            domain.set_autorenew(True))))
+
+    When restarted with the same journal, items that completed before
+    are skipped. A transaction error with one of the already_done codes
+    (XMLERR 76: "reeds ingesteld") counts as completed. Any other
+    exception fails the item only; non-API errors get code None.
+
+    Items are pulled from the iterable lazily and only a small number
+    of them is in flight at once, so memory use does not grow with the
+    number of items.
+
+    With max_rate, at most that many items per second are started. If
+    progress is set, it is called with the OxxapyBulkResult every
+    progress_every seconds and at the end (see its summary()).
+    """
+    def __init__(self, journal=None, workers=4,
+                 already_done=ALREADY_DONE_CODES, max_rate=None,
+                 progress=None, progress_every=10.0):
+        self.journal = journal
+        self.workers = workers
+        self.already_done = already_done
+        self.max_rate = max_rate
+        self.progress = progress
+        self.progress_every = progress_every
+
+    def run(self, items, func, key=(lambda item: item.name), skip=None):
+        """
+        Call func(item) for all items; return OxxapyBulkResult
+
+        Items for which skip(item) is true are counted as skipped, like
+        the items that are done according to the journal.
+        """
+        journal = self.journal
+        if isinstance(journal, str):
+            journal = OxxapyJournal(journal)
+        try:
+            return self._run(journal, items, func, key, skip)
+        finally:
+            if journal is not self.journal:
+                journal.close()
+
+    def _run(self, journal, items, func, key, skip):
+        result = OxxapyBulkResult(
+            total=(len(items) if hasattr(items, '__len__') else None))
+        func = bind_span(func)
+        unfinished = []
+        items = iter(items)
+        pending = {}
+        exhausted = False
+        next_start = next_progress = monotonic()
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            while True:
+                delay = None
+                while not unfinished and len(pending) < self.workers * 2:
+                    if self.max_rate:
+                        delay = next_start - monotonic()
+                        if delay > 0:
+                            break
+                    try:
+                        item = next(items)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    item_key = key(item)
+                    if (journal is not None and item_key in journal.done) or (
+                            skip is not None and skip(item)):
+                        result.skipped += 1
+                        continue
+                    # In the context of the caller, for its api.deadline().
+                    future = executor.submit(
+                        copy_context().run, _worker_call, func, item)
+                    pending[future] = item_key
+                    if self.max_rate:
+                        next_start = max(next_start, monotonic()) + (
+                            1.0 / self.max_rate)
+
+                if not pending:
+                    if exhausted or unfinished:
+                        break
+                    sleep(delay)  # throttled
+                    continue
+
+                finished, _ = wait(
+                    pending, timeout=(delay if delay and delay > 0 else None),
+                    return_when=FIRST_COMPLETED)
+                for future in finished:
+                    item_key = pending.pop(future)
+                    try:
+                        future.result()
+                    except OxxapyDeadlineExceeded:
+                        unfinished.append(item_key)
+                    except OxxapyTransactionError as e:
+                        if e.args[0] in self.already_done:
+                            self._ok(journal, result, item_key, e.args[0])
+                        else:
+                            self._failed(
+                                journal, result, item_key, e.args[0],
+                                e.args[1])
+                    except OxxapyError as e:
+                        self._failed(
+                            journal, result, item_key, e.args[0], e.args[1])
+                    except Exception as e:
+                        # A bug or a bad item (TypeError, ...) only fails
+                        # this item; the others are still journaled.
+                        self._failed(
+                            journal, result, item_key, None,
+                            f'{type(e).__name__}: {e}')
+                    else:
+                        self._ok(journal, result, item_key)
+
+                if self.progress is not None and (
+                        monotonic() >= next_progress):
+                    self.progress(result)
+                    next_progress = monotonic() + self.progress_every
+
+        if unfinished:
+            for item in items:
+                item_key = key(item)
+                if journal is None or item_key not in journal.done:
+                    unfinished.append(item_key)
+            raise OxxapyDeadlineExceeded(
+                'deadline exceeded during bulk job', unfinished)
+        if self.progress is not None:
+            self.progress(result)
+        return result
+
+    def _ok(self, journal, result, key, code=None):
+        result.ok += 1
+        if journal is not None:
+            journal.write(key, 'ok', code=code)
+
+    def _failed(self, journal, result, key, code, message):
+        # Keep only the code and message; the exception references the
+        # entire request and response.
+        result.failed += 1
+        result.failures.append((key, code, message))
+        if journal is not None:
+            journal.write(key, 'failed', code=code, message=message)
+
+
+def _worker_call(func, item):
+    "Call func(item) in a worker thread, in a copy of the caller context"
+    with bulk_calls():
+        return func(item)
+
+
+def concurrent_map(func, items, workers=4, max_rate=None):
+    """
+    Call func(item) for all items concurrently; yield (item, result, error)
+
+    The tuples are yielded as the calls complete, not in input order.
+    On an OxxapyError, result is None and error is the exception; other
+    exceptions are raised. Like OxxapyBulkJob, only a small number of
+    items is in flight at once, and with max_rate at most that many
+    items per second are started. Closing the generator cancels the
+    items that have not started yet.
+    """
+    func = bind_span(func)
+    items = iter(items)
+    pending = {}
+    exhausted = False
+    next_start = monotonic()
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        while True:
+            delay = None
+            while len(pending) < workers * 2:
+                if max_rate:
+                    delay = next_start - monotonic()
+                    if delay > 0:
+                        break
+                try:
+                    item = next(items)
+                except StopIteration:
+                    exhausted = True
+                    break
+                # In the context of the caller, for its api.deadline().
+                future = executor.submit(
+                    copy_context().run, _worker_call, func, item)
+                pending[future] = item
+                if max_rate:
+                    next_start = max(next_start, monotonic()) + (
+                        1.0 / max_rate)
+
+            if not pending:
+                if exhausted:
+                    break
+                sleep(delay)  # throttled
+                continue
+
+            finished, _ = wait(
+                pending, timeout=(delay if delay and delay > 0 else None),
+                return_when=FIRST_COMPLETED)
+            for future in finished:
+                item = pending.pop(future)
+                try:
+                    result = future.result()
+                except OxxapyError as e:
+                    yield item, None, e
+                else:
+                    yield item, result, None
+    finally:
+        executor.shutdown(cancel_futures=True)
@@ -0,0 +1,320 @@
+# vim: set ts=8 sw=4 sts=4 et ai tw=79:
+"""
+OXXA API Library in Python (oxxapy), licensed under the LGPLv3+.
+
+Copyright (C) 2021 Walter Doekes, OSSO B.V.
+
+See README.rst for more info.
+"""
+from contextvars import Context
+
+from .bulk import concurrent_map
+from .domain import normalize_domain_name
+from .exceptions import OxxapyDeadlineExceeded, OxxapyError
+from .manager import Manager
+from .profiling import profiled
+from .response import split_status_code
+from .tracing import traced
+
+# Order keys (as in OxxapyDomain.set_c()) and their cart_add parameters.
+ORDER_PARAMS = (
+    ('reg_c', 'identity-registrant'),
+    ('admin_c', 'identity-admin'),
+    ('tech_c', 'identity-tech'),
+    ('bill_c', 'identity-billing'),
+    ('reseller', 'identity-reseller'),
+    ('nsgroup', 'nsgroup'),
+    ('epp', 'trans_epp'),
+)
+
+# cart_purchase: 47 if all items were purchased, 50 if one or more
+# failed (see the <cartitem/> details for which).
+PURCHASE_OK = 47
+PURCHASE_PARTIAL = 50
+
+
+def _handle(value):
+    "Return the handle of an identity/nsgroup/reseller, or value itself"
+    return getattr(value, 'handle', value)
+
+
+class OxxapyCartItem:
+    "An item in the cart, as listed by cart_list"
+    __slots__ = ('itemid', 'producttype', 'name', 'price', 'configok')
+
+    @classmethod
+    @profiled('build')
+    def from_xml(cls, xml_item):
+        """
+        Turn _OxxapyXml into a cart item
+
+        <item>
+          <itemid>96</itemid>
+          <producttype>register</producttype>
+          <productdesc>example1.org</productdesc>
+          <itemprice>6.36</itemprice>
+          <quantity>1</quantity>
+          ...
+          <configok>Y</configok>
+        </item>
+        """
+        ret = cls()
+        ret.itemid = xml_item.get_int_value('itemid')
+        ret.producttype = xml_item.get_str_value('producttype')
+        ret.name = xml_item.get_str_value('productdesc').lower()
+        price = xml_item.get_str_value('itemprice').strip()
+        ret.price = xml_item.get_decimal_value('itemprice') if price else None
+        ret.configok = xml_item.get_bool_value('configok')
+        return ret
+
+    def __repr__(self):
+        return (
+            f'<OxxapyCartItem({self.itemid}, {self.producttype}, '
+            f'{self.name}, configok={self.configok})>')
+
+
+class OxxapyCartOutcome:
+    """
+    Outcome of one bulk order
+
+    status is 'ok' (XMLOK), 'pending' (XMLPEN, like an initiated
+    transfer) or 'failed'. itemid is None if cart_add failed.
+    """
+    __slots__ = ('name', 'itemid', 'status', 'code', 'message')
+
+    def __init__(self, name, itemid=None, status='failed', code=None,
+                 message=None):
+        self.name = name
+        self.itemid = itemid
+        self.status = status
+        self.code = code
+        self.message = message
+
+    def __repr__(self):
+        return (
+            f'<OxxapyCartOutcome({self.name}, {self.status}, '
+            f'{self.code}, {self.message!r})>')
+
+
+class OxxapyCartResult:
+    "Outcomes of a bulk order, per domain name"
+    def __init__(self):
+        self.outcomes = {}  # name -> OxxapyCartOutcome
+        self.purchase_status = None  # 47, 50 or None if nothing was bought
+
+    def _count(self, status):
+        return sum(
+            1 for outcome in self.outcomes.values()
+            if outcome.status == status)
+
+    @property
+    def ok(self):
+        return self._count('ok')
+
+    @property
+    def pending(self):
+        return self._count('pending')
+
+    @property
+    def failed(self):
+        return self._count('failed')
+
+    def __repr__(self):
+        return (
+            f'<OxxapyCartResult(ok={self.ok}, pending={self.pending}, '
+            f'failed={self.failed})>')
+
+
+class OxxapyCart(Manager):
+    "The shopping cart of the API user, for registrations and transfers"
+    def __init__(self, core):
+        self._core = core
+
+    @traced()
+    def add(self, domain, producttype, enduserip, **order):
+        """
+        Add a domain to the cart; return the item id
+
+        enduserip is the IP address of the end user (the customer),
+        which the API requires. order takes the keys of ORDER_PARAMS
+        (reg_c, ..., epp), with objects or handles as values.
+        """
+        sld, tld = normalize_domain_name(domain).split('.', 1)
+        params = {
+            'sld': sld, 'tld': tld, 'producttype': producttype,
+            'enduserip': enduserip}
+        for key, param in ORDER_PARAMS:
+            value = order.pop(key, None)
+            if value is not None:
+                params[param] = _handle(value)
+        if order:
+            raise TypeError(f'unexpected order keys {sorted(order)}')
+        # The item id is in the details, although the API docs do not
+        # show it.
+        return self._core._call('cart_add', **params).get_int_value(
+            'details')
+
+    @traced()
+    def items(self, page_size=100):
+        "Get all cart items AS AN ITERABLE, fetched page_size at a time"
+        # > - START (optioneel) Om te bepalen om op te halen vanaf ID x.
+        # > - RECORDS (optioneel) Het aantal records dat opgehaald moet
+        # >   worden.
+        start = 0
+        while True:
+            details = self._core._call(
+                'cart_list', start=start, records=page_size).get_child(
+                    'details')
+            page = details.get_children('item')
+            for xml_item in page:
+                yield OxxapyCartItem.from_xml(xml_item)
+            start += len(page)
+            if not page or start >= details.get_int_value('totalcartcount'):
+                break
+
+    @traced()
+    def remove(self, itemid, enduserip):
+        "Remove one item from the cart; enduserip as for add()"
+        self._core._call(
+            'cart_del', itemid=itemid, emptycart=False, enduserip=enduserip)
+
+    @traced()
+    def purchase(self, cart_id='ALL'):
+        """
+        Purchase one item, or the entire cart
+
+        Returns (purchase status, {itemid: (status, code, message)}),
+        where the purchase status is 47 (all purchased) or 50 (one or
+        more failed).
+        """
+        resp = self._core._call('cart_purchase', cart_id=cart_id)
+        if resp.status[1] not in (PURCHASE_OK, PURCHASE_PARTIAL):
+            raise NotImplementedError(resp.status)
+        outcomes = {}
+        for xml_item in resp.get_child('details').get_children('cartitem'):
+            # > <status_code>XMLERR 19</status_code>
+            prefix, code = split_status_code(
+                xml_item.get_str_value('status_code'))
+            status = {'XMLOK': 'ok', 'XMLPEN': 'pending'}.get(
+                prefix, 'failed')
+            outcomes[xml_item.get_int_value('cartitemid')] = (
+                status, code,
+                ' '.join(
+                    xml_item.get_str_value('status_description').split()))
+        return resp.status[1], outcomes
+
+    @traced()
+    def bulk_order(self, orders, enduserip, producttype='transfer',
+                   workers=4, page_size=100):
+        """
+        Register or transfer many domains with a single cart_purchase
+
+        orders is an iterable of dicts with a 'domain' and the keys that
+        add() takes; enduserip is passed to add() as well. The items are
+        added concurrently, checked with a (paged) cart_list, and bought
+        at once with cart_id=ALL. Items that are not configured
+        correctly are removed from the cart before the purchase.
+        Returns an OxxapyCartResult.
+
+        The cart must be empty at the start, as everything in it is
+        bought. All orders are checked before the first cart_add. On any
+        error, also a deadline, the items added so far are removed
+        again (ignoring the deadline), so the call can be redone.
+
+        Example:
+
+            result = api.cart.bulk_order([
+                {'domain': 'example.nl', 'epp': 'S3cr3t', 'reg_c': owner,
+                 'admin_c': owner, 'tech_c': osso_c, 'bill_c': osso_c,
+                 'nsgroup': nsgroup}], enduserip, producttype='transfer')
+            print(result)  # <OxxapyCartResult(ok=0, pending=1, failed=0)>
+        """
+        result = OxxapyCartResult()
+        # A bad order fails here, before anything is in the cart. Bad
+        # names only fail their order; duplicates are added once.
+        allowed = set(key for key, param in ORDER_PARAMS)
+        valid = {}
+        for order in orders:
+            order = dict(order)
+            if 'domain' not in order:
+                raise TypeError(f'order without domain: {sorted(order)}')
+            domain = order.pop('domain')
+            if set(order) - allowed:
+                raise TypeError(
+                    f'unexpected order keys {sorted(set(order) - allowed)} '
+                    f'for {domain}')
+            try:
+                name = normalize_domain_name(domain)
+            except ValueError as e:
+                result.outcomes[domain] = OxxapyCartOutcome(
+                    domain, code=0, message=str(e))
+                continue
+            valid.setdefault(name, order)
+
+        for item in self.items(page_size=1):
+            raise ValueError(f'cart is not empty, it has {item}')
+
+        added = []  # item ids, also of adds that were never yielded
+        by_itemid = {}
+
+        def add(name_order):
+            itemid = self.add(
+                name_order[0], producttype, enduserip, **name_order[1])
+            added.append(itemid)
+            return itemid
+
+        adds = concurrent_map(add, valid.items(), workers=workers)
+        try:
+            try:
+                for (name, order), itemid, error in adds:
+                    if isinstance(error, OxxapyDeadlineExceeded):
+                        raise error
+                    elif error is not None:
+                        result.outcomes[name] = OxxapyCartOutcome(
+                            name, code=error.args[0], message=error.args[1])
+                    else:
+                        # Failed, until the purchase says otherwise.
+                        result.outcomes[name] = OxxapyCartOutcome(
+                            name, itemid=itemid)
+                        by_itemid[itemid] = result.outcomes[name]
+            finally:
+                adds.close()  # waits for the adds in flight
+
+            # List everything first: removing items would shift the
+            # pages.
+            items = list(self.items(page_size=page_size))
+            for item in items:
+                if item.itemid in by_itemid and not item.configok:
+                    self.remove(item.itemid, enduserip)
+                    added.remove(item.itemid)
+                    outcome = by_itemid.pop(item.itemid)
+                    outcome.status = 'failed'
+                    outcome.message = (
+                        'not configured correctly (configok=N)')
+        except BaseException:
+            # Outside of the api.deadline() (in an empty context): the
+            # cart must be emptied, or every rerun fails.
+            Context().run(self._remove_all, added, enduserip)
+            raise
+
+        listed = set(item.itemid for item in items)
+        for itemid in set(by_itemid) - listed:
+            outcome = by_itemid.pop(itemid)
+            outcome.status = 'failed'
+            outcome.message = 'added, but not in the cart'
+
+        if by_itemid:
+            result.purchase_status, purchased = self.purchase()
+            for itemid, outcome in by_itemid.items():
+                outcome.status, outcome.code, outcome.message = (
+                    purchased.get(itemid, (
+                        'failed', None, 'missing in the purchase')))
+        return result
+
+    def _remove_all(self, itemids, enduserip):
+        "Remove the items, as far as possible"
+        for itemid in itemids:
+            try:
+                self.remove(itemid, enduserip)
+            except OxxapyError:
+                pass  # the original error is more interesting
@@ -0,0 +1,233 @@
+# vim: set ts=8 sw=4 sts=4 et ai tw=79:
+"""
+OXXA API Library in Python (oxxapy), licensed under the LGPLv3+.
+
+Copyright (C) 2021 Walter Doekes, OSSO B.V.
+
+See README.rst for more info.
+"""
+import mmap
+import struct
+from hashlib import blake2b
+from http.client import responses
+from threading import Lock
+from time import sleep
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+from .transport import OxxapyHttpTransport
+from .wirelog import redact_params
+
+# File layout:
+#   MAGIC
+#   record*: RECORD (status, timings, key length, data length), key, data
+#   index:   INDEX_ENTRY (key hash, record offset)*, sorted
+#   FOOTER:  (index offset, index entries, MAGIC)
+# A cassette without footer (recording was interrupted) is still read,
+# by scanning the records.
+MAGIC = b'OXXACAS1'
+RECORD = struct.Struct('<HfffII')
+INDEX_ENTRY = struct.Struct('<QQ')
+FOOTER = struct.Struct('<QQ8s')
+
+
+# Parameters whose values the API treats case-insensitively. Others,
+# like the data of a TXT record or a search value, are kept as is.
+CASE_INSENSITIVE_PARAMS = frozenset(('command', 'sld', 'tld'))
+
+
+def cassette_key(params):
+    """
+    Return the normalised request parameters as bytes
+
+    The API ignores the case of parameter names and of the
+    CASE_INSENSITIVE_PARAMS values. Credentials are never stored, only
+    their presence.
+    """
+    normalised = {}
+    for key, value in params.items():
+        key = key.lower()
+        if key in CASE_INSENSITIVE_PARAMS:
+            value = value.strip().lower()
+        normalised[key] = value
+    return urlencode(
+        sorted(redact_params(normalised).items())).encode('ascii')
+
+
+def _key_hash(key):
+    return struct.unpack('<Q', blake2b(key, digest_size=8).digest())[0]
+
+
+def _request_key(urlreq):
+    return cassette_key(dict(parse_qsl(
+        urlsplit(urlreq.full_url).query, keep_blank_values=True)))
+
+
+class OxxapyCassetteRecorder:
+    """
+    Transport that records all API responses to a cassette file
+
+    The requests are done by the wrapped transport. Close the API (or
+    the recorder) to write the index.
+
+    Example:
+
+        api = Oxxapy(..., transport=OxxapyCassetteRecorder('session.cas'))
+        list(api.domains.all())
+        api.close()
+    """
+    def __init__(self, path, transport=None):
+        self._transport = transport or OxxapyHttpTransport()
+        self._file = open(path, 'wb')
+        self._file.write(MAGIC)
+        self._index = []
+        self._lock = Lock()
+
+    @property
+    def connections_opened(self):
+        return self._transport.connections_opened
+
+    def fetch(self, urlreq, connect_timeout=None, read_timeout=None,
+              idempotent=False):
+        status, reason, data, timings = self._transport.fetch(
+            urlreq, connect_timeout=connect_timeout,
+            read_timeout=read_timeout, idempotent=idempotent)
+        key = _request_key(urlreq)
+        with self._lock:
+            self._index.append((_key_hash(key), self._file.tell()))
+            self._file.write(RECORD.pack(
+                status, timings['connect'], timings['ttfb'],
+                timings['download'], len(key), len(data)))
+            self._file.write(key)
+            self._file.write(data)
+        return status, reason, data, timings
+
+    def close(self):
+        "Write the index and close the file and the wrapped transport"
+        self._transport.close()
+        with self._lock:
+            if self._file.closed:
+                return
+            index_offset = self._file.tell()
+            # Sorted on (hash, offset): identical requests stay in order.
+            self._index.sort()
+            for entry in self._index:
+                self._file.write(INDEX_ENTRY.pack(*entry))
+            self._file.write(FOOTER.pack(
+                index_offset, len(self._index), MAGIC))
+            self._file.close()
+
+
+class OxxapyCassette:
+    """
+    Transport that replays API responses from a cassette file
+
+    Requests are matched by their normalised parameters (see
+    cassette_key()), not by order. If the same request was recorded
+    several times, the answers are replayed in the recorded order and
+    the last one is repeated. Unrecorded requests get an HTTP 404.
+
+    The file is memory-mapped and looked up through its sorted index,
+    so opening even a very large cassette is instant. With realtime,
+    the recorded response time is waited before answering.
+
+    Example:
+
+        api = Oxxapy(..., transport=OxxapyCassette('session.cas'))
+        list(api.domains.all())  # no network traffic
+    """
+    connections_opened = 0
+
+    def __init__(self, path, realtime=False):
+        self.realtime = realtime
+        with open(path, 'rb') as fp:
+            self._map = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(MAGIC)] != MAGIC:
+            raise ValueError(f'{path} is not an oxxapy cassette')
+        self._index_offset, self._count = self._read_footer()
+        self._replays = {}  # key -> [offsets, next position]
+        self._lock = Lock()
+
+    def __len__(self):
+        return self._count
+
+    def close(self):
+        "Unmap (and close) the cassette file"
+        with self._lock:
+            self._map.close()
+
+    def fetch(self, urlreq, connect_timeout=None, read_timeout=None,
+              idempotent=False):
+        key = _request_key(urlreq)
+        with self._lock:
+            if key not in self._replays:
+                self._replays[key] = [self._lookup(key), 0]
+            offsets, position = self._replays[key]
+            if not offsets:
+                reason = 'Not in cassette: {}'.format(key.decode('ascii'))
+                return 404, reason, b'', {
+                    'connect': 0.0, 'ttfb': 0.0, 'download': 0.0}
+            self._replays[key][1] = min(position + 1, len(offsets) - 1)
+
+        offset = offsets[position]
+        status, connect, ttfb, download, key_len, data_len = (
+            RECORD.unpack_from(self._map, offset))
+        data_offset = offset + RECORD.size + key_len
+        data = self._map[data_offset:data_offset + data_len]
+        timings = {'connect': connect, 'ttfb': ttfb, 'download': download}
+        if self.realtime:
+            sleep(connect + ttfb + download)
+        return status, responses.get(status, ''), data, timings
+
+    def _read_footer(self):
+        if len(self._map) >= len(MAGIC) + FOOTER.size:
+            index_offset, count, magic = FOOTER.unpack_from(
+                self._map, len(self._map) - FOOTER.size)
+            if magic == MAGIC:
+                return index_offset, count
+        return self._scan()
+
+    def _scan(self):
+        "Build the index in memory for a cassette without footer"
+        index = []
+        offset = len(MAGIC)
+        while offset + RECORD.size <= len(self._map):
+            key_len, data_len = RECORD.unpack_from(self._map, offset)[4:]
+            start = offset + RECORD.size
+            end = start + key_len + data_len
+            if end > len(self._map):
+                break  # truncated record
+            key = self._map[start:start + key_len]
+            index.append((_key_hash(key), offset))
+            offset = end
+        index.sort()
+        self._scanned = index
+        return None, len(index)
+
+    def _entry(self, idx):
+        if self._index_offset is None:
+            return self._scanned[idx]
+        return INDEX_ENTRY.unpack_from(
+            self._map, self._index_offset + idx * INDEX_ENTRY.size)
+
+    def _lookup(self, key):
+        "Return the record offsets for key, in recorded order"
+        key_hash = _key_hash(key)
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._entry(mid)[0] < key_hash:
+                lo = mid + 1
+            else:
+                hi = mid
+        offsets = []
+        while lo < self._count:
+            entry_hash, offset = self._entry(lo)
+            if entry_hash != key_hash:
+                break
+            # Guard against hash collisions.
+            key_len = RECORD.unpack_from(self._map, offset)[4]
+            start = offset + RECORD.size
+            if self._map[start:start + key_len] == key:
+                offsets.append(offset)
+            lo += 1
+        return offsets
@@ -6,18 +6,50 @@ Copyright (C) 2021 Walter Doekes, OSSO B.V.
 
 See README.rst for more info.
 """
+from contextlib import contextmanager
+from contextvars import ContextVar
+from http.client import HTTPException
+from threading import Lock
+from time import monotonic
 from urllib.parse import urlencode
-from urllib.request import Request, urlopen
+from urllib.request import Request
 from warnings import warn
 
+from .breaker import OxxapyCircuitBreaker
+from .deadline import OxxapyDeadline
+from .diagnostics import OxxapyCallBudget, OxxapyCallSiteTracker
 from .exceptions import (
-    OxxapyTransportError, OxxapyTransactionError)
+    OxxapyCircuitOpenError, OxxapyDeadlineExceeded, OxxapyTransportError,
+    OxxapyTransactionError)
+from .hedge import OxxapyHedger
+from .metrics import OxxapyMetrics
+from .profiling import profiled, record_call
 from .response import OxxapyResponse
+from .transport import OxxapyHttpTransport
+from .wirelog import OxxapyWireLogger
 
 
 # url?apiuser=USER&apipassword=PASS&command=CMD[&test=Y]
 API_URL = 'https://api.oxxa.com/command.php'
 
+# (connect, read) timeouts in seconds; the read timeout applies to every
+# blocking read, so a slowly trickling response can take longer.
+DEFAULT_TIMEOUT = (10, 120)
+
+# Commands that do not change anything and can safely be repeated.
+READONLY_COMMANDS = frozenset((
+    'cart_get', 'cart_list', 'dnsrecord_list', 'domain_check', 'domain_inf',
+    'domain_list', 'identity_get', 'identity_list', 'nsgroup_get',
+    'nsgroup_list', 'order_list', 'resellerget', 'resellerlist',
+    'transfer_status'))
+
+# Read-only commands with a small answer, of which the circuit breaker
+# keeps the last good answer. Listings (domain_list of a portfolio,
+# order_list pages) are too large to keep around just in case.
+STALE_COMMANDS = frozenset((
+    'domain_check', 'domain_inf', 'identity_get', 'nsgroup_get',
+    'resellerget', 'transfer_status'))
+
 
 class OxxapyRequest:
     def __init__(self, url, command, params={}):
@@ -49,8 +81,6 @@ class OxxapyRequest:
 
         # Don't use Request(data=send_params), but urlencode it ourself.
         url = f'{self.url}?{urlencode(send_params)}'
-        if False:
-            print(f'>>> {url}')
         return Request(url=url, headers=headers, method='GET')
 
     def __repr__(self):
@@ -58,7 +88,8 @@ class OxxapyRequest:
 
 
 class OxxapyCore:
-    def __init__(self, username, password):
+    def __init__(self, username, password, timeout=DEFAULT_TIMEOUT,
+                 transport=None, scheduler=None, api_url=API_URL):
         assert len(username)
         assert len(password)
 
@@ -68,53 +99,317 @@ class OxxapyCore:
             password = 'MD5{}'.format(
                 md5(password.encode('ascii')).hexdigest())
 
-        self._apiurl = API_URL
+        self._apiurl = api_url
         self._username, self._password = username, password
         self._caches = {}
+        self._cache_lock = Lock()
+        self._transport = transport or OxxapyHttpTransport()
+        self._scheduler = scheduler
+        self._timeouts = {}
+        # Per thread (context); the worker threads of oxxapy copy it.
+        self._deadline_var = ContextVar('oxxapy_deadline', default=None)
+        self._hedger = None
+        self._breaker = None
+        self._metrics = OxxapyMetrics()
+        self._tracer = None
+        self._call_sites = None
+        # Per thread (context) too, like the deadline.
+        self._budgets_var = ContextVar('oxxapy_budgets', default=())
+        self._wirelog = OxxapyWireLogger()
+        self.set_timeout(*timeout)
+
+    def close(self):
+        "Close idle (keep-alive) connections"
+        self._transport.close()
+
+    @property
+    def metrics(self):
+        "Per-command OxxapyMetrics registry"
+        return self._metrics
+
+    def set_tracer(self, tracer):
+        "Set an OxxapyTracer to get spans for calls (or None to disable)"
+        self._tracer = tracer
+
+    def set_n_plus_one_detection(self, threshold=10):
+        """
+        Warn when a line of code calls the same command in a loop
+
+        After threshold calls with different parameters from the same
+        line, an OxxapyNPlusOneWarning is issued for that line. Pass
+        threshold=None to disable. See also n_plus_one_report().
+        """
+        if threshold is None:
+            self._call_sites = None
+        else:
+            self._call_sites = OxxapyCallSiteTracker(threshold)
+
+    def n_plus_one_report(self):
+        "Return [(filename, lineno, command, distinct_calls)], worst first"
+        if self._call_sites is None:
+            return []
+        return self._call_sites.report()
+
+    @contextmanager
+    def call_budget(self, max_calls, action='raise'):
+        """
+        Limit the number of API calls done inside the with-block
+
+        Example (in a test):
+
+            with api.call_budget(max_calls=1) as budget:
+                list(api.domains.filter(tld='nl'))
+            assert budget.commands == {'domain_list': 1}
+
+        With action='warn' an OxxapyCallBudgetWarning is issued instead
+        of raising OxxapyCallBudgetExceeded. Budgets can be nested.
+        Like deadline(), the budget only applies to the calling thread
+        and the worker threads that oxxapy starts from it.
+        """
+        budget = OxxapyCallBudget(max_calls, action=action)
+        token = self._budgets_var.set(self._budgets_var.get() + (budget,))
+        try:
+            yield budget
+        finally:
+            self._budgets_var.reset(token)
+
+    def set_wire_logging(self, sample_every=1, slower_than_ms=None,
+                         log_body=False):
+        """
+        Configure what goes to the 'oxxapy.wire' logger
+
+        Credentials are never logged. See OxxapyWireLogger; remember to
+        enable the logger at DEBUG level.
+        """
+        self._wirelog = OxxapyWireLogger(
+            sample_every=sample_every, slower_than_ms=slower_than_ms,
+            log_body=log_body)
+
+    def set_timeout(self, connect, read, command=None):
+        """
+        Set (connect, read) timeouts in seconds, for command or as default
+
+        Example:
+
+            api.set_timeout(5, 30)  # all commands
+            api.set_timeout(5, 600, command='domain_list')
+        """
+        self._timeouts[command] = (connect, read)
+
+    def get_timeout(self, command):
+        "Get (connect, read) timeouts for command, capped by the deadline"
+        connect, read = self._timeouts.get(command, self._timeouts[None])
+        if self._deadline is not None:
+            connect = self._deadline.cap_timeout(connect)
+            read = self._deadline.cap_timeout(read)
+        return connect, read
+
+    def set_hedging(self, commands=('domain_check', 'domain_inf'),
+                    percentile=95, max_rate=0.05):
+        """
+        Opt in to hedged requests for slow read-only commands
+
+        If a call takes longer than the percentile of recent latencies
+        of that command, a second identical request is sent and the
+        first answer wins. No more than max_rate of the calls are
+        hedged. Pass commands=() to disable.
+        """
+        unsafe = set(commands) - READONLY_COMMANDS
+        if unsafe:
+            raise ValueError(
+                'only read-only commands can be hedged: {}'.format(
+                    ', '.join(sorted(unsafe))))
+        if commands:
+            self._hedger = OxxapyHedger(
+                commands, percentile=percentile, max_rate=max_rate)
+        else:
+            self._hedger = None
+
+    def set_circuit_breaker(self, max_consecutive=5, max_error_rate=0.5,
+                            window=20, reset_timeout=30, probes=1,
+                            serve_stale=True):
+        """
+        Fail fast with OxxapyCircuitOpenError while the API is failing
+
+        See OxxapyCircuitBreaker for the parameters. If serve_stale is
+        set, the last good answer to an identical lookup (one of the
+        STALE_COMMANDS, not the listings) is returned while the circuit
+        is open. Use max_consecutive=None to disable.
+        """
+        if max_consecutive is None:
+            self._breaker = None
+        else:
+            self._breaker = OxxapyCircuitBreaker(
+                max_consecutive=max_consecutive,
+                max_error_rate=max_error_rate, window=window,
+                reset_timeout=reset_timeout, probes=probes,
+                max_stale=(1000 if serve_stale else 0))
+
+    @property
+    def _deadline(self):
+        "The OxxapyDeadline of the current thread (context), or None"
+        return self._deadline_var.get()
+
+    @contextmanager
+    def deadline(self, seconds):
+        """
+        Limit the time spent by all API calls inside the with-block
+
+        The deadline only applies to the calling thread, and to the
+        worker threads that oxxapy starts from it (bulk jobs, hedged
+        requests). Other threads sharing this instance are unaffected.
+        """
+        deadline = OxxapyDeadline(seconds, parent=self._deadline)
+        token = self._deadline_var.set(deadline)
+        try:
+            yield deadline
+        except OxxapyDeadlineExceeded as e:
+            deadline.unfinished.extend(e.args[1])
+            raise
+        finally:
+            self._deadline_var.reset(token)
 
     def _call(self, command, **params):
-        resp = self._xmlcall(command, **params)
-        status_ok, status_code, status_msg = resp.status
-        if not status_ok:
+        for budget in self._budgets_var.get():
+            budget.consume(command)
+        if self._call_sites is not None:
+            self._call_sites.observe(command, params)
+        if self._tracer is None:
+            return self._measured_call(command, params)
+        with self._tracer.span(f'call {command}', command=command) as span:
+            resp = self._measured_call(command, params)
+            span.set('status', resp.status[1])
+            return resp
+
+    def _measured_call(self, command, params):
+        t0 = monotonic()
+        error = None
+        try:
+            resp = self._guarded_xmlcall(command, params)
+            status_ok, status_code, status_msg = resp.status
+            if status_ok is False:
+                error = status_code
+        except OxxapyDeadlineExceeded:
+            error = 'deadline'
+            raise
+        except OxxapyTransportError as e:
+            error = (
+                'circuit' if isinstance(e, OxxapyCircuitOpenError)
+                else 'transport')
+            raise
+        except Exception:
+            # Like a NotImplementedError for an unknown status code.
+            error = 'exception'
+            raise
+        finally:
+            elapsed = monotonic() - t0
+            self._metrics.observe_call(command, elapsed, error=error)
+            record_call(command, params, elapsed, error=error)
+
+        if status_ok is False:
             raise OxxapyTransactionError(
                 status_code, status_msg, req=resp.orig_req, resp=resp)
         return resp
 
+    def _guarded_xmlcall(self, command, params):
+        if self._deadline is not None:
+            self._deadline.check(
+                [OxxapyRequest(self._apiurl, command, params)])
+        if self._breaker is not None:
+            stale_key = None
+            if command in STALE_COMMANDS:
+                stale_key = (command, tuple(sorted(params.items())))
+            return self._breaker.call(
+                OxxapyRequest(self._apiurl, command, params),
+                (lambda: self._hedged_xmlcall(command, params)),
+                stale_key=stale_key)
+        return self._hedged_xmlcall(command, params)
+
+    def _hedged_xmlcall(self, command, params):
+        if self._hedger is not None and command in self._hedger.commands:
+            return self._hedger.call(
+                command, (lambda: self._scheduled_xmlcall(command, params)))
+        return self._scheduled_xmlcall(command, params)
+
+    def _scheduled_xmlcall(self, command, params):
+        if self._scheduler is None:
+            return self._xmlcall(command, **params)
+
+        # Without a deadline we wait for a slot for as long as it takes.
+        deadline = self._deadline
+        timeout = None if deadline is None else deadline.remaining()
+        while not self._scheduler.acquire(self._username, timeout=timeout):
+            deadline.check([OxxapyRequest(self._apiurl, command, params)])
+            timeout = deadline.remaining()
+        try:
+            return self._xmlcall(command, **params)
+        finally:
+            self._scheduler.release()
+
     def _xmlcall(self, command, **params):
         req = OxxapyRequest(self._apiurl, command, params)
-        resp = urlopen(req.get_urllib_request(
-            {'apiuser': self._username, 'apipassword': self._password}))
+        connect_timeout, read_timeout = self.get_timeout(command)
+        t0 = monotonic()
         try:
-            data = resp.read()
-        except Exception as e:
-            data = b''
-            raise OxxapyTransportError(
-                resp.status, str(e), req=req, binresp=data)
-        if resp.status != 200:
+            status, reason, data, timings = self._transport.fetch(
+                req.get_urllib_request({
+                    'apiuser': self._username,
+                    'apipassword': self._password}),
+                connect_timeout=connect_timeout, read_timeout=read_timeout,
+                idempotent=(command in READONLY_COMMANDS))
+        except (OSError, HTTPException) as e:
+            self._wirelog.log_error(req, e, monotonic() - t0)
+            if self._deadline is not None:
+                # A timeout caused by the deadline is not a transport
+                # problem; report it as such.
+                self._deadline.check([req])
+            raise OxxapyTransportError(0, str(e), req=req, binresp=b'')
+        self._wirelog.log_response(
+            req, status, data, monotonic() - t0, timings)
+        if status != 200:
+            self._metrics.observe_transfer(command, timings, len(data))
             raise OxxapyTransportError(
-                resp.status, resp.reason, req=req, binresp=data)
+                status, reason, req=req, binresp=data)
+        t0 = monotonic()
         try:
             response = OxxapyResponse.from_binstr(data, req).extract_order()
         except Exception as e:
             raise OxxapyTransportError(
-                resp.status, str(e), req=req, binresp=data)
+                status, str(e), req=req, binresp=data)
+        finally:
+            self._metrics.observe_transfer(
+                command, timings, len(data), parse=(monotonic() - t0))
         return response
 
+    @profiled('cache')
     def _cache_clear(self, type_):
-        type_key = type_.__name__
-        if type_key in self._caches:
-            del self._caches[type_key]
+        with self._cache_lock:
+            self._caches.pop(type_.__name__, None)
 
+    @profiled('cache')
     def _cache_get(self, type_, id_, create_func):
-        type_key = type_.__name__
-        if type_key not in self._caches:
-            self._caches[type_key] = {}
-        if id_ not in self._caches[type_key]:
-            self._caches[type_key][id_] = create_func()
-        return self._caches[type_key][id_]
+        "Return the cached value; create it once if there is none"
+        # Locked, so threads asking for the same id get the same object.
+        # The create_func is a cheap constructor; it must not call the
+        # cache itself.
+        with self._cache_lock:
+            cache = self._caches.setdefault(type_.__name__, {})
+            if id_ not in cache:
+                cache[id_] = create_func()
+            return cache[id_]
+
+    @profiled('cache')
+    def _cache_find(self, type_, id_):
+        "Return the cached value or None, without creating it"
+        return self._caches.get(type_.__name__, {}).get(id_)
+
+    @profiled('cache')
+    def _cache_values(self, type_):
+        "Return a list of all cached values of type_"
+        with self._cache_lock:
+            return list(self._caches.get(type_.__name__, {}).values())
 
+    @profiled('cache')
     def _cache_set(self, type_, id_, value):
-        type_key = type_.__name__
-        if type_key not in self._caches:
-            self._caches[type_key] = {}
-        self._caches[type_key][id_] = value
+        with self._cache_lock:
+            self._caches.setdefault(type_.__name__, {})[id_] = value
@@ -0,0 +1,57 @@
+# vim: set ts=8 sw=4 sts=4 et ai tw=79:
+"""
+OXXA API Library in Python (oxxapy), licensed under the LGPLv3+.
+
+Copyright (C) 2021 Walter Doekes, OSSO B.V.
+
+See README.rst for more info.
+"""
+from time import monotonic
+
+from .exceptions import OxxapyDeadlineExceeded
+
+
+class OxxapyDeadline:
+    """
+    Time budget for all API calls done inside an api.deadline() block
+
+    Example:
+
+        with api.deadline(seconds=300) as deadline:
+            for domain in api.domains.filter(reseller=reseller):
+                ...
+
+    Once the budget is spent, no new API calls are started and
+    OxxapyDeadlineExceeded is raised. The work that did not complete
+    is listed in deadline.unfinished (and in the exception).
+    """
+    def __init__(self, seconds, parent=None):
+        self.seconds = seconds
+        self.expires_at = monotonic() + seconds
+        if parent is not None and parent.expires_at < self.expires_at:
+            # Nested deadlines can only shorten the budget.
+            self.expires_at = parent.expires_at
+        self.unfinished = []
+
+    def remaining(self):
+        "Return seconds left (0.0 if expired)"
+        return max(0.0, self.expires_at - monotonic())
+
+    def expired(self):
+        return self.remaining() <= 0.0
+
+    def check(self, unfinished):
+        "Raise OxxapyDeadlineExceeded with unfinished work if expired"
+        if self.expired():
+            raise OxxapyDeadlineExceeded(
+                f'deadline of {self.seconds}s exceeded', list(unfinished))
+
+    def cap_timeout(self, timeout):
+        "Return timeout, lowered to the remaining budget if needed"
+        remaining = self.remaining()
+        if timeout is None or remaining < timeout:
+            return remaining
+        return timeout
+
+    def __repr__(self):
+        return f'<OxxapyDeadline({self.remaining():.1f}/{self.seconds}s)>'
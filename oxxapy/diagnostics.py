@@ -0,0 +1,180 @@
+# vim: set ts=8 sw=4 sts=4 et ai tw=79:
+"""
+OXXA API Library in Python (oxxapy), licensed under the LGPLv3+.
+
+Copyright (C) 2021 Walter Doekes, OSSO B.V.
+
+See README.rst for more info.
+"""
+import os
+import sys
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Lock
+from warnings import warn_explicit
+
+from .exceptions import OxxapyCallBudgetExceeded
+
+_PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__)) + os.sep
+
+# Set by bulk_calls(): the calls are the bulk alternative, not a loop
+# of the user.
+_in_bulk = ContextVar('oxxapy_in_bulk', default=False)
+
+# What to use instead of calling command in a loop.
+BULK_ALTERNATIVES = {
+    'domain_inf': (
+        'most domain fields come with api.domains.filter() (one '
+        'domain_list); for reseller/dnssec, hydrate concurrently with an '
+        'OxxapyBulkJob'),
+    'domain_check': 'check concurrently with api.domains.check_many()',
+    'dnsrecord_list': (
+        'sync many zones concurrently with api.dns.bulk_sync(), which '
+        'skips unchanged zones'),
+    'domain_list': 'filter once and group the results locally',
+    'identity_get': 'fetch concurrently with api.identities.hydrate()',
+    'identity_list': 'prefetch once with api.identities.all()',
+    'nsgroup_list': 'prefetch once with api.nsgroups.all()',
+    'resellerlist': 'prefetch once with api.resellers.all()',
+    'transfer_status': (
+        'track many orders with api.orders.tracker() (one order_list '
+        'per poll)'),
+}
+
+
+class OxxapyNPlusOneWarning(UserWarning):
+    "The same command is called in a loop with different keys"
+
+
+class OxxapyCallBudgetWarning(UserWarning):
+    "More API calls were done than the call budget allows"
+
+
+def _user_frame():
+    "Return the innermost stack frame outside of oxxapy"
+    frame = sys._getframe(1)
+    while frame is not None and frame.f_code.co_filename.startswith(
+            _PACKAGE_DIR):
+        frame = frame.f_back
+    return frame
+
+
+def _warn_at(frame, lineno, message, category):
+    "Issue a warning attributed to a line of (user) code"
+    warn_explicit(
+        message, category, frame.f_code.co_filename, lineno,
+        module=frame.f_globals.get('__name__'),
+        registry=frame.f_globals.setdefault('__warningregistry__', {}))
+
+
+@contextmanager
+def bulk_calls():
+    """
+    Leave the calls inside the with-block out of the N+1 detection
+
+    Used by the bulk helpers (concurrent_map(), OxxapyBulkJob, the
+    order tracker), which are what BULK_ALTERNATIVES recommends.
+    """
+    token = _in_bulk.set(True)
+    try:
+        yield
+    finally:
+        _in_bulk.reset(token)
+
+
+class OxxapyCallSiteTracker:
+    """
+    Finds loops that do one API call per item (the N+1 pattern)
+
+    Every call is attributed to the innermost line of user code that
+    caused it. When a single line causes threshold calls of the same
+    command with different parameters, an OxxapyNPlusOneWarning is
+    issued, pointing at that line.
+
+    Example:
+
+        api.set_n_plus_one_detection(threshold=10)
+        for domain in api.domains.all():
+            print(domain.reseller)  # <-- warns after 10 domain_inf
+    """
+    def __init__(self, threshold=10):
+        self.threshold = threshold
+        self._sites = {}  # (filename, lineno, command) -> set of params
+        self._warned = set()
+        self._lock = Lock()
+
+    def observe(self, command, params):
+        if _in_bulk.get():
+            return
+        frame = _user_frame()
+        if frame is None:
+            return
+        site = (frame.f_code.co_filename, frame.f_lineno, command)
+        key = tuple(sorted(params.items()))
+        with self._lock:
+            if site in self._warned:
+                return
+            keys = self._sites.setdefault(site, set())
+            keys.add(key)
+            if len(keys) < self.threshold:
+                return
+            self._warned.add(site)
+
+        hint = BULK_ALTERNATIVES.get(command)
+        message = '{} different {} calls from this line{}'.format(
+            len(keys), command, (f'; instead: {hint}' if hint else ''))
+        _warn_at(frame, site[1], message, OxxapyNPlusOneWarning)
+
+    def report(self):
+        "Return [(filename, lineno, command, distinct_calls)], worst first"
+        with self._lock:
+            ret = [
+                (site[0], site[1], site[2], len(keys))
+                for site, keys in self._sites.items()]
+        ret.sort(key=(lambda x: -x[3]))
+        return ret
+
+
+class OxxapyCallBudget:
+    """
+    Counts the API calls done inside an api.call_budget() block
+
+    When more than max_calls are done, OxxapyCallBudgetExceeded is
+    raised (action='raise') or OxxapyCallBudgetWarning is issued once
+    (action='warn').
+    """
+    def __init__(self, max_calls, action='raise'):
+        assert action in ('raise', 'warn'), action
+        self.max_calls = max_calls
+        self.action = action
+        self.calls = 0
+        self.commands = Counter()
+        self._lock = Lock()
+
+    def consume(self, command):
+        with self._lock:
+            if self.calls >= self.max_calls:
+                exceeded = True
+                if self.action == 'warn':
+                    # Count it anyway, but only warn the first time.
+                    exceeded = (self.calls == self.max_calls)
+                    self.calls += 1
+                    self.commands[command] += 1
+            else:
+                exceeded = False
+                self.calls += 1
+                self.commands[command] += 1
+
+        if not exceeded:
+            return
+        message = 'call budget of {} exceeded by {} ({})'.format(
+            self.max_calls, command, ', '.join(
+                f'{cmd}={num}' for cmd, num in self.commands.most_common()))
+        if self.action == 'raise':
+            raise OxxapyCallBudgetExceeded(message, dict(self.commands))
+        frame = _user_frame()
+        _warn_at(frame, frame.f_lineno, message, OxxapyCallBudgetWarning)
+
+    def __repr__(self):
+        return f'<OxxapyCallBudget({self.calls}/{self.max_calls})>'
@@ -0,0 +1,256 @@
+# vim: set ts=8 sw=4 sts=4 et ai tw=79:
+"""
+OXXA API Library in Python (oxxapy), licensed under the LGPLv3+.
+
+Copyright (C) 2021 Walter Doekes, OSSO B.V.
+
+See README.rst for more info.
+"""
+import json
+import os
+from hashlib import blake2b
+
+from .bulk import OxxapyBulkResult, concurrent_map
+from .domain import normalize_domain_name
+from .exceptions import OxxapyApplicationError, OxxapyDeadlineExceeded
+from .manager import Manager
+from .profiling import profiled
+from .tracing import traced
+
+# dnsrecord_del wants the TTL, but dnsrecord_list does not show it; the
+# API docs example uses this.
+DEFAULT_TTL = 3600
+
+
+class OxxapyDnsRecord:
+    """
+    A DNS record of a zone on the OXXA nameservers
+
+    Records are equal if value (case insensitive), type, data and
+    priority (MX only) are. The ttl is only used to delete the record.
+
+    Example:
+
+        OxxapyDnsRecord('www.example.com', 'A', '192.0.2.1')
+        OxxapyDnsRecord('example.com', 'MX', 'mail.example.com', 10)
+    """
+    __slots__ = ('value', 'type', 'data', 'priority', 'ttl')
+
+    @classmethod
+    @profiled('build')
+    def from_xml(cls, xml_record):
+        """
+        Turn _OxxapyXml into a record
+
+        <record>
+          <record_id>1</record_id>
+          <value>www.example.com</value>
+          <type>MX</type>
+          <data>192.168.0.1</data>
+          <priority>1</priority>
+        </record>
+        """
+        ret = cls(
+            xml_record.get_str_value('value'),
+            xml_record.get_str_value('type'),
+            xml_record.get_str_value('data'))
+        if ret.type == 'MX':
+            ret.priority = xml_record.get_int_value('priority')
+        try:
+            ret.ttl = xml_record.get_int_value('ttl')
+        except OxxapyApplicationError:
+            pass  # not in the listing, according to the API docs
+        return ret
+
+    def __init__(self, value, type, data, priority=None, ttl=DEFAULT_TTL):
+        self.value = value.strip().rstrip('.').lower()
+        self.type = type.strip().upper()
+        self.data = data.strip()
+        self.priority = priority if self.type == 'MX' else None
+        self.ttl = ttl
+
+    def _key(self):
+        return (self.value, self.type, self.data, self.priority or 0)
+
+    def __hash__(self):
+        return hash(self._key())
+
+    def __eq__(self, other):
+        return self._key() == other._key()
+
+    def __lt__(self, other):
+        return self._key() < other._key()
+
+    def __repr__(self):
+        priority = '' if self.priority is None else f' {self.priority}'
+        return (
+            f'<OxxapyDnsRecord({self.value} {self.type}{priority} '
+            f'{self.data})>')
+
+    def _params(self):
+        params = {'value': self.value, 'type': self.type, 'data': self.data}
+        if self.priority is not None:
+            params['priority'] = self.priority
+        return params
+
+
+def records_hash(records):
+    "Return a hash of the record set, independent of order and duplicates"
+    digest = blake2b(digest_size=16)
+    for record in sorted(set(records)):
+        digest.update(repr(record._key()).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class OxxapyDns(Manager):
+    """
+    DNS records of the zones on the OXXA nameservers
+
+    Example:
+
+        api.dns.sync('example.com', [
+            OxxapyDnsRecord('example.com', 'A', '192.0.2.1'),
+            OxxapyDnsRecord('www.example.com', 'CNAME', 'example.com')])
+
+    The hashes of the zones synced before are kept, so a zone whose
+    desired records did not change is skipped without any API call.
+    Pass hashes_file to bulk_sync() to keep them between runs. Skipped
+    zones are NOT checked for changes made elsewhere; use forget() or
+    force=True for that.
+    """
+    def __init__(self, core):
+        self._core = core
+        self._hashes = {}  # domain -> records_hash() of the last sync
+
+    @traced()
+    def records(self, domain, page_size=100):
+        "Get all records of the zone, fetched page_size at a time"
+        # > - START (optioneel) Om te bepalen om op te halen vanaf ID x.
+        # > - RECORDS (optioneel) Het aantal records dat opgehaald moet
+        # >   worden.
+        sld, tld = normalize_domain_name(domain).split('.', 1)
+        ret = []
+        while True:
+            details = self._core._call(
+                'dnsrecord_list', sld=sld, tld=tld, start=len(ret),
+                records=page_size).get_child('details')
+            page = details.get_children('record')
+            ret.extend(OxxapyDnsRecord.from_xml(xml) for xml in page)
+            if not page or len(ret) >= details.get_int_value(
+                    'records_total'):
+                return ret
+
+    @traced()
+    def add(self, domain, record):
+        "Add a record to the zone"
+        sld, tld = normalize_domain_name(domain).split('.', 1)
+        self._core._call('dnsrecord_add', sld=sld, tld=tld, **record._params())
+
+    @traced()
+    def delete(self, domain, record):
+        "Delete a record from the zone"
+        sld, tld = normalize_domain_name(domain).split('.', 1)
+        self._core._call(
+            'dnsrecord_del', sld=sld, tld=tld, ttl=record.ttl,
+            **record._params())
+
+    def forget(self, domain=None):
+        "Forget the hash of the last sync of domain (or of all zones)"
+        if domain is None:
+            self._hashes.clear()
+        else:
+            self._hashes.pop(normalize_domain_name(domain), None)
+
+    @traced()
+    def sync(self, domain, desired, force=False):
+        """
+        Make the zone have exactly the desired records
+
+        Only the differences are sent: new records are added first, so
+        a replaced record is never missing, then stale ones are deleted.
+        Returns (added, deleted) lists, or None if the zone was skipped
+        because it was synced to the same records before.
+        """
+        domain = normalize_domain_name(domain)
+        desired = set(desired)
+        desired_hash = records_hash(desired)
+        if not force and self._hashes.get(domain) == desired_hash:
+            return None
+        added, deleted = self._sync(domain, desired)
+        self._hashes[domain] = desired_hash
+        return added, deleted
+
+    def _sync(self, domain, desired):
+        current = self.records(domain)
+        current_set = set(current)
+        added = sorted(desired - current_set)
+        # Deleting needs the listed record (with its ttl); duplicates
+        # are deleted as often as they are listed.
+        deleted = [record for record in current if record not in desired]
+        for record in added:
+            self.add(domain, record)
+        for record in deleted:
+            self.delete(domain, record)
+        return added, deleted
+
+    @traced()
+    def bulk_sync(self, zones, workers=4, hashes_file=None, force=False):
+        """
+        Sync many zones concurrently; zones holds (domain, records) pairs
+
+        Zones that did not change since the last sync are skipped. With
+        hashes_file (JSON), the hashes are loaded from and saved to that
+        file, so the next run skips them too. Returns an
+        OxxapyBulkResult.
+        """
+        if hashes_file is not None:
+            self._load_hashes(hashes_file)
+
+        result = OxxapyBulkResult()
+
+        def changed_zones():
+            for domain, records in zones:
+                domain = normalize_domain_name(domain)
+                records = set(records)
+                zone_hash = records_hash(records)
+                if not force and self._hashes.get(domain) == zone_hash:
+                    result.skipped += 1
+                else:
+                    yield domain, records, zone_hash
+
+        unfinished = []
+        try:
+            for (domain, records, zone_hash), _, error in concurrent_map(
+                    (lambda zone: self._sync(zone[0], zone[1])),
+                    changed_zones(), workers=workers):
+                if isinstance(error, OxxapyDeadlineExceeded):
+                    unfinished.append(domain)
+                elif error is not None:
+                    result.failed += 1
+                    result.failures.append(
+                        (domain, error.args[0], error.args[1]))
+                    self._hashes.pop(domain, None)
+                else:
+                    result.ok += 1
+                    self._hashes[domain] = zone_hash
+        finally:
+            if hashes_file is not None:
+                self._save_hashes(hashes_file)
+        if unfinished:
+            raise OxxapyDeadlineExceeded(
+                'deadline exceeded during bulk_sync', unfinished)
+        return result
+
+    def _load_hashes(self, path):
+        try:
+            with open(path, encoding='utf-8') as fp:
+                self._hashes.update(json.load(fp))
+        except FileNotFoundError:
+            pass
+
+    def _save_hashes(self, path):
+        # Write and rename, so a crash never leaves half a file.
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as fp:
+            json.dump(self._hashes, fp, indent=0, sort_keys=True)
+        os.replace(tmp_path, path)
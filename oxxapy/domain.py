@@ -6,13 +6,110 @@ Copyright (C) 2021 Walter Doekes, OSSO B.V.
 
 See README.rst for more info.
 """
-from .exceptions import OxxapyApplicationError
+from collections import OrderedDict
+from decimal import Decimal, InvalidOperation
+from sys import intern
+from threading import Lock
+from time import monotonic
+
+from .bulk import OxxapyBulkJob, concurrent_map
+from .exceptions import OxxapyApplicationError, OxxapyDeadlineExceeded
 from .manager import Manager
+from .profiling import profiled
+from .tracing import traced
+
+
+def normalize_domain_name(name):
+    """
+    Return name lowercased and IDNA encoded (punycode)
+
+    Raises ValueError for names that cannot be a domain.
+    """
+    name = name.strip().rstrip('.').lower()
+    if '.' not in name:
+        raise ValueError(f'{name!r} has no tld')
+    try:
+        return name.encode('idna').decode('ascii')
+    except UnicodeError as e:
+        raise ValueError(f'{name!r}: {e}')
+
+
+class OxxapyDomainCheck:
+    """
+    Availability of a domain name, as yielded by check_many()
+
+    source is 'api', 'cache' (an earlier check) or 'portfolio' (the
+    domain is in the last full listing). On failure, free is None and
+    error is (code, message).
+    """
+    __slots__ = ('name', 'free', 'price', 'source', 'error', 'checked')
+
+    def __init__(self, name, free, price=None, source='api', error=None):
+        self.name = name
+        self.free = free
+        self.price = price
+        self.source = source
+        self.error = error
+        self.checked = monotonic()
+
+    def __repr__(self):
+        if self.error is not None:
+            return f'<OxxapyDomainCheck({self.name}, error={self.error})>'
+        return (
+            f'<OxxapyDomainCheck({self.name}, free={self.free}, '
+            f'price={self.price}, source={self.source})>')
+
+
+class OxxapyDomainCheckCache:
+    """
+    The most recent OxxapyDomainChecks, for check_many()
+
+    Kept in check order, so the oldest (first to expire) checks are
+    evicted first: when more than max_size are kept, and when they are
+    older than the ttl of a lookup.
+    """
+    def __init__(self, max_size=10000):
+        self.max_size = max_size
+        self._checks = OrderedDict()  # name -> OxxapyDomainCheck
+        self._lock = Lock()
+
+    def __len__(self):
+        return len(self._checks)
+
+    def get(self, name, ttl):
+        "Return the check of name if it is younger than ttl, or None"
+        with self._lock:
+            self._expire(ttl)
+            return self._checks.get(name)
+
+    def set(self, check):
+        with self._lock:
+            self._checks[check.name] = check
+            self._checks.move_to_end(check.name)
+            while len(self._checks) > self.max_size:
+                self._checks.popitem(last=False)
+
+    def _expire(self, ttl):
+        expired = monotonic() - ttl
+        while self._checks:
+            oldest = next(iter(self._checks.values()))
+            if oldest.checked > expired:
+                break
+            self._checks.popitem(last=False)
 
 
 class OxxapyDomain:
     "Bound domain manager"
+    # Slots keep the thousands of listed domains small, whatever the
+    # order in which the attributes are set. Unset slots make hasattr()
+    # return False, like before.
+    __slots__ = (
+        '_core', '_name', '_sld', '_tld', '_nsgroup', '_reg_c', '_admin_c',
+        '_tech_c', '_bill_c', '_autorenew', '_expire_date', '_dnssec',
+        '_reseller')
+
     @classmethod
+    @profiled('build')
     def from_xml(cls, core, xml_domain):
         """
         Turn _OxxapyXml into domain with prefilled values
@@ -78,13 +175,15 @@ class OxxapyDomain:
             return True
         return False
 
+    @profiled('build')
     def _update_from_xml(self, xml_domain):
-        # IDs
-        self._nsgroup = xml_domain.get_str_value('nsgroup')
-        self._reg_c = xml_domain.get_str_value('identity-registrant')
-        self._admin_c = xml_domain.get_str_value('identity-admin')
-        self._tech_c = xml_domain.get_str_value('identity-tech')
-        self._bill_c = xml_domain.get_str_value('identity-billing')
+        # IDs; the same few handles are used by many domains, so share
+        # the strings instead of keeping a copy per domain.
+        self._nsgroup = intern(xml_domain.get_str_value('nsgroup'))
+        self._reg_c = intern(xml_domain.get_str_value('identity-registrant'))
+        self._admin_c = intern(xml_domain.get_str_value('identity-admin'))
+        self._tech_c = intern(xml_domain.get_str_value('identity-tech'))
+        self._bill_c = intern(xml_domain.get_str_value('identity-billing'))
 
         # Renew
         self._autorenew = xml_domain.get_bool_value('autorenew')
@@ -103,10 +202,12 @@ class OxxapyDomain:
         if self._tld == 'nl':
             try:
                 self._reseller = (
-                    xml_domain.get_str_value('identity-reseller') or None)
+                    intern(xml_domain.get_str_value('identity-reseller'))
+                    or None)
             except OxxapyApplicationError:
                 pass
 
+    @traced()
     def _update(self):
         self._update_from_xml(self._call('domain_inf').get_child('details'))
 
@@ -163,19 +264,31 @@ class OxxapyDomain:
             self._update()
         return self._core.resellers.get(self._reseller)
 
+    @traced()
     def is_free(self):
         "Return whether the domain is free (True) or not (False)"
+        return self._check().free
+
+    def _check(self):
+        "Return OxxapyDomainCheck with availability and price"
         # > Met dit commando kan de beschikbaarheid van een domein
         # > worden gecontroleerd (vrij of bezet).
         resp = self._call('domain_check')
         if resp.status[1] == 10:
-            return False
+            return OxxapyDomainCheck(self._name, False)
         elif resp.status[1] == 11:
-            return True
+            # > <price>0</price>
+            price = resp.get_str_value('price').strip()
+            try:
+                price = Decimal(price) if price else None
+            except InvalidOperation:
+                price = None  # like '12,50'; it is free nonetheless
+            return OxxapyDomainCheck(self._name, True, price=price)
         raise OxxapyApplicationError(
             resp.status[1], 'unspected status code', req=resp.orig_req,
             resp=resp)
 
+    @traced()
     def set_autorenew(self, boolean):
         "Set/change auto renew status"  # (idempotent)
         assert boolean in (True, False), boolean
@@ -184,6 +297,29 @@ class OxxapyDomain:
         # > het systeem wordt verlengd.
         return self._call('autorenew', autorenew=boolean)
 
+    @traced()
+    def set_nsgroup(self, nsgroup, dnssec_delete=None):
+        """
+        Change the nameserver group
+
+        With dnssec_delete=True, the DNSSEC material is removed as well;
+        needed when the new nameservers do not sign the zone.
+        """
+        from .nsgroup import OxxapyNsgroup
+        if not isinstance(nsgroup, OxxapyNsgroup):
+            raise TypeError('nsgroup must be OxxapyNsgroup type')
+        # > - NSGROUP (optioneel) Nieuwe waarde NSGROUP (handle)
+        # > - DNSSEC_DELETE (optioneel) Verwijderd DNSSEC materiaal bij
+        # >   wisselen nameservers (Y/N)
+        params = {'nsgroup': nsgroup.handle}
+        if dnssec_delete is not None:
+            assert dnssec_delete in (True, False), dnssec_delete
+            params['dnssec_delete'] = dnssec_delete
+        self._call('domain_ns_upd', **params)
+        self._nsgroup = nsgroup.handle
+        if dnssec_delete:
+            self._dnssec = False
+
     def set_reg_c(self, identity):
         "Change owner/reg_c/identity-registrant"
         raise NotImplementedError('''\
@@ -194,6 +330,7 @@ class OxxapyDomain:
             doorberekend.''')
         self._reg_c = self._set_identity('identity-registrant', identity)
 
+    @traced()
     def set_c(self, admin_c=None, tech_c=None, bill_c=None):
         "Change admin_c + tech_c + bill_c at once"
         # It is sometimes needed to set multiple identities at once:
@@ -245,6 +382,7 @@ class OxxapyDomain:
         assert orderobj.status[0]
         return identity.handle
 
+    @traced()
     def set_reseller(self, reseller):
         "Change or unset (None) reseller"
         from .reseller import OxxapyReseller
@@ -270,59 +408,108 @@ class OxxapyDomain:
             'domain_upd', **{'identity-reseller': reseller.handle})
 
 
-class OxxapyDomains(Manager):
-    "Unbound domain manager"
-    def __init__(self, core):
-        self._core = core
+class OxxapyDomainQuerySet:
+    """
+    Lazy domain_list query, as returned by api.domains.filter()
 
-    def get(self, domain):
-        "Get a single bound domain"
-        return OxxapyDomain(self._core, domain)
+    Nothing is fetched until the query set is iterated. Chained
+    filter() calls are merged, and order_by() and slices are done by
+    the API (SORTNAME/SORTORDER/START/RECORDS):
 
-    def all(self):
-        "Get all domains AS AN ITERABLE"
-        return self.filter()
-
-    def filter(
-            self, domain=None, tld=None, nsgroup=None, identity=None,
-            autorenew=None, lock=None, expire_date=None, status=None,
-            status_days=None, reseller=None):
-        "Get all domains that fit the filter expression AS AN ITERABLE"
-        params = {'records': -1}
+        soon = api.domains.filter(tld='nl').order_by('expire_date')[:20]
+        for domain in soon:  # a single domain_list of 20 domains
+            ...
 
-        if domain is None and tld is not None:
-            params['tld'] = tld
-        elif domain is not None and tld is None:
-            if '.' in domain:
-                params['sld'], params['tld'] = domain.split('.', 1)
-            else:
-                params['sld'] = domain
-        elif domain is not None and tld is not None:
-            raise NotImplementedError('do not use both tld and domain')
+    count() and exists() fetch one record and read the total. The
+    reseller is not in the listing: that filter costs a domain_inf per
+    domain, and slices of it are taken locally.
 
-        if nsgroup is not None:
-            params['nsgroup'] = nsgroup
-
-        if identity is not None:
-            from .identity import OxxapyIdentity
-            if not isinstance(identity, OxxapyIdentity):
-                raise TypeError('identity must be OxxapyIdentity type')
-            params['identity'] = identity.handle
-
-        if autorenew is not None:
-            assert autorenew in (True, False), autorenew
-            params['autorenew'] = autorenew
+    The cheapest plan is used; a fresh full listing can answer the
+    query without an API call. See plan() and explain().
+    """
+    def __init__(self, core, filters=None, ordering=None, start=0,
+                 stop=None):
+        self._core = core
+        self._filters = filters or {}  # the filter() keyword arguments
+        self._ordering = ordering  # (sortname, sortorder) or None
+        self._start = start
+        self._stop = stop  # None for "until the end"
 
-        assert lock is None, NotImplemented
-        assert expire_date is None, NotImplemented
-        assert status is None, NotImplemented
-        assert status_days is None, NotImplemented
+    def __repr__(self):
+        return f'<OxxapyDomainQuerySet({self._filters})>'
+
+    def _clone(self, **changes):
+        kwargs = {
+            'filters': self._filters, 'ordering': self._ordering,
+            'start': self._start, 'stop': self._stop}
+        kwargs.update(changes)
+        return type(self)(self._core, **kwargs)
+
+    def _is_sliced(self):
+        return self._start != 0 or self._stop is not None
+
+    def filter(self, domain=None, tld=None, nsgroup=None, identity=None,
+               autorenew=None, lock=None, expire_date=None, status=None,
+               status_days=None, reseller=None):
+        "Return a query set with these filters added to the current ones"
+        if self._is_sliced():
+            raise TypeError('cannot filter a query set once it is sliced')
+        filters = dict(self._filters)
+        for key, value in (
+                ('domain', domain), ('tld', tld), ('nsgroup', nsgroup),
+                ('identity', identity), ('autorenew', autorenew),
+                ('lock', lock), ('expire_date', expire_date),
+                ('status', status), ('status_days', status_days),
+                ('reseller', reseller)):
+            if value is None:
+                continue
+            if filters.get(key, value) != value:
+                raise ValueError(f'conflicting {key} filters')
+            filters[key] = value
+        ret = self._clone(filters=filters)
+        ret._params()  # fail here, not when iterated
+        return ret
 
-        if reseller is not None:
-            from .reseller import OxxapyReseller
-            if not isinstance(reseller, OxxapyReseller):
-                raise TypeError('reseller must be OxxapyReseller type')
+    def order_by(self, field):
+        """
+        Return a query set ordered by field; '-field' orders descending
 
+        field is a domain_list field, like 'expire_date'; 'name' is
+        the domainname.
+        """
+        if self._is_sliced():
+            raise TypeError('cannot order a query set once it is sliced')
+        sortorder = 'ASC'
+        if field.startswith('-'):
+            field, sortorder = field[1:], 'DESC'
+        if field == 'name':
+            field = 'domainname'
+        return self._clone(ordering=(field, sortorder))
+
+    def __getitem__(self, key):
+        if isinstance(key, int):
+            if key < 0:
+                raise IndexError('negative indexing is not supported')
+            for domain in self[key:key + 1]:
+                return domain
+            raise IndexError('query set index out of range')
+        if not isinstance(key, slice) or key.step is not None:
+            raise TypeError('only slices without step are supported')
+        if (key.start or 0) < 0 or (key.stop is not None and key.stop < 0):
+            raise IndexError('negative indexing is not supported')
+
+        # A slice of a slice is a slice of the original.
+        start = self._start + (key.start or 0)
+        stop = self._stop
+        if key.stop is not None:
+            stop = self._start + key.stop
+            if self._stop is not None:
+                stop = min(stop, self._stop)
+            stop = max(stop, start)
+        return self._clone(start=start, stop=stop)
+
+    def _params(self):
+        "Return the domain_list search parameters"
         # Variabelen:
         # - START (optioneel) Startveld van de lijstweergave (standaard = 0)
         # > - RECORDS (optioneel) Maximaal te tonen records in
@@ -351,17 +538,480 @@ class OxxapyDomains(Manager):
         # >   o Renew Alle aankomende verlengingen (te combineren met DAYS)
         # > - DAYS (optioneel) Zoekwaarde die te combineren is met
         # >   status parameters.
-        resp = self._core._call('domain_list', **params)
-        details = resp.get_child('details')
+        filters = self._filters
+        params = {}
+        domain, tld = filters.get('domain'), filters.get('tld')
+        if domain is not None and tld is not None:
+            raise NotImplementedError('do not use both tld and domain')
+        elif tld is not None:
+            params['tld'] = tld
+        elif domain is not None:
+            if '.' in domain:
+                params['sld'], params['tld'] = domain.split('.', 1)
+            else:
+                params['sld'] = domain
+
+        if 'nsgroup' in filters:
+            params['nsgroup'] = filters['nsgroup']
+
+        if 'identity' in filters:
+            from .identity import OxxapyIdentity
+            if not isinstance(filters['identity'], OxxapyIdentity):
+                raise TypeError('identity must be OxxapyIdentity type')
+            params['identity'] = filters['identity'].handle
+
+        if 'autorenew' in filters:
+            assert filters['autorenew'] in (True, False), filters['autorenew']
+            params['autorenew'] = filters['autorenew']
+
+        assert 'lock' not in filters, NotImplemented
+        assert 'expire_date' not in filters, NotImplemented
+        assert 'status' not in filters, NotImplemented
+        assert 'status_days' not in filters, NotImplemented
+
+        if 'reseller' in filters:
+            from .reseller import OxxapyReseller
+            if not isinstance(filters['reseller'], OxxapyReseller):
+                raise TypeError('reseller must be OxxapyReseller type')
+        return params
+
+    def _list(self, start=0, records=-1, paged=False):
+        "Call domain_list; return the details"
+        params = self._params()
+        if self._ordering is not None:
+            params['sortname'], params['sortorder'] = self._ordering
+        elif paged:
+            # Pages of a stable order, the order of the unsliced list.
+            params['sortname'] = 'domainname'
+        if start:
+            params['start'] = start
+        params['records'] = records
+        return self._core._call('domain_list', **params).get_child('details')
+
+    def _cached_listing(self):
+        "Return the cached full listing and its age, or (None, None)"
+        listed = self._core.domains._listed
+        if listed is None:
+            return None, None
+        return self._core._cache_values(OxxapyDomain), monotonic() - listed
+
+    def _matches(self, domain):
+        "Return whether the listed domain fits the filters (not reseller)"
+        filters = self._filters
+        if 'domain' in filters:
+            sld, _, tld = filters['domain'].lower().partition('.')
+            if sld not in domain._sld or (tld and tld != domain._tld):
+                return False
+        if 'tld' in filters and filters['tld'].lower() != domain._tld:
+            return False
+        if 'nsgroup' in filters and getattr(
+                filters['nsgroup'], 'handle',
+                filters['nsgroup']) != domain._nsgroup:
+            return False
+        if 'identity' in filters and filters['identity'].handle not in (
+                domain._reg_c, domain._admin_c, domain._tech_c,
+                domain._bill_c):
+            return False
+        if 'autorenew' in filters and (
+                filters['autorenew'] != domain._autorenew):
+            return False
+        return True
+
+    def _local(self, matching):
+        "Return the matching cached domains, ordered and sliced"
+        ret = list(matching)
+        if self._ordering is None:
+            ret.sort()
+        else:
+            sortname, sortorder = self._ordering
+            attr = '_name' if sortname == 'domainname' else f'_{sortname}'
+            ret.sort(
+                key=(lambda domain: (getattr(domain, attr), domain)),
+                reverse=(sortorder == 'DESC'))
+        if 'reseller' not in self._filters:
+            ret = ret[self._start:self._stop]
+        return ret
+
+    def _plans(self, counting=False):
+        """
+        Return the OxxapyQueryPlans and the matching cached domains
+
+        'api' lists the domains with domain_list; 'cache' uses the full
+        listing of less than listing_ttl seconds ago, if listing_ttl is
+        set. A full listing (all()) always comes from the API. The
+        reseller is not listed: it needs a domain_inf per (NL) domain
+        that was not fetched before, one at a time or, with '+hydrate',
+        concurrently. The estimates come from the cached listing, even
+        an old one; the rows are counted before the reseller filter.
+        """
+        from .planner import PLAN_WORKERS, OxxapyQueryPlan
+
+        reseller = self._filters.get('reseller')
+        listing, age = self._cached_listing()
+        matching = None
+        rows = api_inf = cache_inf = None
+        if listing is not None:
+            # Filtered once; only the cache plan needs them sorted.
+            matching = [domain for domain in listing if self._matches(domain)]
+            rows = len(matching)
+            if reseller is None:
+                rows = len(range(rows)[self._start:self._stop])
+            # Listed NL domains have no reseller yet; the others have.
+            api_inf = sum(1 for domain in matching if domain._tld == 'nl')
+            cache_inf = sum(
+                1 for domain in matching if not hasattr(domain, '_reseller'))
+
+        sources = [('api', api_inf)]
+        can_sort = self._ordering is None or self._ordering[0] in (
+            'domainname', 'expire_date', 'nsgroup', 'autorenew')
+        full = not self._filters and not self._is_sliced()
+        if (age is not None and age < self._core.domains.listing_ttl and
+                can_sort and not full):
+            sources.insert(0, ('cache', cache_inf))
+
+        ret = []
+        for source, inf_calls in sources:
+            hydrations = [(source, 1)]
+            if reseller is not None and not self._is_sliced():
+                # A slice stops early, so that is done one at a time.
+                hydrations.append((f'{source}+hydrate', PLAN_WORKERS))
+            for strategy, workers in hydrations:
+                plan = OxxapyQueryPlan(strategy, rows)
+                if source == 'cache':
+                    plan.add(f'filter the listing of {age:.0f}s ago locally')
+                elif counting and reseller is None:
+                    plan.add('domain_list of 1 record for the total', 1)
+                else:
+                    plan.add(f'domain_list with {self._params()}', 1)
+                if reseller is not None:
+                    plan.add(
+                        'domain_inf per domain for the reseller', inf_calls,
+                        workers)
+                ret.append(plan)
+        return ret, matching
+
+    def plan(self, counting=False):
+        "Return the cheapest OxxapyQueryPlan, the one that is used"
+        from .planner import cheapest
+        return cheapest(self._plans(counting=counting)[0])
+
+    def explain(self, counting=False):
+        """
+        Return the considered plans as text; * marks the chosen one
+
+        Example:
+
+            >>> print(api.domains.filter(
+            ...     tld='nl', reseller=api.resellers.none()).explain())
+            * cache+hydrate: ~40 rows, 40 API calls, cost 6.0
+                - filter the listing of 12s ago locally (0 calls)
+                - domain_inf per domain for the reseller (40 calls, ...)
+              cache: ~40 rows, 40 API calls, cost 40.0
+              ...
+        """
+        from .planner import explain
+        return explain(self._plans(counting=counting)[0])
+
+    @traced()
+    def count(self):
+        "Return the number of domains, without fetching them all"
+        from .planner import cheapest
+
+        if 'reseller' in self._filters:
+            return sum(1 for domain in self)
+        plans, matching = self._plans(counting=True)
+        if cheapest(plans).strategy == 'cache':
+            return len(range(len(matching))[self._start:self._stop])
+        total = self._list(records=1).get_int_value('domains_total')
+        stop = total if self._stop is None else min(total, self._stop)
+        return max(0, stop - self._start)
+
+    def exists(self):
+        "Return whether there are any domains, without fetching them all"
+        if 'reseller' in self._filters:
+            for domain in self:
+                return True
+            return False
+        return self.count() > 0
+
+    # Named like the generator that filter() was, for the traces.
+    @traced('OxxapyDomains.filter')
+    def __iter__(self):
+        from .planner import cheapest
+
+        plans, matching = self._plans()
+        plan = cheapest(plans)
+        reseller = self._filters.get('reseller')
+        if plan.strategy.startswith('cache'):
+            ret = self._local(matching)
+        else:
+            ret = self._fetch()
+
+        if reseller is None:
+            yield from ret
+            return
+
+        if plan.strategy.endswith('+hydrate'):
+            self._hydrate_resellers(ret)
+
+        # The reseller needs a domain_inf per domain; slice afterwards.
+        found = 0
+        for idx, domain in enumerate(ret):
+            if self._stop is not None and found >= self._stop:
+                break
+            try:
+                if domain.reseller != reseller:
+                    continue
+            except OxxapyDeadlineExceeded as e:
+                # Report the domains we could not check, not just the
+                # single domain_inf call.
+                raise OxxapyDeadlineExceeded(e.args[0], ret[idx:])
+            found += 1
+            if found > self._start:
+                yield domain
+
+    def _fetch(self):
+        "Return the domains from domain_list, ordered and sliced"
+        if 'reseller' in self._filters or not self._is_sliced():
+            details = self._list()
+        elif self._stop == self._start:
+            return []
+        else:
+            details = self._list(
+                start=self._start, records=(
+                    -1 if self._stop is None else self._stop - self._start),
+                paged=True)
+
+        full = not self._filters and not self._is_sliced()
+        # A full listing keeps what domain_inf added (the reseller).
+        cached = {}
+        if full:
+            cached = {
+                domain._name: domain
+                for domain in self._core._cache_values(OxxapyDomain)}
         ret = []
-        for domain in details.get_children('domain'):
-            ret.append(OxxapyDomain.from_xml(self._core, domain))
-        ret.sort()
-
-        # Return domains as iterable so we get immediate results.
-        for domain in ret:
-            # If we have to do post-processing, that may take some addition
-            # time.
-            if reseller is not None and domain.reseller != reseller:
+        for xml_domain in details.get_children('domain'):
+            domain = cached.get(
+                xml_domain.get_str_value('domainname').lower())
+            if domain is not None:
+                domain._update_from_xml(xml_domain)
+            else:
+                domain = OxxapyDomain.from_xml(self._core, xml_domain)
+            ret.append(domain)
+        if self._ordering is None:
+            ret.sort()
+
+        # A full listing is the portfolio index for check_many(), and
+        # the cached listing for the plans.
+        if full:
+            self._core._cache_clear(OxxapyDomain)
+            for domain in ret:
+                self._core._cache_set(OxxapyDomain, domain.name, domain)
+            self._core.domains._listed = monotonic()
+        return ret
+
+    def _hydrate_resellers(self, domains):
+        "Fetch the missing resellers concurrently, if that is cheaper"
+        from .planner import PLAN_WORKERS, calls_cost
+
+        todo = [domain for domain in domains if not hasattr(
+            domain, '_reseller')]
+        # The estimate may have been off; check with the real number.
+        if calls_cost(len(todo), PLAN_WORKERS) >= calls_cost(len(todo)):
+            return
+        unfinished = []
+        for domain, _, error in concurrent_map(
+                (lambda domain: domain._update()), todo,
+                workers=PLAN_WORKERS):
+            if isinstance(error, OxxapyDeadlineExceeded):
+                unfinished.append(domain)
+            elif error is not None:
+                raise error
+        if unfinished:
+            raise OxxapyDeadlineExceeded(
+                'deadline exceeded during reseller hydration',
+                sorted(unfinished))
+
+
+class OxxapyDomains(Manager):
+    """
+    Unbound domain manager
+
+    Set listing_ttl (seconds) to let filtered or sliced queries (see
+    OxxapyDomainQuerySet) use the cached full listing (from all())
+    while it is younger than that, if that is cheaper than asking the
+    API. Changes made elsewhere are not seen then; the default, 0,
+    always asks the API.
+    """
+    listing_ttl = 0
+
+    def __init__(self, core):
+        self._core = core
+        self._listed = None  # monotonic() of the last full listing
+        self._checks = OxxapyDomainCheckCache()
+
+    def get(self, domain):
+        "Get a single bound domain"
+        return OxxapyDomain(self._core, domain)
+
+    def all(self):
+        "Get all domains AS AN ITERABLE"
+        return self.filter()
+
+    @traced()
+    def check_many(self, names, workers=8, ttl=300, max_rate=None):
+        """
+        Check the availability of many domain names AS AN ITERABLE
+
+        Names are normalized (see normalize_domain_name()) and
+        deduplicated. Names in the last all() listing, and names checked
+        less than ttl seconds ago, are answered without an API call.
+        The others are checked concurrently, in workers threads, and
+        with max_rate no more than that many per second. (The fair
+        scheduler of an OxxapyAccountPool limits them as well.)
+        OxxapyDomainCheck results are yielded as they arrive, so not in
+        the order of names.
+
+        The checks are kept in an OxxapyDomainCheckCache of at most
+        max_size (10000) names; older ones are evicted.
+
+        Example:
+
+            for check in api.domains.check_many(candidates):
+                if check.free:
+                    print(check.name, check.price)
+        """
+        todo = []
+        seen = set()
+        for name in names:
+            try:
+                name = normalize_domain_name(name)
+            except ValueError as e:
+                yield OxxapyDomainCheck(name, None, error=(0, str(e)))
+                continue
+            if name in seen:
+                continue
+            seen.add(name)
+
+            if self._core._cache_find(OxxapyDomain, name) is not None:
+                yield OxxapyDomainCheck(name, False, source='portfolio')
+                continue
+            cached = self._checks.get(name, ttl)
+            if cached is not None:
+                yield OxxapyDomainCheck(
+                    name, cached.free, price=cached.price, source='cache')
                 continue
-            yield domain
+            todo.append(name)
+
+        unfinished = []
+        for name, check, error in concurrent_map(
+                (lambda name: self.get(name)._check()), todo,
+                workers=workers, max_rate=max_rate):
+            if isinstance(error, OxxapyDeadlineExceeded):
+                unfinished.append(name)
+            elif error is not None:
+                yield OxxapyDomainCheck(
+                    name, None, error=(error.args[0], error.args[1]))
+            else:
+                self._checks.set(check)
+                yield check
+        if unfinished:
+            raise OxxapyDeadlineExceeded(
+                'deadline exceeded during check_many', unfinished)
+
+    @traced()
+    def bulk_set_autorenew(self, domains, boolean, journal=None, workers=4):
+        """
+        Call set_autorenew(boolean) on all domains concurrently
+
+        If journal (a filename) is set, every outcome is appended to it
+        and domains that were done in a previous run are skipped.
+        Returns an OxxapyBulkResult.
+        """
+        job = OxxapyBulkJob(journal=journal, workers=workers)
+        return job.run(domains, (lambda domain: (
+            domain.set_autorenew(boolean))))
+
+    @traced()
+    def bulk_set_reseller(self, domains, reseller, journal=None, workers=4):
+        "Call set_reseller(reseller) on all domains; see bulk_set_autorenew"
+        job = OxxapyBulkJob(journal=journal, workers=workers)
+        return job.run(domains, (lambda domain: (
+            domain.set_reseller(reseller))))
+
+    @traced()
+    def bulk_set_nsgroup(self, domains, nsgroup, dnssec_delete=None,
+                         journal=None, workers=4, max_rate=None,
+                         progress=None):
+        """
+        Call set_nsgroup() on all domains; see bulk_set_autorenew
+
+        Domains that are known to have nsgroup already are skipped. At
+        most max_rate domains per second are started; progress is
+        called with the OxxapyBulkResult now and then, for example:
+        progress=(lambda result: print(result.summary())).
+        """
+        job = OxxapyBulkJob(
+            journal=journal, workers=workers, max_rate=max_rate,
+            progress=progress)
+        return job.run(
+            domains, (lambda domain: domain.set_nsgroup(
+                nsgroup, dnssec_delete=dnssec_delete)),
+            skip=(lambda domain: (
+                getattr(domain, '_nsgroup', None) == nsgroup.handle)))
+
+    @traced()
+    def migrate_nsgroup(self, old, new, refresh=False, **kwargs):
+        """
+        Move all domains from nsgroup old to nsgroup new
+
+        The domains are selected from the last full listing (all()),
+        which is only fetched if there is none, or if refresh is set.
+        Domains already on new count as skipped. The other arguments
+        are passed to bulk_set_nsgroup().
+
+        Example:
+
+            result = api.domains.migrate_nsgroup(
+                api.nsgroups.get('RG0000001'), api.nsgroups.get('RG0000002'),
+                journal='ns-migration.journal', max_rate=5,
+                progress=(lambda result: print(result.summary())))
+        """
+        domains = self._core._cache_values(OxxapyDomain)
+        if refresh or not domains:
+            domains = list(self.all())
+        domains = sorted(
+            domain for domain in domains
+            if getattr(domain, '_nsgroup', None) in (old.handle, new.handle))
+        return self.bulk_set_nsgroup(domains, new, **kwargs)
+
+    @traced()
+    def bulk_set_c(self, changes, journal=None, workers=4):
+        """
+        Call set_c(**kwargs) for all (domain, kwargs) pairs in changes
+
+        Example:
+
+            api.domains.bulk_set_c(
+                ((domain, {'tech_c': osso_c, 'bill_c': osso_c})
+                 for domain in domains), journal='set_c.journal')
+        """
+        job = OxxapyBulkJob(journal=journal, workers=workers)
+        return job.run(
+            changes, (lambda change: change[0].set_c(**change[1])),
+            key=(lambda change: change[0].name))
+
+    def filter(
+            self, domain=None, tld=None, nsgroup=None, identity=None,
+            autorenew=None, lock=None, expire_date=None, status=None,
+            status_days=None, reseller=None):
+        """
+        Get all domains that fit the filter expression AS AN ITERABLE
+
+        Returns a lazy OxxapyDomainQuerySet: nothing is fetched until it
+        is iterated.
+        """
+        return OxxapyDomainQuerySet(self._core).filter(
+            domain=domain, tld=tld, nsgroup=nsgroup, identity=identity,
+            autorenew=autorenew, lock=lock, expire_date=expire_date,
+            status=status, status_days=status_days, reseller=reseller)
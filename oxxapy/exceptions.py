@@ -28,3 +28,19 @@ class OxxapyApplicationError(OxxapyError):
     "API abstraction error"
     def __init__(self, xmlok_status, message, req, resp):
         super().__init__(xmlok_status, message, req, resp)
+
+
+class OxxapyDeadlineExceeded(OxxapyError):
+    "Time budget spent; unfinished holds the work that was not done"
+    def __init__(self, message, unfinished):
+        super().__init__(message, unfinished)
+
+
+class OxxapyCircuitOpenError(OxxapyTransportError):
+    "API not called, because it has been failing recently"
+
+
+class OxxapyCallBudgetExceeded(OxxapyError):
+    "More API calls than allowed by api.call_budget()"
+    def __init__(self, message, commands):
+        super().__init__(message, commands)
@@ -0,0 +1,137 @@
+# vim: set ts=8 sw=4 sts=4 et ai tw=79:
+"""
+OXXA API Library in Python (oxxapy), licensed under the LGPLv3+.
+
+Copyright (C) 2021 Walter Doekes, OSSO B.V.
+
+See README.rst for more info.
+"""
+from collections import deque
+from contextvars import copy_context
+from queue import Empty, Queue
+from threading import Lock, Thread
+from time import monotonic
+
+from .transport import OxxapyCancelScope
+
+
+class OxxapyLatencyTracker:
+    "Keeps the most recent latencies per command"
+    def __init__(self, size=200, min_samples=20):
+        self._size = size
+        self._min_samples = min_samples
+        self._samples = {}
+        self._lock = Lock()
+
+    def add(self, command, seconds):
+        with self._lock:
+            if command not in self._samples:
+                self._samples[command] = deque(maxlen=self._size)
+            self._samples[command].append(seconds)
+
+    def percentile(self, command, pct):
+        "Return the pct-th percentile latency, or None if unknown"
+        with self._lock:
+            samples = sorted(self._samples.get(command, ()))
+        if len(samples) < self._min_samples:
+            return None
+        idx = min(len(samples) - 1, int(len(samples) * pct / 100.0))
+        return samples[idx]
+
+
+class OxxapyHedger:
+    """
+    Sends a second identical request if the first one is slow
+
+    If a call has not completed within the pct-th percentile of the
+    recent latencies of that command, a second identical request is
+    sent. The first successful answer wins and the other request is
+    cancelled. At most max_rate of the recent calls are hedged, so we
+    never double the load on the API.
+
+    Only use this for idempotent (read-only) commands.
+    """
+    def __init__(self, commands, percentile=95, max_rate=0.05, window=1000,
+                 tracker=None):
+        self.commands = frozenset(commands)
+        self.percentile = percentile
+        self.max_rate = max_rate
+        self.tracker = tracker or OxxapyLatencyTracker()
+        self._history = deque(maxlen=window)  # 1 if hedged, else 0
+        self._lock = Lock()
+
+    @property
+    def hedge_rate(self):
+        with self._lock:
+            if not self._history:
+                return 0.0
+            return sum(self._history) / len(self._history)
+
+    def _record(self, hedged):
+        "Record one call; every call is recorded once, when decided"
+        with self._lock:
+            self._history.append(1 if hedged else 0)
+
+    def _may_hedge(self):
+        with self._lock:
+            hedged = sum(self._history)
+            allowed = (hedged + 1) <= self.max_rate * (
+                len(self._history) + 1)
+            self._history.append(1 if allowed else 0)
+            return allowed
+
+    def call(self, command, func):
+        "Call func() (without arguments), hedging it if it is slow"
+        t0 = monotonic()
+        delay = self.tracker.percentile(command, self.percentile)
+        if delay is None:
+            # Not enough samples yet; just do the call.
+            self._record(False)
+            ret = func()
+            self.tracker.add(command, monotonic() - t0)
+            return ret
+
+        outcomes = Queue()
+        scopes = [self._start(command, func, outcomes, t0)]
+        try:
+            outcome = outcomes.get(timeout=delay)
+            self._record(False)
+        except Empty:
+            # Slower than usual. Hedge, if we're allowed to.
+            if self._may_hedge():
+                scopes.append(self._start(command, func, outcomes, t0))
+            outcome = outcomes.get()
+
+        # Wait for the first success. Only fail if every attempt failed.
+        pending = len(scopes) - 1
+        while outcome[1] is not None and pending:
+            outcome = outcomes.get()
+            pending -= 1
+
+        for scope in scopes:
+            if scope is not outcome[0]:
+                scope.cancel()
+        if outcome[1] is not None:
+            raise outcome[1]
+        return outcome[2]
+
+    def _start(self, command, func, outcomes, t0):
+        scope = OxxapyCancelScope()
+
+        def attempt():
+            with scope:
+                try:
+                    ret = func()
+                except Exception as e:
+                    outcomes.put((scope, e, None))
+                else:
+                    # The latency the caller saw, from the start of the
+                    # call. Measuring a hedge from its own start would
+                    # bias the percentile down, and hedge ever more.
+                    self.tracker.add(command, monotonic() - t0)
+                    outcomes.put((scope, None, ret))
+
+        # In the context of the caller, for its api.deadline().
+        Thread(
+            target=copy_context().run, args=(attempt,), daemon=True).start()
+        return scope
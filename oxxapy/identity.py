@@ -6,12 +6,35 @@ Copyright (C) 2021 Walter Doekes, OSSO B.V.
 
 See README.rst for more info.
 """
-from .manager import Manager
+from threading import Lock
+from time import monotonic
+
+from .bulk import OxxapyBulkResult, concurrent_map
+from .exceptions import OxxapyDeadlineExceeded
+from .manager import ListingManager
+from .profiling import profiled
+from .tracing import traced
+
+# Seconds that the identity_get details are used before fetching again.
+DEFAULT_TTL = 3600
+
+# Hydration locks, shared by handle hash: a lock per identity would
+# double the size of the thousands of cached identities.
+_HYDRATE_LOCKS = tuple(Lock() for _ in range(64))
 
 
 class OxxapyIdentity:
     "Bound identity manager"
+    # Slots keep the thousands of listed identities small, like the
+    # domains. Unset slots make hasattr() return False.
+    __slots__ = (
+        '_core', '_handle', '_hydrated', '_alias', '_company_name',
+        '_jobtitle', '_firstname', '_lastname', '_street', '_number',
+        '_suffix', '_postalcode', '_city', '_state', '_tel', '_fax',
+        '_email', '_country')
+
     @classmethod
+    @profiled('build')
     def from_xml(cls, core, xml_identity):
         """
         Turn _OxxapyXml into identity with prefilled values
@@ -31,6 +54,7 @@ class OxxapyIdentity:
     def __init__(self, core, handle):
         self._core = core
         self._handle = handle
+        self._hydrated = None  # monotonic() of the last identity_get
 
     def __hash__(self):
         return hash(self._handle)
@@ -43,6 +67,7 @@ class OxxapyIdentity:
             return True
         return False
 
+    @profiled('build')
     def _update_from_xml(self, xml_identity):
         # FIXME: more fields..
         self._alias = xml_identity.get_str_value('alias')
@@ -56,8 +81,54 @@ class OxxapyIdentity:
 
         self._company_name = xml_identity.get_str_value('company_name')
 
+    @profiled('build')
+    def _update_from_details(self, xml_details):
+        """
+        Update from the identity_get details
+
+        <details>
+          <company>Y</company>
+          <company_name>ACME Inc</company_name>
+          <jobtitle/>
+          <firstname>John</firstname>
+          <lastname>Doe</lastname>
+          <street>Adres</street>
+          <number>4</number>
+          <suffix/>
+          <postalcode>1234AB</postalcode>
+          <city>STAD</city>
+          <state/>
+          <tel>0123456789</tel>
+          <fax/>
+          <email>john@example.com</email>
+          <country>NL</country>
+          <last_updated>07-08-2008 11:06 (d-m-y h:m)</last_updated>
+        </details>
+        """
+        for field in (
+                'company_name', 'jobtitle', 'firstname', 'lastname',
+                'street', 'number', 'suffix', 'postalcode', 'city',
+                'state', 'tel', 'fax', 'email', 'country'):
+            setattr(self, f'_{field}', xml_details.get_str_value(field))
+
     def _update(self):
-        raise NotImplementedError()
+        resp = self._core._call('identity_get', identity=self._handle)
+        self._update_from_details(resp.get_child('details'))
+        self._hydrated = monotonic()
+
+    def _is_fresh(self, ttl):
+        return (
+            self._hydrated is not None and monotonic() - self._hydrated < ttl)
+
+    def _hydrate(self, ttl=None):
+        "Fetch the details, unless they were fetched less than ttl ago"
+        if ttl is None:
+            ttl = self._core.identities.ttl
+        if not self._is_fresh(ttl):
+            with _HYDRATE_LOCKS[hash(self._handle) % len(_HYDRATE_LOCKS)]:
+                # Threads that waited for the lock use the same details.
+                if not self._is_fresh(ttl):
+                    self._update()
 
     def __repr__(self):
         return f'<OxxapyIdentity({self._handle})>'
@@ -70,16 +141,69 @@ class OxxapyIdentity:
     def alias(self):
         return self._alias
 
+    @property
+    def company_name(self):
+        if not hasattr(self, '_company_name'):
+            self._hydrate()
+        return self._company_name
+
+    @property
+    def firstname(self):
+        if not hasattr(self, '_firstname'):
+            self._hydrate()
+        return self._firstname
+
+    @property
+    def lastname(self):
+        if not hasattr(self, '_lastname'):
+            self._hydrate()
+        return self._lastname
+
+    @property
+    def email(self):
+        self._hydrate()
+        return self._email
+
+    @property
+    def tel(self):
+        self._hydrate()
+        return self._tel
+
     @property
     def nameaddr(self):
+        self._hydrate()
         return '{} {} <{}>'.format(
             self._firstname, self._lastname, self._email)
 
 
-class OxxapyIdentities(Manager):
-    "Unbound identity manager"
+def _listed_name(identity):
+    "Return the name as identity_list shows it"
+    if identity._firstname:
+        return f'{identity._lastname}, {identity._firstname}'
+    return identity._lastname
+
+
+class OxxapyIdentities(ListingManager):
+    """
+    Unbound identity manager
+
+    The details of an identity (email, tel, address) are fetched with
+    identity_get when first used, once per handle, and used for ttl
+    seconds. Use hydrate() to fetch those of many identities at once.
+    """
+    type_ = OxxapyIdentity
+    command = 'identity_list'
+    tag = 'identity'
+    fields = {
+        'handle': (lambda identity: identity.handle),
+        'name': _listed_name,
+        'company_name': (lambda identity: identity._company_name),
+        'alias': (lambda identity: identity._alias),
+    }
+
     def __init__(self, core):
-        self._core = core
+        super().__init__(core)
+        self.ttl = DEFAULT_TTL
 
     def get(self, handle):
         "Get a single bound identity"
@@ -87,22 +211,67 @@ class OxxapyIdentities(Manager):
             OxxapyIdentity, handle, (lambda: (
                 OxxapyIdentity(self._core, handle))))
 
-    def all(self):
-        "Get all identities"
-        return self.filter()
+    @traced()
+    def hydrate(self, identities, workers=8):
+        """
+        Fetch the details of many identities concurrently
+
+        identities holds identities or handles. Duplicates, and
+        identities fetched less than ttl seconds ago, are skipped.
+        Returns an OxxapyBulkResult.
 
+        Example:
+
+            domains = list(api.domains.all())
+            api.identities.hydrate(domain.reg_c for domain in domains)
+            for domain in domains:
+                print(domain, domain.reg_c.nameaddr)  # no API calls
+        """
+        result = OxxapyBulkResult()
+
+        def stale_identities():
+            seen = set()
+            for identity in identities:
+                handle = getattr(identity, 'handle', identity)
+                if handle in seen:
+                    continue
+                seen.add(handle)
+                # Hydrate the cached identity, as the domains use that.
+                identity = self.get(handle)
+                if identity._is_fresh(self.ttl):
+                    result.skipped += 1
+                else:
+                    yield identity
+
+        unfinished = []
+        for identity, _, error in concurrent_map(
+                (lambda identity: identity._hydrate(self.ttl)),
+                stale_identities(), workers=workers):
+            if isinstance(error, OxxapyDeadlineExceeded):
+                unfinished.append(identity.handle)
+            elif error is not None:
+                result.failed += 1
+                result.failures.append(
+                    (identity.handle, error.args[0], error.args[1]))
+            else:
+                result.ok += 1
+        if unfinished:
+            raise OxxapyDeadlineExceeded(
+                'deadline exceeded during hydrate', unfinished)
+        return result
+
+    @traced()
     def filter(
             self, handle=None, name=None, company_name=None, alias=None,
-            global_search=None):
-        "Get all identities that fit the filter expression"
-        params = {'records': -1}
-
-        assert handle is None, NotImplemented
-        assert name is None, NotImplemented
-        assert company_name is None, NotImplemented
-        assert alias is None, NotImplemented
-        assert global_search is None, NotImplemented
+            global_search=None, sortname=None, sortorder=None, start=0,
+            records=-1):
+        """
+        Get the identities that fit the filter expression
 
+        The search values are passed to the API, which finds them
+        anywhere in the field (case insensitive); see ListingManager
+        for when the cached listing is used instead.
+        """
         # > Variabelen:
         # > - HANDLE (optioneel) Zoekwaarde voor de identity handle.
         # > - NAME (optioneel) Zoekwaarde voor de naam.
@@ -115,15 +284,11 @@ class OxxapyIdentities(Manager):
         # >   (standaard: 0).
         # > - RECORDS (optioneel) Hoeveel records moeten er worden weergegeven
         # >   (standaard: 25, -1 is alles).
-        resp = self._core._call('identity_list', **params)
-        details = resp.get_child('details')
-        ret = []
-
-        self._core._cache_clear(OxxapyIdentity)
-        for xml_identity in details.get_children('identity'):
-            identity = OxxapyIdentity.from_xml(self._core, xml_identity)
-            self._core._cache_set(OxxapyIdentity, identity.handle, identity)
-            ret.append(identity)
-
-        ret.sort()
-        return ret
+        searches = dict(
+            (param, value) for param, value in (
+                ('handle', handle), ('name', name),
+                ('company_name', company_name), ('alias', alias))
+            if value is not None)
+        return self._list(
+            searches, global_search=global_search, sortname=sortname,
+            sortorder=sortorder, start=start, records=records)
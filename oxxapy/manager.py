@@ -6,6 +6,9 @@ Copyright (C) 2021 Walter Doekes, OSSO B.V.
 
 See README.rst for more info.
 """
+from time import monotonic
+
+from .search import OxxapySearchIndex
 
 
 class Manager:
@@ -48,3 +51,142 @@ class Manager:
 
     def __init__(self, core):
         self._core = core
+
+
+def select_listed(objects, fields, searches, sortname=None, sortorder=None,
+                  start=0, records=-1):
+    """
+    Filter, sort and page listed objects like the API list commands do
+
+    fields maps the parameter names to functions that return the listed
+    value of an object. A search value must be in that value (case
+    insensitive).
+    """
+    ret = [
+        obj for obj in objects
+        if all(value.lower() in (fields[param](obj) or '').lower()
+               for param, value in searches.items())]
+    if sortname is None:
+        ret.sort()
+    else:
+        ret.sort(
+            key=(lambda obj: ((fields[sortname](obj) or '').lower(), obj)),
+            reverse=((sortorder or 'ASC').upper() == 'DESC'))
+    if records < 0:
+        return ret[start:]
+    return ret[start:start + records]
+
+
+class ListingManager(Manager):
+    """
+    Manager of handle objects that are listed with a search command
+
+    Subclasses set the object type, the list command, the XML tag of
+    the listed objects and the fields (see select_listed()). Their
+    filter() passes the searches to _list().
+
+    A full listing (no searches, all records) replaces the cached
+    objects; other listings are merged into the cache. A full listing
+    less than listing_ttl seconds old answers the searches locally.
+    """
+    type_ = None
+    command = None
+    tag = None
+    fields = {}
+    listing_ttl = 300
+
+    def __init__(self, core):
+        self._core = core
+        self._listed = None  # monotonic() of the last full listing
+        self._listing = []
+        self._index = OxxapySearchIndex(
+            key=(lambda obj: obj.handle), fields=self._search_fields)
+
+    def _search_fields(self, obj):
+        "Return the strings to index (from the listed fields)"
+        return tuple(field(obj) for field in self.fields.values())
+
+    def all(self):
+        "Get all objects"
+        return self.filter()
+
+    def search(self, query, limit=10, fuzzy=True):
+        """
+        Find objects by their listed fields, locally
+
+        The index is built from the last all() listing, which is done
+        if there was none, and kept up to date by the later listings.
+        See OxxapySearchIndex.search().
+        """
+        if self._index.updated is None:
+            if self._listed is None:
+                self.all()
+            self._index.update(self._listing, complete=True)
+        return self._index.search(query, limit=limit, fuzzy=fuzzy)
+
+    def _listing_answers(self, searches, sortname):
+        return (
+            self._listed is not None and
+            monotonic() - self._listed < self.listing_ttl and
+            all(param in self.fields for param in searches) and
+            (sortname is None or sortname in self.fields))
+
+    def _list(self, searches, global_search=None, sortname=None,
+              sortorder=None, start=0, records=-1):
+        """
+        Return the listed objects that fit the searches
+
+        searches holds the API parameters (without the empty ones). The
+        global_search is always done by the API, as it searches fields
+        that are not listed.
+        """
+        full = (
+            not searches and global_search is None and start == 0 and
+            records < 0)
+        if (not full and global_search is None and
+                self._listing_answers(searches, sortname)):
+            return select_listed(
+                self._listing, self.fields, searches, sortname=sortname,
+                sortorder=sortorder, start=start, records=records)
+
+        params = dict(searches, records=records)
+        if global_search is not None:
+            params['global_search'] = global_search
+        if sortname is not None:
+            params['sortname'] = sortname
+        if sortorder is not None:
+            params['sortorder'] = sortorder
+        if start:
+            params['start'] = start
+        details = self._core._call(self.command, **params).get_child(
+            'details')
+
+        # Keep the cached objects, so what was fetched about them (like
+        # the identity details) stays.
+        if full:
+            known = dict(
+                (obj.handle, obj)
+                for obj in self._core._cache_values(self.type_))
+            self._core._cache_clear(self.type_)
+        ret = []
+        for xml_obj in details.get_children(self.tag):
+            handle = xml_obj.get_str_value('handle')
+            if full:
+                obj = known.get(handle)
+            else:
+                obj = self._core._cache_find(self.type_, handle)
+            if obj is None:
+                obj = self.type_.from_xml(self._core, xml_obj)
+            else:
+                obj._update_from_xml(xml_obj)
+            self._core._cache_set(self.type_, handle, obj)
+            ret.append(obj)
+
+        if full:
+            self._listed = monotonic()
+            self._listing = sorted(ret)
+        if self._index.updated is not None:
+            self._index.update(ret, complete=full)
+        if sortname is None:
+            ret.sort()
+        return ret
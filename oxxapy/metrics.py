@@ -0,0 +1,178 @@
+# vim: set ts=8 sw=4 sts=4 et ai tw=79:
+"""
+OXXA API Library in Python (oxxapy), licensed under the LGPLv3+.
+
+Copyright (C) 2021 Walter Doekes, OSSO B.V.
+
+See README.rst for more info.
+"""
+from bisect import bisect_left
+from threading import Lock
+
+INF = float('inf')
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+    60.0, INF)
+SIZE_BUCKETS = (
+    256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, INF)
+
+# total: the entire _call(), as seen by the caller
+# connect/ttfb/download: the HTTP transport phases
+# parse: turning the bytes into an OxxapyOrder
+PHASES = ('total', 'connect', 'ttfb', 'download', 'parse')
+
+
+class OxxapyHistogram:
+    "Cumulative-bucket histogram (not thread-safe by itself)"
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def snapshot(self):
+        "Return dict with cumulative (le, count) buckets, sum and count"
+        cumulative, total = [], 0
+        for le, count in zip(self.buckets, self.counts):
+            total += count
+            cumulative.append((le, total))
+        return {'buckets': cumulative, 'sum': self.sum, 'count': self.count}
+
+
+class _OxxapyCommandMetrics:
+    def __init__(self):
+        self.calls = 0
+        self.errors = {}  # XMLERR code (or 'transport') -> count
+        self.latency = dict(
+            (phase, OxxapyHistogram(LATENCY_BUCKETS)) for phase in PHASES)
+        self.size = OxxapyHistogram(SIZE_BUCKETS)
+
+
+class OxxapyMetrics:
+    """
+    Metrics registry with call counts, errors, latencies and sizes
+
+    Everything is kept per OXXA command. Example:
+
+        api.raw('domain_inf', sld='example', tld='com')
+        api.metrics.snapshot()['domain_inf']['calls']  # 1
+        print(api.metrics.render_openmetrics())
+    """
+    def __init__(self):
+        self._commands = {}
+        self._lock = Lock()
+
+    def _get(self, command):
+        if command not in self._commands:
+            self._commands[command] = _OxxapyCommandMetrics()
+        return self._commands[command]
+
+    def observe_call(self, command, seconds, error=None):
+        "Record a finished call; error is None, an XMLERR int or a str"
+        with self._lock:
+            metrics = self._get(command)
+            metrics.calls += 1
+            metrics.latency['total'].observe(seconds)
+            if error is not None:
+                metrics.errors[error] = metrics.errors.get(error, 0) + 1
+
+    def observe_transfer(self, command, timings, size, parse=None):
+        "Record the transport phase timings, byte size and parse time"
+        with self._lock:
+            metrics = self._get(command)
+            for phase, seconds in timings.items():
+                metrics.latency[phase].observe(seconds)
+            metrics.size.observe(size)
+            if parse is not None:
+                metrics.latency['parse'].observe(parse)
+
+    def reset(self):
+        with self._lock:
+            self._commands = {}
+
+    def snapshot(self):
+        """
+        Return a (deep) copy of all metrics as plain dicts
+
+            {'domain_inf': {
+                'calls': 3, 'errors': {24: 1},
+                'latency': {'total': {'buckets': [...], 'sum': 0.3,
+                                      'count': 3}, ...},
+                'size': {'buckets': [...], 'sum': 2048, 'count': 3}}}
+        """
+        with self._lock:
+            return dict(
+                (command, {
+                    'calls': metrics.calls,
+                    'errors': dict(metrics.errors),
+                    'latency': dict(
+                        (phase, hist.snapshot())
+                        for phase, hist in metrics.latency.items()),
+                    'size': metrics.size.snapshot(),
+                }) for command, metrics in self._commands.items())
+
+    def render_openmetrics(self, prefix='oxxapy'):
+        "Return the metrics in the OpenMetrics (Prometheus) text format"
+        snapshot = self.snapshot()
+        out = []
+
+        out.append(f'# TYPE {prefix}_calls counter')
+        out.append(f'# HELP {prefix}_calls API calls per command.')
+        for command, metrics in sorted(snapshot.items()):
+            out.append('{}_calls_total{} {}'.format(
+                prefix, _labels(command=command), metrics['calls']))
+
+        out.append(f'# TYPE {prefix}_errors counter')
+        out.append(
+            f'# HELP {prefix}_errors Failed API calls per XMLERR code.')
+        for command, metrics in sorted(snapshot.items()):
+            for code, count in sorted(
+                    metrics['errors'].items(), key=(lambda x: str(x[0]))):
+                out.append('{}_errors_total{} {}'.format(
+                    prefix, _labels(command=command, code=code), count))
+
+        out.append(f'# TYPE {prefix}_latency_seconds histogram')
+        out.append(
+            f'# HELP {prefix}_latency_seconds API call latency per phase.')
+        for command, metrics in sorted(snapshot.items()):
+            for phase in PHASES:
+                _render_histogram(
+                    out, f'{prefix}_latency_seconds',
+                    metrics['latency'][phase], command=command, phase=phase)
+
+        out.append(f'# TYPE {prefix}_response_bytes histogram')
+        out.append(f'# HELP {prefix}_response_bytes API response sizes.')
+        for command, metrics in sorted(snapshot.items()):
+            _render_histogram(
+                out, f'{prefix}_response_bytes', metrics['size'],
+                command=command)
+
+        out.append('# EOF')
+        return '\n'.join(out) + '\n'
+
+
+def _labels(**labels):
+    return '{{{}}}'.format(','.join(
+        '{}="{}"'.format(key, _escape(value))
+        for key, value in labels.items()))
+
+
+def _escape(value):
+    return (
+        str(value).replace('\\', '\\\\').replace('\n', '\\n')
+        .replace('"', '\\"'))
+
+
+def _render_histogram(out, name, hist, **labels):
+    for le, count in hist['buckets']:
+        le = '+Inf' if le == INF else repr(float(le))
+        out.append('{}_bucket{} {}'.format(
+            name, _labels(**labels, le=le), count))
+    out.append('{}_sum{} {}'.format(name, _labels(**labels), hist['sum']))
+    out.append('{}_count{} {}'.format(name, _labels(**labels), hist['count']))
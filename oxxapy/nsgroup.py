@@ -6,12 +6,15 @@ Copyright (C) 2021 Walter Doekes, OSSO B.V.
 
 See README.rst for more info.
 """
-from .manager import Manager
+from .manager import ListingManager
+from .profiling import profiled
+from .tracing import traced
 
 
 class OxxapyNsgroup:
     "Bound nameservergroup manager"
     @classmethod
+    @profiled('build')
     def from_xml(cls, core, xml_nsgroup):
         """
         Turn _OxxapyXml into nameservergroup with prefilled values
@@ -46,6 +49,7 @@ class OxxapyNsgroup:
             return True
         return False
 
+    @profiled('build')
     def _update_from_xml(self, xml_nsgroup):
         self._alias = xml_nsgroup.get_str_value('alias')
 
@@ -64,28 +68,31 @@ class OxxapyNsgroup:
         return self._alias
 
 
-class OxxapyNsgroups(Manager):
+class OxxapyNsgroups(ListingManager):
     "Unbound nameservergroup manager"
-    def __init__(self, core):
-        self._core = core
+    type_ = OxxapyNsgroup
+    command = 'nsgroup_list'
+    tag = 'nsgroup'
+    fields = {
+        'nsgroup': (lambda nsgroup: nsgroup.handle),
+        'alias': (lambda nsgroup: nsgroup._alias),
+    }
 
     def get(self, handle):
         "Get a single bound nameservergroup"
         return self._core._cache_get(
             OxxapyNsgroup, handle, (lambda: OxxapyNsgroup(self._core, handle)))
 
-    def all(self):
-        "Get all nameservergroups"
-        return self.filter()
-
-    def filter(self, handle=None, global_search=None, alias=None):
-        "Get all nameservergroups that fit the filter expression"
-        params = {'records': -1}
-
-        assert handle is None, NotImplemented
-        assert global_search is None, NotImplemented
-        assert alias is None, NotImplemented
+    @traced()
+    def filter(self, handle=None, global_search=None, alias=None,
+               sortname=None, sortorder=None, start=0, records=-1):
+        """
+        Get the nameservergroups that fit the filter expression
 
+        The search values are passed to the API, which finds them
+        anywhere in the field (case insensitive); see ListingManager
+        for when the cached listing is used instead.
+        """
         # > Variabelen:
         # > - SORTNAME (optioneel) Veld waarop gesorteerd moet worden.
         # > - SORTORDER (optioneel) Sorteervolgorde (ASC of DESC).
@@ -96,15 +103,10 @@ class OxxapyNsgroups(Manager):
         # >   weergave (standaard: 0).
         # > - RECORDS (optioneel) Hoeveel records moeten er worden weergegeven
         # >   (standaard: 25, -1 is alles).
-        resp = self._core._call('nsgroup_list', **params)
-        details = resp.get_child('details')
-        ret = []
-
-        self._core._cache_clear(OxxapyNsgroup)
-        for xml_nsgroup in details.get_children('nsgroup'):
-            nsgroup = OxxapyNsgroup.from_xml(self._core, xml_nsgroup)
-            self._core._cache_set(OxxapyNsgroup, nsgroup.handle, nsgroup)
-            ret.append(nsgroup)
-
-        ret.sort()
-        return ret
+        searches = dict(
+            (param, value) for param, value in (
+                ('nsgroup', handle), ('alias', alias))
+            if value is not None)
+        return self._list(
+            searches, global_search=global_search, sortname=sortname,
+            sortorder=sortorder, start=start, records=records)
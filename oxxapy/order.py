@@ -0,0 +1,329 @@
+# vim: set ts=8 sw=4 sts=4 et ai tw=79:
+"""
+OXXA API Library in Python (oxxapy), licensed under the LGPLv3+.
+
+Copyright (C) 2021 Walter Doekes, OSSO B.V.
+
+See README.rst for more info.
+"""
+from concurrent.futures import Future
+from threading import Lock
+from time import sleep
+
+from .diagnostics import bulk_calls
+from .domain import normalize_domain_name
+from .exceptions import (
+    OxxapyDeadlineExceeded, OxxapyTransactionError, OxxapyTransportError)
+from .manager import Manager
+from .profiling import profiled
+from .tracing import traced
+
+# Order states, as in the STATUS parameter of order_list.
+STATES = {'pending': 'P', 'success': 'S', 'error': 'E'}
+
+# Up to this many finished orders are looked up with an order_list per
+# domain; more are found in the success and error listings.
+DOMAIN_LOOKUPS = 2
+
+
+class OxxapyListedOrder:
+    "An order, as listed by order_list"
+    __slots__ = ('order_id', 'name', 'type', 'state', 'foa', 'description')
+
+    @classmethod
+    @profiled('build')
+    def from_xml(cls, xml_order):
+        """
+        Turn _OxxapyXml into a listed order
+
+        <domain>
+          <orders_id>123456</orders_id>
+          <sld>example1</sld>
+          <tld>org</tld>
+          <status>transfer</status>
+          <type>pending</type>
+          <foa>Y</foa>
+          <description>
+            Oude eigenaar heeft niet op de mail geantwoord, een fax is
+            vereist.
+          </description>
+          <date_created>2009-01-26 11:37:29</date_created>
+        </domain>
+
+        NOTE: The API docs show the order type in <status/> and the
+        state in <type/>, the other way around from the parameters. We
+        accept both.
+        """
+        ret = cls()
+        ret.order_id = xml_order.get_int_value('orders_id')
+        ret.name = '{}.{}'.format(
+            xml_order.get_str_value('sld'),
+            xml_order.get_str_value('tld')).lower()
+        kind = xml_order.get_str_value('status').strip().lower()
+        state = xml_order.get_str_value('type').strip().lower()
+        if kind in STATES:
+            kind, state = state, kind
+        ret.type = kind
+        ret.state = STATES.get(state, state)
+        ret.foa = xml_order.get_str_value('foa')
+        ret.description = ' '.join(
+            xml_order.get_str_value('description').split())
+        return ret
+
+    def __repr__(self):
+        return (
+            f'<OxxapyListedOrder({self.order_id}, {self.name}, {self.type}, '
+            f'{self.state})>')
+
+
+class OxxapyOrderOutcome:
+    "Outcome of a tracked order; status is 'ok' or 'failed'"
+    __slots__ = ('name', 'status', 'code', 'message')
+
+    def __init__(self, name, status, code=None, message=None):
+        self.name = name
+        self.status = status
+        self.code = code
+        self.message = message
+
+    def __repr__(self):
+        return (
+            f'<OxxapyOrderOutcome({self.name}, {self.status}, '
+            f'{self.code}, {self.message!r})>')
+
+
+class OxxapyOrderTracker:
+    """
+    Follow many pending orders with few API calls
+
+    Every poll lists all pending orders (order_list status=P, paged).
+    Tracked orders that are no longer listed are done; their outcomes
+    are read from order_list: per domain for a few, else from the
+    status=S and status=E listings, newest first, until the orders are
+    older than the tracked ones. Orders that were never seen pending,
+    or are not found, get a transfer_status (transfers) or domain_inf
+    (other orders) call. The poll interval grows by backoff while
+    nothing completes, up to max_interval.
+
+    Example:
+
+        tracker = api.orders.tracker()
+        for name in transferred:
+            tracker.track(name, callback=print)
+        for outcome in tracker.as_completed():
+            ...
+
+    track() returns a concurrent.futures.Future as well. Put the loop in
+    an api.deadline() block to stop waiting at some point.
+    """
+    def __init__(self, core, interval=30, max_interval=600, backoff=1.5,
+                 page_size=100):
+        self._core = core
+        self.interval = interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.page_size = page_size
+        self._tracked = {}  # name -> (type, Future)
+        self._order_ids = {}  # name -> last seen pending order id
+        self._lock = Lock()
+
+    def __len__(self):
+        "Return the number of orders that are not done yet"
+        with self._lock:
+            return len(self._tracked)
+
+    def track(self, name, type_='transfer', callback=None):
+        """
+        Track the pending order for the domain name; return a Future
+
+        The future result (and the callback argument) is an
+        OxxapyOrderOutcome.
+        """
+        name = normalize_domain_name(name)
+        with self._lock:
+            if name not in self._tracked:
+                self._tracked[name] = (type_, Future())
+            future = self._tracked[name][1]
+        if callback is not None:
+            future.add_done_callback(lambda future: callback(future.result()))
+        return future
+
+    @traced()
+    def poll(self):
+        "Poll once; return the outcomes of the orders that completed"
+        with bulk_calls():
+            return self._poll()
+
+    def _poll(self):
+        pending = set()
+        for order in self._core.orders.filter(
+                state='P', page_size=self.page_size):
+            pending.add(order.name)
+            with self._lock:
+                if order.name in self._tracked:
+                    self._order_ids[order.name] = order.order_id
+        with self._lock:
+            gone = [
+                (name, type_) for name, (type_, future) in
+                self._tracked.items() if name not in pending]
+
+        done = self._listed_done(dict(gone)) if gone else {}
+        outcomes = []
+        for name, type_ in gone:
+            outcome = done.get(name) or self._outcome(name, type_)
+            if outcome is None:
+                continue  # still pending after all; try again next poll
+            with self._lock:
+                future = self._tracked.pop(name)[1]
+                self._order_ids.pop(name, None)
+            future.set_result(outcome)
+            outcomes.append(outcome)
+        return outcomes
+
+    def _listed_done(self, types):
+        """
+        Return the outcomes of the finished orders of {name: type}
+
+        Only orders that were seen pending are looked up: a listed order
+        of at least that order id is the tracked one (or a newer one).
+        The others, and those not found, are left to _outcome().
+        """
+        with self._lock:
+            floors = dict(
+                (name, self._order_ids[name]) for name in types
+                if name in self._order_ids)
+        if not floors:
+            return {}
+
+        if len(floors) <= DOMAIN_LOOKUPS:
+            listings = [
+                self._core.orders.filter(
+                    type_=types[name], domain=name, page_size=self.page_size,
+                    newest_first=True)
+                for name in sorted(floors)]
+        else:
+            kinds = set(types[name] for name in floors)
+            type_ = kinds.pop() if len(kinds) == 1 else None
+            listings = [
+                self._core.orders.filter(
+                    state=state, type_=type_, page_size=self.page_size,
+                    newest_first=True)
+                for state in ('S', 'E')]
+
+        oldest = min(floors.values())
+        found = {}  # name -> OxxapyListedOrder
+        for listing in listings:
+            if len(found) == len(floors):
+                break
+            for order in listing:
+                if order.order_id < oldest:
+                    break  # the rest is older than any tracked order
+                floor = floors.get(order.name)
+                if (floor is None or order.order_id < floor or
+                        order.state == 'P' or types[order.name] != order.type):
+                    continue  # not tracked, older, or still pending
+                if (order.name not in found or
+                        order.order_id > found[order.name].order_id):
+                    found[order.name] = order
+                if len(found) == len(floors):
+                    break
+        return dict(
+            (name, OxxapyOrderOutcome(
+                name, 'ok' if order.state == 'S' else 'failed',
+                message=order.description))
+            for name, order in found.items())
+
+    def _outcome(self, name, type_):
+        "Return the OxxapyOrderOutcome, or None if still pending"
+        sld, tld = name.split('.', 1)
+        command = 'transfer_status' if type_ == 'transfer' else 'domain_inf'
+        try:
+            resp = self._core._call(command, sld=sld, tld=tld)
+        except OxxapyTransactionError as e:
+            return OxxapyOrderOutcome(name, 'failed', e.args[0], e.args[1])
+        except OxxapyTransportError:
+            return None
+        success, code, message = resp.status
+        if success is None:
+            # > <status_code>XMLPEN 4</status_code>
+            return None
+        return OxxapyOrderOutcome(
+            name, 'ok', code, ' '.join((message or '').split()))
+
+    def as_completed(self):
+        "Poll until all tracked orders are done; yield the outcomes"
+        interval = self.interval
+        while len(self):
+            try:
+                outcomes = self.poll()
+            except OxxapyDeadlineExceeded as e:
+                with self._lock:
+                    unfinished = sorted(self._tracked)
+                raise OxxapyDeadlineExceeded(e.args[0], unfinished)
+            except OxxapyTransportError:
+                outcomes = None
+                interval = min(interval * 2, self.max_interval)
+
+            if outcomes:
+                interval = self.interval
+                yield from outcomes
+            elif outcomes is not None:
+                interval = min(interval * self.backoff, self.max_interval)
+
+            if len(self):
+                deadline = self._core._deadline
+                if deadline is not None:
+                    # Wake up in time to report the unfinished orders.
+                    deadline.check(sorted(self._tracked))
+                    sleep(deadline.cap_timeout(interval))
+                else:
+                    sleep(interval)
+
+
+class OxxapyOrders(Manager):
+    "Unbound order manager"
+    def __init__(self, core):
+        self._core = core
+
+    @traced()
+    def filter(self, state=None, type_=None, domain=None, page_size=100,
+               newest_first=False):
+        """
+        Get the orders that fit the filter AS AN ITERABLE
+
+        state is 'P' (pending), 'S' (success) or 'E' (error). The list
+        is fetched page_size orders at a time; with newest_first, the
+        highest order ids first.
+        """
+        # > - STATUS (optioneel) Zoekvoorwaarde voor status: (E)rror,
+        # >   (P)ending, (S)uccess. (standaard = A)
+        # > - TYPE (optioneel) Transfer / register.
+        params = {'records': page_size}
+        if state is not None:
+            assert state in STATES.values(), state
+            params['status'] = state
+        if type_ is not None:
+            params['type'] = type_
+        if domain is not None:
+            params['sld'], params['tld'] = normalize_domain_name(
+                domain).split('.', 1)
+        if newest_first:
+            params['sortname'], params['sortorder'] = 'orders_id', 'DESC'
+
+        start = 0
+        while True:
+            details = self._core._call(
+                'order_list', start=start, **params).get_child('details')
+            page = details.get_children('domain')
+            for xml_order in page:
+                yield OxxapyListedOrder.from_xml(xml_order)
+            start += len(page)
+            if not page or start >= details.get_int_value('domains_total'):
+                break
+
+    def tracker(self, interval=30, max_interval=600, backoff=1.5,
+                page_size=100):
+        "Return a new OxxapyOrderTracker"
+        return OxxapyOrderTracker(
+            self._core, interval=interval, max_interval=max_interval,
+            backoff=backoff, page_size=page_size)
@@ -0,0 +1,102 @@
+# vim: set ts=8 sw=4 sts=4 et ai tw=79:
+"""
+OXXA API Library in Python (oxxapy), licensed under the LGPLv3+.
+
+Copyright (C) 2021 Walter Doekes, OSSO B.V.
+
+See README.rst for more info.
+"""
+from math import ceil
+
+# Costs are in sequential API calls. Calls done by a pool of workers
+# cost 1/workers each, plus POOL_OVERHEAD for the threads and extra
+# connections. Without anything to estimate from, UNKNOWN_ROWS rows are
+# assumed.
+PLAN_WORKERS = 8
+POOL_OVERHEAD = 1.0
+UNKNOWN_ROWS = 100
+
+
+def calls_cost(calls, workers=1):
+    "Return the cost of calls API calls (None for unknown)"
+    if calls is None:
+        calls = UNKNOWN_ROWS
+    if workers == 1 or not calls:
+        return float(calls)
+    return ceil(calls / workers) + POOL_OVERHEAD
+
+
+class OxxapyQueryStep:
+    "A step of a query plan; calls is the estimated API calls or None"
+    __slots__ = ('description', 'calls', 'workers')
+
+    def __init__(self, description, calls=0, workers=1):
+        self.description = description
+        self.calls = calls
+        self.workers = workers
+
+    @property
+    def cost(self):
+        return calls_cost(self.calls, self.workers)
+
+    def __str__(self):
+        calls = '?' if self.calls is None else self.calls
+        workers = f', {self.workers} workers' if self.workers > 1 else ''
+        return f'{self.description} ({calls} calls{workers})'
+
+
+class OxxapyQueryPlan:
+    """
+    One way to answer a query, with its estimated cost
+
+    strategy names the source of the rows ('api' or 'cache') and, with
+    '+hydrate', that the missing fields are fetched concurrently. rows
+    is the estimated number of rows, or None if unknown.
+    """
+    def __init__(self, strategy, rows=None):
+        self.strategy = strategy
+        self.rows = rows
+        self.steps = []
+
+    def add(self, description, calls=0, workers=1):
+        "Add a step"
+        self.steps.append(OxxapyQueryStep(description, calls, workers))
+
+    @property
+    def api_calls(self):
+        "Return the estimated number of API calls, or None if unknown"
+        if any(step.calls is None for step in self.steps):
+            return None
+        return sum(step.calls for step in self.steps)
+
+    @property
+    def cost(self):
+        return sum(step.cost for step in self.steps)
+
+    def __repr__(self):
+        return (
+            f'<OxxapyQueryPlan({self.strategy}, api_calls={self.api_calls}, '
+            f'cost={self.cost:.1f})>')
+
+    def __str__(self):
+        rows = '?' if self.rows is None else self.rows
+        calls = '?' if self.api_calls is None else self.api_calls
+        lines = [
+            f'{self.strategy}: ~{rows} rows, {calls} API calls, '
+            f'cost {self.cost:.1f}']
+        lines.extend(f'  - {step}' for step in self.steps)
+        return '\n'.join(lines)
+
+
+def cheapest(plans):
+    "Return the plan with the lowest cost; the first one of a tie"
+    return min(plans, key=(lambda plan: plan.cost))
+
+
+def explain(plans):
+    "Return the plans as text, the cheapest (chosen) one marked with *"
+    chosen = cheapest(plans)
+    return '\n'.join(
+        ('* ' if plan is chosen else '  ') +
+        str(plan).replace('\n', '\n  ')
+        for plan in plans)
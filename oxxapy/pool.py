@@ -0,0 +1,153 @@
+# vim: set ts=8 sw=4 sts=4 et ai tw=79:
+"""
+OXXA API Library in Python (oxxapy), licensed under the LGPLv3+.
+
+Copyright (C) 2021 Walter Doekes, OSSO B.V.
+
+See README.rst for more info.
+"""
+from collections import deque
+from contextlib import contextmanager
+from threading import Condition, Lock
+from time import monotonic
+
+from .transport import OxxapyHttpTransport
+
+
+class OxxapyFairScheduler:
+    """
+    Global concurrency limit with round-robin fairness across accounts
+
+    At most max_concurrency API calls run at once. When all slots are
+    taken, the waiting calls are queued per account and freed slots are
+    handed out to the accounts in turn. So a bulk job on one account
+    delays the other accounts by at most one call per round.
+    """
+    def __init__(self, max_concurrency):
+        assert max_concurrency >= 1, max_concurrency
+        self.max_concurrency = max_concurrency
+        self._free = max_concurrency
+        self._waiting = {}      # account -> deque of tickets
+        self._turns = deque()   # accounts with waiting tickets
+        self._granted = set()
+        self._cond = Condition(Lock())
+
+    @contextmanager
+    def slot(self, account, timeout=None):
+        "Hold one of the slots while inside the with-block"
+        if not self.acquire(account, timeout=timeout):
+            raise TimeoutError('no free API slot within {}s'.format(timeout))
+        try:
+            yield
+        finally:
+            self.release()
+
+    def acquire(self, account, timeout=None):
+        "Take a slot; return False if none came free within timeout"
+        with self._cond:
+            if self._free > 0 and not self._turns:
+                self._free -= 1
+                return True
+
+            ticket = object()
+            if account not in self._waiting:
+                self._waiting[account] = deque()
+                self._turns.append(account)
+            self._waiting[account].append(ticket)
+
+            expires_at = None if timeout is None else monotonic() + timeout
+            while ticket not in self._granted:
+                if expires_at is None:
+                    self._cond.wait()
+                    continue
+                remaining = expires_at - monotonic()
+                if remaining <= 0 or not self._cond.wait(remaining):
+                    if ticket in self._granted:
+                        break
+                    self._forget(account, ticket)
+                    return False
+            self._granted.remove(ticket)
+            return True
+
+    def release(self):
+        with self._cond:
+            if not self._turns:
+                self._free += 1
+                return
+            # Hand the slot to the next account in line; that account goes
+            # to the back of the line if it has more waiting.
+            account = self._turns.popleft()
+            tickets = self._waiting[account]
+            self._granted.add(tickets.popleft())
+            if tickets:
+                self._turns.append(account)
+            else:
+                del self._waiting[account]
+            self._cond.notify_all()
+
+    def _forget(self, account, ticket):
+        tickets = self._waiting[account]
+        tickets.remove(ticket)
+        if not tickets:
+            del self._waiting[account]
+            self._turns.remove(account)
+
+
+class OxxapyAccountPool:
+    """
+    Oxxapy instances for several OXXA accounts
+
+    The instances are created on demand and share a single HTTP
+    connection pool and a single concurrency limit with fair scheduling
+    across the accounts. Each account keeps its own object caches.
+
+    Example:
+
+        pool = OxxapyAccountPool(max_concurrency=8)
+        pool.add('acme', 'acme-apiuser', 'MD5...')
+        pool.add('example', 'example-apiuser', 'MD5...')
+
+        for domain in pool['acme'].domains.all():
+            print(domain)
+    """
+    def __init__(self, max_concurrency=8, timeout=None, api_url=None):
+        self._transport = OxxapyHttpTransport(max_idle=max_concurrency)
+        self._scheduler = OxxapyFairScheduler(max_concurrency)
+        self._timeout = timeout
+        self._api_url = api_url
+        self._credentials = {}
+        self._apis = {}
+        self._lock = Lock()
+
+    def add(self, name, username, password):
+        "Register account credentials under name"
+        with self._lock:
+            self._credentials[name] = (username, password)
+            self._apis.pop(name, None)
+
+    def get(self, name):
+        "Get the (shared) Oxxapy instance for the named account"
+        from . import Oxxapy
+        with self._lock:
+            if name not in self._apis:
+                username, password = self._credentials[name]
+                kwargs = {}
+                if self._timeout is not None:
+                    kwargs['timeout'] = self._timeout
+                if self._api_url is not None:
+                    kwargs['api_url'] = self._api_url
+                self._apis[name] = Oxxapy(
+                    username, password, transport=self._transport,
+                    scheduler=self._scheduler, **kwargs)
+            return self._apis[name]
+
+    def __getitem__(self, name):
+        return self.get(name)
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._credentials))
+
+    def close(self):
+        "Close the idle connections"
+        self._transport.close()
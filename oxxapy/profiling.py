@@ -0,0 +1,214 @@
+# vim: set ts=8 sw=4 sts=4 et ai tw=79:
+"""
+OXXA API Library in Python (oxxapy), licensed under the LGPLv3+.
+
+Copyright (C) 2021 Walter Doekes, OSSO B.V.
+
+See README.rst for more info.
+"""
+import atexit
+import heapq
+import os
+import sys
+import tracemalloc
+from contextlib import nullcontext
+from functools import wraps
+from threading import Lock, local
+from time import perf_counter
+
+from .wirelog import redact_params
+
+# Time spent outside these layers is attributed to "user" code.
+LAYERS = ('network', 'parse', 'build', 'cache')
+
+_NULL = nullcontext()
+_profiler = None
+
+
+class _OxxapyProfileLayer:
+    "Reusable context manager; the state is kept in the profiler"
+    __slots__ = ('profiler', 'name')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.profiler._enter(self.name)
+
+    def __exit__(self, *exc_info):
+        self.profiler._exit()
+
+
+class OxxapyProfiler:
+    """
+    Attributes wall clock time to the layers marked in the code
+
+    The time is exclusive: time spent in network I/O below a build layer
+    is counted as network only. The layers are marked with the
+    profiled() decorator and the layer() context manager, so the
+    breakdown is exact instead of sampled.
+
+    With multiple threads, the layer times are summed over all threads
+    and can exceed the wall clock time.
+    """
+    def __init__(self, top=10, memory=True):
+        self.top = top
+        self.memory = memory
+        self.totals = dict((name, 0.0) for name in LAYERS)
+        self.counts = dict((name, 0) for name in LAYERS)
+        self._slowest = []  # heap of (seconds, seq, description)
+        self._seq = 0
+        self._layers = dict(
+            (name, _OxxapyProfileLayer(self, name)) for name in LAYERS)
+        self._local = local()
+        self._lock = Lock()
+        self._t0 = None
+        self._wall = None
+        self._peak = None
+
+    def start(self):
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self._t0 = perf_counter()
+
+    def stop(self):
+        self._wall = perf_counter() - self._t0
+        if self.memory and tracemalloc.is_tracing():
+            self._peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+    def layer(self, name):
+        return self._layers[name]
+
+    def _stack(self):
+        try:
+            return self._local.stack
+        except AttributeError:
+            self._local.stack = []
+            return self._local.stack
+
+    def _enter(self, name):
+        now = perf_counter()
+        stack = self._stack()
+        if stack:
+            # Pause the outer layer.
+            outer = stack[-1]
+            with self._lock:
+                self.totals[outer[0]] += now - outer[1]
+        stack.append([name, now])
+
+    def _exit(self):
+        now = perf_counter()
+        stack = self._stack()
+        name, t0 = stack.pop()
+        with self._lock:
+            self.totals[name] += now - t0
+            self.counts[name] += 1
+        if stack:
+            # Resume the outer layer.
+            stack[-1][1] = now
+
+    def record_call(self, command, params, seconds, error=None):
+        "Remember the call if it is one of the top slowest"
+        description = f'{command} {redact_params(params)!r}'
+        if error is not None:
+            description += f' (error {error})'
+        with self._lock:
+            self._seq += 1
+            item = (seconds, self._seq, description)
+            if len(self._slowest) < self.top:
+                heapq.heappush(self._slowest, item)
+            elif item > self._slowest[0]:
+                heapq.heapreplace(self._slowest, item)
+
+    def report(self):
+        "Return the report as text"
+        wall = self._wall
+        if wall is None:
+            wall = perf_counter() - self._t0
+        with self._lock:
+            totals = dict(self.totals)
+            counts = dict(self.counts)
+            slowest = sorted(self._slowest, reverse=True)
+        user = max(0.0, wall - sum(totals.values()))
+
+        out = [f'oxxapy profile: wall {wall:.3f} s']
+        if self._peak is not None:
+            out[0] += ', peak memory {:.1f} MiB'.format(
+                self._peak / 1048576.0)
+        out.append('  {:8s} {:>10s} {:>6s} {:>9s}'.format(
+            'layer', 'seconds', '%', 'entries'))
+        for name in LAYERS:
+            out.append('  {:8s} {:10.3f} {:6.1f} {:9d}'.format(
+                name, totals[name], 100.0 * totals[name] / (wall or 1),
+                counts[name]))
+        out.append('  {:8s} {:10.3f} {:6.1f}'.format(
+            'user', user, 100.0 * user / (wall or 1)))
+        if slowest:
+            out.append(f'slowest {len(slowest)} calls:')
+            for seconds, seq, description in slowest:
+                out.append(f'  {seconds:8.3f} s  {description}')
+        return '\n'.join(out) + '\n'
+
+
+def layer(name):
+    "Context manager that marks a block as layer name (if profiling)"
+    if _profiler is None:
+        return _NULL
+    return _profiler.layer(name)
+
+
+def profiled(name):
+    "Decorator that marks the function as layer name (if profiling)"
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if _profiler is None:
+                return func(*args, **kwargs)
+            with _profiler.layer(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_call(command, params, seconds, error=None):
+    if _profiler is not None:
+        _profiler.record_call(command, params, seconds, error=error)
+
+
+def enable(top=10, memory=True, output=sys.stderr, at_exit=True):
+    """
+    Start profiling; the report is written to output at exit
+
+    Also enabled by setting OXXAPY_PROFILE=1 in the environment.
+    """
+    global _profiler
+    if _profiler is not None:
+        return _profiler
+    profiler = OxxapyProfiler(top=top, memory=memory)
+    profiler.start()
+    _profiler = profiler
+    if at_exit:
+        atexit.register(_report_at_exit, output)
+    return profiler
+
+
+def disable():
+    "Stop profiling and return the profiler (for its report())"
+    global _profiler
+    profiler, _profiler = _profiler, None
+    if profiler is not None:
+        profiler.stop()
+    return profiler
+
+
+def _report_at_exit(output):
+    profiler = disable()
+    if profiler is not None:
+        output.write(profiler.report())
+        output.flush()
+
+
+if os.environ.get('OXXAPY_PROFILE', '') not in ('', '0'):
+    enable()
@@ -6,12 +6,15 @@ Copyright (C) 2021 Walter Doekes, OSSO B.V.
 
 See README.rst for more info.
 """
-from .manager import Manager
+from .manager import ListingManager
+from .profiling import profiled
+from .tracing import traced
 
 
 class OxxapyReseller:
     "Bound reseller manager"
     @classmethod
+    @profiled('build')
     def from_xml(cls, core, xml_reseller):
         """
         Turn _OxxapyXml into reseller with prefilled values
@@ -46,6 +49,7 @@ class OxxapyReseller:
             return True
         return False
 
+    @profiled('build')
     def _update_from_xml(self, xml_reseller):
         # FIXME: more fields..
         self._alias = xml_reseller.get_str_value('alias')
@@ -85,10 +89,18 @@ class OxxapyResellerNone(OxxapyReseller):
 OxxapyReseller.NONE = OxxapyResellerNone()
 
 
-class OxxapyResellers(Manager):
+class OxxapyResellers(ListingManager):
     "Unbound reseller manager"
-    def __init__(self, core):
-        self._core = core
+    type_ = OxxapyReseller
+    command = 'resellerlist'
+    tag = 'identity'
+    # There is no <name/> in the listing (see OxxapyReseller), so name
+    # searches always go to the API.
+    fields = {
+        'handle': (lambda reseller: reseller.handle),
+        'company_name': (lambda reseller: reseller._company_name),
+        'alias': (lambda reseller: reseller._alias),
+    }
 
     def get(self, handle):
         "Get a single bound reseller"
@@ -98,19 +110,16 @@ class OxxapyResellers(Manager):
             OxxapyReseller, handle, (lambda: (
                 OxxapyReseller(self._core, handle))))
 
-    def all(self):
-        "Get all resellers"
-        return self.filter()
-
-    def filter(self, handle=None, name=None, company_name=None, alias=None):
-        "Get all resellers that fit the filter expression"
-        params = {'records': -1}
-
-        assert handle is None, NotImplemented
-        assert name is None, NotImplemented
-        assert company_name is None, NotImplemented
-        assert alias is None, NotImplemented
+    @traced()
+    def filter(self, handle=None, name=None, company_name=None, alias=None,
+               sortname=None, sortorder=None, start=0, records=-1):
+        """
+        Get the resellers that fit the filter expression
 
+        The search values are passed to the API, which finds them
+        anywhere in the field (case insensitive); see ListingManager
+        for when the cached listing is used instead.
+        """
         # > Variabelen:
         # > - HANDLE (optioneel) Zoekwaarde voor de identity handle.
         # > - NAME (optioneel) Zoekwaarde voor de naam.
@@ -122,18 +131,14 @@ class OxxapyResellers(Manager):
         # >   (standaard: 0).
         # > - RECORDS (optioneel) Hoeveel records moeten er worden weergegeven
         # >   (standaard: 25, -1 is alles)
-        resp = self._core._call('resellerlist', **params)
-        details = resp.get_child('details')
-        ret = []
-
-        self._core._cache_clear(OxxapyReseller)
-        for xml_reseller in details.get_children('identity'):
-            reseller = OxxapyReseller.from_xml(self._core, xml_reseller)
-            self._core._cache_set(OxxapyReseller, reseller.handle, reseller)
-            ret.append(reseller)
-
-        ret.sort()
-        return ret
+        searches = dict(
+            (param, value) for param, value in (
+                ('handle', handle), ('name', name),
+                ('company_name', company_name), ('alias', alias))
+            if value is not None)
+        return self._list(
+            searches, sortname=sortname, sortorder=sortorder, start=start,
+            records=records)
 
     def none(self):
         "Return the NONE reseller, useful when filtering/unsetting"
@@ -11,6 +11,19 @@ from decimal import ConversionSyntax, Decimal
 from xml.etree import ElementTree
 
 from .exceptions import OxxapyApplicationError
+from .profiling import profiled
+
+
+def split_status_code(status_code):
+    """
+    Split a status code like 'XMLPEN 3' into ('XMLPEN', 3)
+
+    The space is optional ('XMLOK18').
+    """
+    for prefix in ('XMLOK', 'XMLERR', 'XMLPEN'):
+        if status_code.startswith(prefix):
+            return prefix, int(status_code[len(prefix):].lstrip())
+    raise NotImplementedError(status_code)
 
 
 class _OxxapyXml:
@@ -118,10 +131,12 @@ class _OxxapyXml:
 
 class OxxapyResponse(_OxxapyXml):
     @classmethod
+    @profiled('parse')
     def from_binstr(cls, binstr, req):
         root = ElementTree.fromstring(binstr)
         return cls(root=root, req=req)
 
+    @profiled('parse')
     def extract_order(self):
         """
         Return inner <order/> from outer <channel/> as OxxapyOrder
@@ -149,16 +164,13 @@ class OxxapyOrder(_OxxapyXml):
     def status(self):
         """
         Get (success, status_int, status_message) tuple
+
+        success is None for XMLPEN: accepted, but not done yet (like a
+        domain transfer).
         """
-        if self._status_code.startswith('XMLOK'):
-            return (
-                True, int(self._status_code[5:].lstrip()),
-                self._status_description)
-        elif self._status_code.startswith('XMLERR'):
-            return (
-                False, int(self._status_code[6:].lstrip()),
-                self._status_description)
-        raise NotImplementedError(self._status_code)
+        prefix, code = split_status_code(self._status_code)
+        success = {'XMLOK': True, 'XMLERR': False}.get(prefix)
+        return success, code, self._status_description
 
     def is_order_complete(self, status):
         assert status in (False, True, None), status  # 'false, true, pending'
@@ -0,0 +1,200 @@
+# vim: set ts=8 sw=4 sts=4 et ai tw=79:
+"""
+OXXA API Library in Python (oxxapy), licensed under the LGPLv3+.
+
+Copyright (C) 2021 Walter Doekes, OSSO B.V.
+
+See README.rst for more info.
+"""
+import re
+import unicodedata
+from bisect import bisect_left, insort
+from collections import Counter
+from difflib import SequenceMatcher
+from heapq import nlargest, nsmallest
+from threading import Lock
+from time import monotonic
+
+# Scores of a query word that equals, prefixes or resembles a token.
+EXACT_SCORE = 1.0
+PREFIX_SCORE = 0.8
+FUZZY_SCORE = 0.5
+
+# Fuzzy matches need this SequenceMatcher ratio; only the tokens that
+# share the most trigrams with the word (and then have the closest
+# length) are compared. Trigrams that are in more than FUZZY_COMMON of
+# the tokens (like "$la" of all "lastname" tokens) are skipped, as
+# counting them costs much and selects little.
+FUZZY_RATIO = 0.75
+FUZZY_CANDIDATES = 20
+FUZZY_COMMON = 0.1
+
+_WORD_RE = re.compile(r'\w+')
+
+
+def tokenize(text):
+    "Return the lowercase words of text, without accents"
+    text = unicodedata.normalize('NFKD', text.casefold())
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return _WORD_RE.findall(text)
+
+
+def _trigrams(token):
+    padded = f'${token}$'
+    return set(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+class OxxapySearchIndex:
+    """
+    In-memory token and trigram index, for prefix and fuzzy lookups
+
+    Objects are indexed by key(obj), with the words of the strings that
+    fields(obj) returns. update() only reindexes the objects whose words
+    changed, so refreshing from a new listing is cheap.
+
+    Example:
+
+        index = OxxapySearchIndex(
+            key=(lambda nsgroup: nsgroup.handle),
+            fields=(lambda nsgroup: (nsgroup.handle, nsgroup.alias)))
+        index.update(api.nsgroups.all(), complete=True)
+        index.search('manag dns')  # [<OxxapyNsgroup(YDNR00000)>]
+
+    All query words must match a word of the object: exactly, as a
+    prefix or (with fuzzy, if nothing else matches that word) like a
+    misspelling. The best scoring objects come first.
+    """
+    def __init__(self, key, fields):
+        self._key = key
+        self._fields = fields
+        self._objects = {}  # key -> object
+        self._documents = {}  # key -> frozenset of tokens
+        self._postings = {}  # token -> set of keys
+        self._tokens = []  # sorted, for the prefix lookups
+        self._trigrams = {}  # trigram -> set of tokens
+        self._lock = Lock()
+        self.updated = None  # monotonic() of the last update
+
+    def __len__(self):
+        return len(self._objects)
+
+    def update(self, objects, complete=False):
+        """
+        Index new and changed objects
+
+        With complete, objects is everything there is: the indexed
+        objects that are not in it are removed.
+        """
+        with self._lock:
+            seen = set()
+            for obj in objects:
+                key = self._key(obj)
+                seen.add(key)
+                self._objects[key] = obj
+                tokens = frozenset(
+                    token for field in self._fields(obj) if field
+                    for token in tokenize(field))
+                old_tokens = self._documents.get(key)
+                if tokens != old_tokens:
+                    if old_tokens is not None:
+                        self._unindex(key, old_tokens)
+                    self._index(key, tokens)
+            if complete:
+                for key in [key for key in self._objects if key not in seen]:
+                    self._unindex(key, self._documents[key])
+                    del self._objects[key]
+            self.updated = monotonic()
+
+    def remove(self, obj):
+        "Remove obj from the index, if it is in it"
+        with self._lock:
+            key = self._key(obj)
+            if key in self._objects:
+                self._unindex(key, self._documents[key])
+                del self._objects[key]
+
+    def _index(self, key, tokens):
+        self._documents[key] = tokens
+        for token in tokens:
+            if token not in self._postings:
+                self._postings[token] = set()
+                insort(self._tokens, token)
+                for trigram in _trigrams(token):
+                    self._trigrams.setdefault(trigram, set()).add(token)
+            self._postings[token].add(key)
+
+    def _unindex(self, key, tokens):
+        del self._documents[key]
+        for token in tokens:
+            keys = self._postings[token]
+            keys.discard(key)
+            if not keys:
+                del self._postings[token]
+                del self._tokens[bisect_left(self._tokens, token)]
+                for trigram in _trigrams(token):
+                    trigram_tokens = self._trigrams[trigram]
+                    trigram_tokens.discard(token)
+                    if not trigram_tokens:
+                        del self._trigrams[trigram]
+
+    def _matches(self, word, fuzzy):
+        "Return {token: score} for the tokens that match word"
+        ret = {}
+        if word in self._postings:
+            ret[word] = EXACT_SCORE
+        pos = bisect_left(self._tokens, word)
+        while pos < len(self._tokens) and self._tokens[pos].startswith(word):
+            ret.setdefault(self._tokens[pos], PREFIX_SCORE)
+            pos += 1
+        if fuzzy and not ret:
+            trigram_tokens = sorted(
+                (self._trigrams[trigram] for trigram in _trigrams(word)
+                 if trigram in self._trigrams), key=len)
+            common = len(self._tokens) * FUZZY_COMMON
+            shared = Counter()
+            for pos, tokens in enumerate(trigram_tokens):
+                if pos and len(tokens) > common:
+                    break  # but always count the rarest one
+                shared.update(tokens)
+            matcher = SequenceMatcher(b=word)  # caches its analysis of b
+            candidates = nlargest(
+                FUZZY_CANDIDATES, shared.items(), key=(lambda item: (
+                    item[1], -abs(len(item[0]) - len(word)))))
+            for token, _ in candidates:
+                matcher.set_seq1(token)
+                # The quick ratios are upper bounds of ratio().
+                if (matcher.real_quick_ratio() >= FUZZY_RATIO and
+                        matcher.quick_ratio() >= FUZZY_RATIO):
+                    ratio = matcher.ratio()
+                    if ratio >= FUZZY_RATIO:
+                        ret[token] = FUZZY_SCORE * ratio
+        return ret
+
+    def search(self, query, limit=10, fuzzy=True):
+        "Return the (at most limit) best matching objects for query"
+        words = tokenize(query)
+        if not words:
+            return []
+        with self._lock:
+            matches = [self._matches(word, fuzzy) for word in words]
+            # Start with the most selective word and check the others
+            # only against the objects that are left.
+            matches.sort(key=(lambda word_matches: sum(
+                len(self._postings[token]) for token in word_matches)))
+            scores = {}
+            for token, score in matches[0].items():
+                for key in self._postings[token]:
+                    if score > scores.get(key, 0.0):
+                        scores[key] = score
+            for word_matches in matches[1:]:
+                word_scores = {}
+                for key, total in scores.items():
+                    score = max(
+                        (word_matches.get(token, 0.0)
+                         for token in self._documents[key]), default=0.0)
+                    if score:
+                        word_scores[key] = total + score
+                scores = word_scores
+            ranked = nsmallest(
+                limit, scores.items(), key=(lambda item: (-item[1], item[0])))
+            return [self._objects[key] for key, _ in ranked]
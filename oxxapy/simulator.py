@@ -0,0 +1,958 @@
+# vim: set ts=8 sw=4 sts=4 et ai tw=79:
+"""
+OXXA API Library in Python (oxxapy), licensed under the LGPLv3+.
+
+Copyright (C) 2021 Walter Doekes, OSSO B.V.
+
+See README.rst for more info.
+
+------------------------------------------------------------------------
+
+Local OXXA API simulator, for tests and benchmarks
+
+OxxapySimulator is an HTTP server that implements command.php for the
+commands used by this library. It keeps an in-memory portfolio
+(OxxapySimulatorPortfolio) that is changed by the mutating commands,
+and it can inject latency, errors, 503 bursts, slowly dripping
+responses and throttling.
+
+Example:
+
+    with OxxapySimulator(
+            OxxapySimulatorPortfolio.generate(domains=1000),
+            latency=lognormal_latency(0.05, 0.4)) as sim:
+        api = Oxxapy('USER', 'MD5...', api_url=sim.url)
+        print(len(list(api.domains.all())))
+
+Or standalone:
+
+    python3 -m oxxapy.simulator --domains 1000 --latency 0.05,0.4
+
+The status codes and the XML follow the v1.99 API docs and the
+responses seen in the wild. Where those are silent (like the code for an
+unknown domain), a code is made up.
+"""
+from collections import Counter
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import count
+from math import log
+from random import Random
+from threading import Lock, Thread
+from time import monotonic, sleep
+from urllib.parse import parse_qsl, urlsplit
+from xml.etree.ElementTree import Element, SubElement, tostring
+
+# Made up status codes (not in the API docs).
+ERR_MISSING_PARAM = 'XMLERR 2'
+ERR_UNKNOWN_COMMAND = 'XMLERR 3'
+ERR_NO_SUCH_DOMAIN = 'XMLERR 9'
+ERR_NO_SUCH_NSGROUP = 'XMLERR 10'
+ERR_NO_SUCH_IDENTITY = 'XMLERR 11'
+ERR_NO_SUCH_ITEM = 'XMLERR 45'
+ERR_EMPTY_CART = 'XMLERR 46'
+ERR_NO_SUCH_ORDER = 'XMLERR 47'
+ERR_TRANSFER_FAILED = 'XMLERR 21'
+ERR_RECORD_EXISTS = 'XMLERR 62'
+ERR_NO_SUCH_RECORD = 'XMLERR 63'
+OK_TRANSFERRED = 'XMLOK 5'
+
+# Seen in the wild.
+ERR_TAKEN = 'XMLERR 19'
+ERR_NO_PROFILES = 'XMLERR 53'
+
+DEFAULT_PRICES = {
+    'be': '4.95', 'com': '8.95', 'de': '4.50', 'eu': '4.95', 'nl': '3.07',
+    'org': '9.95'}
+
+
+def lognormal_latency(median, p99, seed=None):
+    "Return a function that yields latencies with this median and p99"
+    rnd = Random(seed)
+    # The 99th percentile of a standard normal distribution is 2.326.
+    mu, sigma = log(median), log(p99 / median) / 2.326
+    return (lambda: rnd.lognormvariate(mu, sigma))
+
+
+def _sub(parent, tag, text=None):
+    element = SubElement(parent, tag)
+    if text is not None:
+        element.text = text
+    return element
+
+
+def _yn(value):
+    return 'Y' if value else 'N'
+
+
+def _matches(value, search):
+    return search.lower() in value.lower()
+
+
+def _page(items, params):
+    "Return (page, total) for the START/RECORDS parameters"
+    start = int(params.get('start', 0))
+    records = int(params.get('records', 25))
+    if records < 0:
+        return items[start:], len(items)
+    return items[start:start + records], len(items)
+
+
+def _sorted(items, params, default):
+    # Unknown sort fields (like SLD) fall back to the default order.
+    sortname = params.get('sortname', default).lower()
+    reverse = params.get('sortorder', 'ASC').upper() == 'DESC'
+    return sorted(
+        items, reverse=reverse,
+        key=(lambda item: (str(item.get(sortname, '')), item[default])))
+
+
+class OxxapySimulatorPortfolio:
+    """
+    In-memory state of an OXXA account
+
+    The dicts are keyed by domain name, handle, cart item id or order
+    id. The domain dicts use the XML tag names as keys. Names in taken
+    are registered elsewhere: domain_check reports them as not free.
+
+    Transfers stay pending (status P in order_list) until
+    complete_order() is called for them.
+    """
+    def __init__(self, prices=DEFAULT_PRICES):
+        self.domains = {}
+        self.identities = {}
+        self.nsgroups = {}
+        self.resellers = {}
+        self.cart = {}
+        self.orders = {}
+        self.dnsrecords = {}  # domain name -> [record dict]
+        self.taken = set()
+        self.prices = dict(prices)
+        self.lock = Lock()
+        self._next_order_id = count(100000000)
+        self._next_itemid = count(1000)
+        self._next_orders_id = count(5000000)
+
+    @classmethod
+    def generate(cls, domains=100, identities=10, nsgroups=3, resellers=2,
+                 seed=1):
+        "Return a deterministic portfolio with this many objects"
+        rnd = Random(seed)
+        ret = cls()
+        for num in range(identities):
+            ret.add_identity(
+                f'IDEN{num:05d}', alias=f'alias{num}',
+                company_name=f'Company {num} B.V.',
+                name=f'Lastname{num}, Firstname{num}')
+        for num in range(nsgroups):
+            ret.add_nsgroup(f'NSGR{num:05d}', alias=f'dns{num}')
+        for num in range(resellers):
+            ret.add_reseller(
+                f'RESE{num:05d}', alias=f'reseller{num}',
+                company=f'Reseller {num} B.V.')
+        tlds = sorted(ret.prices)
+        handles = sorted(ret.identities)
+        for num in range(domains):
+            contact = rnd.choice(handles)
+            ret.add_domain(
+                f'domain{num:06d}.{tlds[num % len(tlds)]}',
+                nsgroup=f'NSGR{rnd.randrange(nsgroups):05d}',
+                reg_c=rnd.choice(handles), admin_c=contact, tech_c=contact,
+                bill_c=contact,
+                expire_date=(
+                    date(2022, 1, 1) + timedelta(days=rnd.randrange(365))),
+                autorenew=(rnd.random() < 0.9))
+        return ret
+
+    def add_identity(self, handle, alias='', company_name='', name='',
+                     email=None):
+        self.identities[handle] = {
+            'handle': handle, 'alias': alias, 'company_name': company_name,
+            'name': name, 'email': email or f'{handle.lower()}@example.org'}
+
+    def add_nsgroup(self, handle, alias='', nameservers=None):
+        if nameservers is None:
+            nameservers = [f'ns{i}.{alias or handle}.example' for i in (1, 2)]
+        self.nsgroups[handle] = {
+            'handle': handle, 'alias': alias, 'nameservers': nameservers}
+
+    def add_reseller(self, handle, alias='', company=''):
+        self.resellers[handle] = {
+            'handle': handle, 'alias': alias, 'company': company}
+
+    def add_domain(self, name, nsgroup, reg_c, admin_c=None, tech_c=None,
+                   bill_c=None, reseller='', expire_date=None,
+                   autorenew=True, lock=True, dnssec=False):
+        name = name.lower()
+        self.domains[name] = {
+            'domainname': name, 'nsgroup': nsgroup,
+            'identity-registrant': reg_c,
+            'identity-admin': admin_c or reg_c,
+            'identity-tech': tech_c or reg_c,
+            'identity-billing': bill_c or reg_c,
+            'identity-reseller': reseller,
+            'expire_date': (expire_date or date(2022, 1, 1)).isoformat(),
+            'autorenew': autorenew, 'lock': lock, 'dnssec': dnssec}
+
+    def complete_order(self, name, success=True, description=None):
+        "Finish the pending order for domain name"
+        with self.lock:
+            order = [
+                order for order in self.orders.values()
+                if order['domainname'] == name and order['status'] == 'P'][-1]
+            order['status'] = 'S' if success else 'E'
+            if success:
+                order['description'] = description or 'Order is afgerond'
+                self._add_item_domain(order['item'])
+            else:
+                order['description'] = description or (
+                    'Verhuizing geweigerd door huidige registrar')
+
+    def handle(self, params):
+        "Run the command in params; return the XML response as bytes"
+        command = params.get('command', '')
+        method = getattr(self, f'_cmd_{command}', None)
+        with self.lock:
+            if method is None:
+                order = self._order(
+                    command, ERR_UNKNOWN_COMMAND, 'Onbekend commando')
+            else:
+                try:
+                    order = method(params)
+                except KeyError as e:
+                    order = self._order(
+                        command, ERR_MISSING_PARAM,
+                        f'Parameter {e.args[0]} ontbreekt')
+        return tostring(order, encoding='UTF-8', xml_declaration=True)
+
+    def _order(self, command, status_code, description, details=None,
+               price='0.00', order_complete='TRUE', params=None):
+        channel = Element('channel')
+        order = _sub(channel, 'order')
+        _sub(order, 'order_id', str(next(self._next_order_id)))
+        _sub(order, 'command', command)
+        if params and 'sld' in params:
+            _sub(order, 'sld', params['sld'].lower())
+            _sub(order, 'tld', params['tld'].lower())
+        _sub(order, 'status_code', status_code)
+        _sub(order, 'status_description', description)
+        _sub(order, 'price', price)
+        if isinstance(details, str):
+            _sub(order, 'details', details)
+        elif details is not None:
+            order.append(details)
+        _sub(order, 'order_complete', order_complete)
+        _sub(order, 'done', 'TRUE')
+        return channel
+
+    def _domain(self, command, params):
+        "Return (domain dict, None) or (None, error order)"
+        name = '{}.{}'.format(params['sld'], params['tld']).lower()
+        if name not in self.domains:
+            return None, self._order(
+                command, ERR_NO_SUCH_DOMAIN, 'Domeinnaam niet gevonden',
+                order_complete='FALSE', params=params)
+        return self.domains[name], None
+
+    def _cmd_domain_list(self, params):
+        sld = params.get('sld', '')
+        tld = params.get('tld', '').lower()
+        identity = params.get('identity')
+        domains = []
+        for domain in self.domains.values():
+            dsld, dtld = domain['domainname'].split('.', 1)
+            if (sld and not _matches(dsld, sld)) or (tld and dtld != tld):
+                continue
+            if params.get('nsgroup', domain['nsgroup']) != domain['nsgroup']:
+                continue
+            if identity and identity not in (
+                    domain['identity-registrant'], domain['identity-admin'],
+                    domain['identity-tech'], domain['identity-billing']):
+                continue
+            if params.get('autorenew', _yn(domain['autorenew'])) != _yn(
+                    domain['autorenew']):
+                continue
+            domains.append(domain)
+
+        page, total = _page(_sorted(domains, params, 'domainname'), params)
+        details = Element('details')
+        _sub(details, 'domains_total', str(total))
+        _sub(details, 'domains_found', str(len(page)))
+        for domain in page:
+            xml = _sub(details, 'domain')
+            for tag in (
+                    'domainname', 'nsgroup', 'identity-registrant',
+                    'identity-admin', 'identity-tech', 'identity-billing',
+                    'expire_date'):
+                _sub(xml, tag, domain[tag])
+            _sub(xml, 'autorenew', _yn(domain['autorenew']))
+            _sub(xml, 'lock', _yn(domain['lock']))
+        return self._order(
+            'domain_list', 'XMLOK18',
+            'In DETAILS vind u de uitgebreide informatie', details)
+
+    def _cmd_domain_inf(self, params):
+        domain, error = self._domain('domain_inf', params)
+        if error is not None:
+            return error
+        details = Element('details')
+        for tag in (
+                'identity-registrant', 'identity-admin', 'identity-billing',
+                'identity-tech', 'identity-reseller', 'nsgroup'):
+            _sub(details, tag, domain[tag])
+        yyyy, mm, dd = domain['expire_date'].split('-')
+        _sub(details, 'expire_date', f'{dd}-{mm}-{yyyy}')
+        _sub(details, 'autorenew', _yn(domain['autorenew']))
+        _sub(details, 'lock', _yn(domain['lock']))
+        _sub(details, 'dnssec', _yn(domain['dnssec']))
+        return self._order(
+            'domain_inf', 'XMLOK 16',
+            'In DETAILS vind u de uitgebreide informatie', details,
+            params=params)
+
+    def _cmd_domain_check(self, params):
+        name = '{}.{}'.format(params['sld'], params['tld']).lower()
+        if name in self.domains or name in self.taken:
+            return self._order(
+                'domain_check', 'XMLOK 10', 'Domein is bezet', params=params)
+        return self._order(
+            'domain_check', 'XMLOK 11', 'Domein is vrij',
+            price=self.prices.get(params['tld'].lower(), '0.00'),
+            params=params)
+
+    def _cmd_domain_upd(self, params):
+        domain, error = self._domain('domain_upd', params)
+        if error is not None:
+            return error
+        changes = dict(
+            (tag, params[tag]) for tag in (
+                'identity-registrant', 'identity-admin', 'identity-billing',
+                'identity-tech', 'identity-reseller')
+            if params.get(tag))
+        if 'identity-reseller' in changes:
+            if not domain['domainname'].endswith('.nl'):
+                del changes['identity-reseller']
+            elif changes['identity-reseller'] == 'noprofile':
+                changes['identity-reseller'] = ''
+        if not changes:
+            return self._order(
+                'domain_upd', ERR_NO_PROFILES,
+                'Er zijn geen nieuwe profielen opgegeven',
+                order_complete='FALSE', params=params)
+        domain.update(changes)
+        return self._order(
+            'domain_upd', 'XMLOK 12', 'Domein succesvol aangepast',
+            order_complete='FALSE', params=params)
+
+    def _cmd_domain_ns_upd(self, params):
+        domain, error = self._domain('domain_ns_upd', params)
+        if error is not None:
+            return error
+        nsgroup = params.get('nsgroup')
+        if nsgroup and nsgroup not in self.nsgroups:
+            return self._order(
+                'domain_ns_upd', ERR_NO_SUCH_NSGROUP,
+                'Nameserver groep niet gevonden', order_complete='FALSE',
+                params=params)
+        if nsgroup:
+            domain['nsgroup'] = nsgroup
+        if params.get('dnssec_delete', 'N').upper() == 'Y':
+            domain['dnssec'] = False
+        return self._order(
+            'domain_ns_upd', 'XMLOK 12', 'Domein succesvol aangepast',
+            order_complete='FALSE', params=params)
+
+    def _cmd_autorenew(self, params):
+        domain, error = self._domain('autorenew', params)
+        if error is not None:
+            return error
+        value = params['autorenew'].upper()
+        domain['autorenew'] = (value == 'Y')
+        return self._order(
+            'autorenew', 'XMLOK 2', 'Autorenew voor dit domein is aangepast',
+            f'Autorenew aangepast naar: {value}', params=params)
+
+    def _cmd_identity_get(self, params):
+        identity = self.identities.get(params['identity'])
+        if identity is None:
+            return self._order(
+                'identity_get', ERR_NO_SUCH_IDENTITY,
+                'Identity niet gevonden')
+        lastname, _, firstname = identity['name'].partition(', ')
+        details = Element('details')
+        _sub(details, 'company', _yn(identity['company_name']))
+        _sub(details, 'company_name', identity['company_name'])
+        _sub(details, 'jobtitle', '')
+        _sub(details, 'firstname', firstname)
+        _sub(details, 'lastname', lastname)
+        _sub(details, 'street', 'Adres')
+        _sub(details, 'number', '4')
+        _sub(details, 'suffix', '')
+        _sub(details, 'postalcode', '1234AB')
+        _sub(details, 'city', 'STAD')
+        _sub(details, 'state', '')
+        _sub(details, 'tel', '0123456789')
+        _sub(details, 'fax', '')
+        _sub(details, 'email', identity['email'])
+        _sub(details, 'country', 'NL')
+        _sub(details, 'last_updated', '07-08-2008 11:06 (d-m-y h:m)')
+        return self._order(
+            'identity_get', 'XMLOK 23',
+            'De uitgebreide gegevens vind u in DETAILS', details)
+
+    def _list(self, command, status_code, objects, tag, params, filters,
+              sortname='handle'):
+        global_search = params.get('global_search')
+        selected = []
+        for obj in objects:
+            if not all(_matches(obj[field], params[param])
+                       for param, field in filters if params.get(param)):
+                continue
+            if global_search and not any(
+                    _matches(str(value), global_search)
+                    for value in obj.values()):
+                continue
+            selected.append(obj)
+
+        page, total = _page(_sorted(selected, params, sortname), params)
+        details = Element('details')
+        _sub(details, f'{tag}s_total', str(total))
+        _sub(details, f'{tag}s_found', str(len(page)))
+        for obj in page:
+            xml = _sub(details, tag)
+            for key, value in obj.items():
+                if key == 'nameservers':
+                    nameservers = _sub(xml, key)
+                    for idx, fqdn in enumerate(value, 1):
+                        _sub(nameservers, f'ns{idx}_fqdn', fqdn)
+                else:
+                    _sub(xml, key, value)
+        return self._order(
+            command, status_code,
+            'In DETAILS vind u de uitgebreide informatie', details)
+
+    def _cmd_identity_list(self, params):
+        return self._list(
+            'identity_list', 'XMLOK 22', self.identities.values(),
+            'identity', params, (
+                ('handle', 'handle'), ('name', 'name'),
+                ('company_name', 'company_name'), ('alias', 'alias')))
+
+    def _cmd_nsgroup_list(self, params):
+        return self._list(
+            'nsgroup_list', 'XMLOK 24', self.nsgroups.values(), 'nsgroup',
+            params, (('nsgroup', 'handle'), ('alias', 'alias')))
+
+    def _cmd_resellerlist(self, params):
+        # Like the real API, resellerlist returns <identity/> elements
+        # with an <alias/> and a <company/>.
+        return self._list(
+            'resellerlist', 'XMLOK 22', self.resellers.values(), 'identity',
+            params, (
+                ('handle', 'handle'), ('alias', 'alias'),
+                ('company_name', 'company')))
+
+    def _cmd_cart_add(self, params):
+        params['enduserip']  # required
+        itemid = str(next(self._next_itemid))
+        item = dict(params)
+        item.update({
+            'itemid': itemid,
+            'producttype': params['producttype'].lower(),
+            'domainname': '{}.{}'.format(
+                params['sld'], params['tld']).lower()})
+        self.cart[itemid] = item
+        return self._order(
+            'cart_add', 'XMLOK 32', 'Het item is aan de cart toegevoegd',
+            itemid, price='', params=params)
+
+    def _item_price(self, item):
+        return self.prices.get(item['domainname'].split('.', 1)[1], '0.00')
+
+    def _item_configok(self, item):
+        if item['producttype'] not in ('register', 'transfer'):
+            return True
+        return bool(
+            item.get('identity-registrant') and
+            item.get('identity-admin') and item.get('nsgroup'))
+
+    def _cmd_cart_list(self, params):
+        items = [self.cart[itemid] for itemid in sorted(self.cart, key=int)]
+        page, total = _page(items, params)
+        details = Element('details')
+        _sub(details, 'cartcount', str(len(page)))
+        _sub(details, 'totalcartcount', str(total))
+        for item in page:
+            xml = _sub(details, 'item')
+            _sub(xml, 'itemid', item['itemid'])
+            _sub(xml, 'producttype', item['producttype'])
+            _sub(xml, 'productdesc', item['domainname'])
+            _sub(xml, 'itemprice', self._item_price(item))
+            _sub(xml, 'quantity', item.get('quantity', '1'))
+            _sub(xml, 'autorenew', item.get('autorenew', 'Y'))
+            _sub(xml, 'trustee', item.get('usetrustee', 'N'))
+            _sub(xml, 'lock', item.get('lock', 'Y'))
+            _sub(xml, 'configok', _yn(self._item_configok(item)))
+        return self._order(
+            'cart_list', 'XMLOK 33',
+            'Cart succesvol opgevraagd, uitgebreide informatie vind u in '
+            'details', details, price='0')
+
+    def _cmd_cart_get(self, params):
+        item = self.cart.get(params['cart_id'])
+        if item is None:
+            return self._order(
+                'cart_get', ERR_NO_SUCH_ITEM, 'Cart item niet gevonden')
+        details = Element('details')
+        sld, tld = item['domainname'].split('.', 1)
+        _sub(details, 'sld', sld)
+        _sub(details, 'tld', tld)
+        _sub(details, 'command', item['producttype'])
+        _sub(details, 'amount', item.get('quantity', '1'))
+        for tag in (
+                'identity-admin', 'identity-tech', 'identity-billing',
+                'identity-registrant', 'identity-reseller', 'nsgroup'):
+            _sub(details, tag, item.get(tag, ''))
+        _sub(details, 'trustee', item.get('usetrustee', 'N'))
+        _sub(details, 'epp', item.get('trans_epp', ''))
+        _sub(details, 'autorenew', item.get('autorenew', 'Y'))
+        _sub(details, 'lock', item.get('lock', 'Y'))
+        return self._order(
+            'cart_get', 'XMLOK 49', 'De informatie vind u in DETAILS',
+            details, price='0')
+
+    def _cmd_cart_upd(self, params):
+        item = self.cart.get(params['itemid'])
+        if item is None:
+            return self._order(
+                'cart_upd', ERR_NO_SUCH_ITEM, 'Cart item niet gevonden')
+        item.update(
+            (key, value) for key, value in params.items()
+            if key not in ('command', 'itemid', 'apiuser', 'apipassword'))
+        return self._order(
+            'cart_upd', 'XMLOK 34', 'Het cartitem is succesvol geupdate',
+            price='')
+
+    def _cmd_cart_del(self, params):
+        params['enduserip']  # required
+        if params['emptycart'].upper() == 'Y':
+            self.cart.clear()
+            return self._order(
+                'cart_del', 'XMLOK 36', 'De cart is leeg gemaakt', price='')
+        if self.cart.pop(params['itemid'], None) is None:
+            return self._order(
+                'cart_del', ERR_NO_SUCH_ITEM, 'Cart item niet gevonden')
+        return self._order(
+            'cart_del', 'XMLOK 36', 'Het item is uit de cart verwijderd',
+            price='')
+
+    def _purchase(self, item):
+        "Return (status_code, description) and apply the cart item"
+        name = item['domainname']
+        if not self._item_configok(item):
+            return 'XMLERR 48', 'Het item is niet correct geconfigureerd'
+        if item['producttype'] == 'register':
+            if name in self.domains or name in self.taken:
+                return ERR_TAKEN, (
+                    'Dit domein kan niet geregistreerd worden omdat het '
+                    'bezet is.')
+            status = ('XMLOK 1', 'Het domein is succesvol geregistreerd')
+        elif item['producttype'] == 'transfer':
+            if name in self.domains:
+                return 'XMLERR 20', 'Het domein staat al in dit account'
+            self._add_order(item, 'P', 'Wachten op akkoord van de eigenaar')
+            return 'XMLPEN 3', 'Domeinverhuizing is geinitieerd'
+        else:
+            return 'XMLOK 14', 'Het item is verwerkt'
+
+        self._add_order(item, 'S', 'Order is afgerond')
+        self._add_item_domain(item)
+        return status
+
+    def _add_order(self, item, status, description):
+        orders_id = str(next(self._next_orders_id))
+        self.orders[orders_id] = {
+            'orders_id': orders_id, 'domainname': item['domainname'],
+            'type': item['producttype'], 'status': status,
+            'description': description, 'foa': 'N',
+            'date_created': '2021-08-11 12:00:00', 'item': item}
+
+    def _add_item_domain(self, item):
+        name = item['domainname']
+        self.taken.discard(name)
+        self.add_domain(
+            name, nsgroup=item['nsgroup'],
+            reg_c=item['identity-registrant'],
+            admin_c=item['identity-admin'],
+            tech_c=item.get('identity-tech'),
+            bill_c=item.get('identity-billing'),
+            reseller=item.get('identity-reseller', ''),
+            autorenew=(item.get('autorenew', 'Y').upper() == 'Y'))
+
+    def _cmd_cart_purchase(self, params):
+        cart_id = params['cart_id']
+        if cart_id.upper() == 'ALL':
+            itemids = sorted(self.cart, key=int)
+        elif cart_id in self.cart:
+            itemids = [cart_id]
+        else:
+            return self._order(
+                'cart_purchase', ERR_NO_SUCH_ITEM, 'Cart item niet gevonden')
+        if not itemids:
+            return self._order(
+                'cart_purchase', ERR_EMPTY_CART, 'De cart is leeg')
+
+        details = Element('details')
+        all_ok = True
+        for itemid in itemids:
+            item = self.cart.pop(itemid)
+            status_code, description = self._purchase(item)
+            all_ok = all_ok and not status_code.startswith('XMLERR')
+            xml = _sub(details, 'cartitem')
+            sld, tld = item['domainname'].split('.', 1)
+            _sub(xml, 'cartitemid', itemid)
+            _sub(xml, 'command', item['producttype'])
+            _sub(xml, 'sld', sld)
+            _sub(xml, 'tld', tld)
+            _sub(xml, 'status_code', status_code)
+            _sub(xml, 'status_description', description)
+
+        # 47 if all items succeeded, 50 if one or more failed.
+        if all_ok:
+            status_code, description = 'XMLOK 47', (
+                'De cart is succesvol ge-purchased, in de details vind u '
+                'informatie over de individuele items')
+        else:
+            status_code, description = 'XMLOK 50', (
+                'Een of meer items konden niet worden besteld, in de '
+                'details vind u informatie over de individuele items')
+        return self._order(
+            'cart_purchase', status_code, description, details, price='0')
+
+    def _dnsrecord(self, params):
+        record = {
+            'value': params['value'].rstrip('.').lower(),
+            'type': params['type'].upper(), 'data': params['data']}
+        if record['type'] == 'MX':
+            record['priority'] = params.get('priority', '0')
+        return record
+
+    def _cmd_dnsrecord_list(self, params):
+        domain, error = self._domain('dnsrecord_list', params)
+        if error is not None:
+            return error
+        records = self.dnsrecords.get(domain['domainname'], [])
+        page, total = _page(records, params)
+        details = Element('details')
+        _sub(details, 'records_total', str(total))
+        _sub(details, 'records_found', str(len(page)))
+        for record in page:
+            xml = _sub(details, 'record')
+            _sub(xml, 'record_id', record['record_id'])
+            for tag in ('value', 'type', 'data'):
+                _sub(xml, tag, record[tag])
+            _sub(xml, 'priority', record.get('priority', ''))
+        return self._order(
+            'dnsrecord_list', 'XMLOK 61',
+            'In DETAILS vind u de uitgebreide informatie', details)
+
+    def _cmd_dnsrecord_add(self, params):
+        domain, error = self._domain('dnsrecord_add', params)
+        if error is not None:
+            return error
+        record = self._dnsrecord(params)
+        records = self.dnsrecords.setdefault(domain['domainname'], [])
+        if any(
+                dict(existing, record_id=None) == dict(record, record_id=None)
+                for existing in records):
+            return self._order(
+                'dnsrecord_add', ERR_RECORD_EXISTS,
+                'Het DNS record bestaat al', params=params)
+        record['record_id'] = str(next(self._next_itemid))
+        records.append(record)
+        return self._order(
+            'dnsrecord_add', 'XMLOK 60',
+            'Het DNS record is succesvol toegevoegd', params=params)
+
+    def _cmd_dnsrecord_del(self, params):
+        domain, error = self._domain('dnsrecord_del', params)
+        if error is not None:
+            return error
+        if 'ttl' not in params:
+            raise KeyError('ttl')  # required, although it is not listed
+        record = self._dnsrecord(params)
+        records = self.dnsrecords.get(domain['domainname'], [])
+        for idx, existing in enumerate(records):
+            if dict(existing, record_id=None) == dict(record, record_id=None):
+                del records[idx]
+                return self._order(
+                    'dnsrecord_del', 'XMLOK 59',
+                    'Het DNS template record is verwijderd')
+        return self._order(
+            'dnsrecord_del', ERR_NO_SUCH_RECORD, 'DNS record niet gevonden',
+            params=params)
+
+    def _cmd_order_list(self, params):
+        status = params.get('status', 'A').upper()[:1]
+        sld = params.get('sld', '')
+        tld = params.get('tld', '').lower()
+        orders = []
+        for order in self.orders.values():
+            osld, otld = order['domainname'].split('.', 1)
+            if status != 'A' and order['status'] != status:
+                continue
+            if (sld and not _matches(osld, sld)) or (tld and otld != tld):
+                continue
+            if params.get('type', order['type']).lower() != order['type']:
+                continue
+            if params.get('order_id', order['orders_id']) != (
+                    order['orders_id']):
+                continue
+            orders.append(order)
+
+        page, total = _page(_sorted(orders, params, 'orders_id'), params)
+        details = Element('details')
+        _sub(details, 'domains_total', str(total))
+        _sub(details, 'domains_found', str(len(page)))
+        for order in page:
+            xml = _sub(details, 'domain')
+            sld, tld = order['domainname'].split('.', 1)
+            _sub(xml, 'orders_id', order['orders_id'])
+            _sub(xml, 'sld', sld)
+            _sub(xml, 'tld', tld)
+            # Like in the API docs: the order type in <status> and the
+            # state in <type>.
+            _sub(xml, 'status', order['type'])
+            _sub(xml, 'type', {'P': 'pending', 'S': 'success'}.get(
+                order['status'], 'error'))
+            _sub(xml, 'foa', order['foa'])
+            _sub(xml, 'description', order['description'])
+            _sub(xml, 'date_created', order['date_created'])
+        return self._order(
+            'order_list', 'XMLOK18',
+            'In DETAILS vind u de uitgebreide informatie', details)
+
+    def _cmd_transfer_status(self, params):
+        name = '{}.{}'.format(params['sld'], params['tld']).lower()
+        orders = [
+            order for order in self.orders.values()
+            if order['domainname'] == name and order['type'] == 'transfer']
+        if not orders:
+            return self._order(
+                'transfer_status', ERR_NO_SUCH_ORDER,
+                'Geen verhuizing gevonden', params=params)
+        order = orders[-1]
+        if order['status'] == 'P':
+            status_code, description = 'XMLPEN 4', (
+                'Transfer Pending - Awaiting Release by Current Registrar')
+        elif order['status'] == 'S':
+            status_code, description = OK_TRANSFERRED, order['description']
+        else:
+            status_code, description = (
+                ERR_TRANSFER_FAILED, order['description'])
+        return self._order(
+            'transfer_status', status_code, description, params=params)
+
+
+class _OxxapySimulatorHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive
+    # The headers and the body are written separately; without
+    # TCP_NODELAY, every response would be delayed by the delayed ACK.
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        self.server._count('connections')
+
+    def do_GET(self):
+        server = self.server
+        url = urlsplit(self.path)
+        params = dict(parse_qsl(url.query, keep_blank_values=True))
+        command = params.get('command', '')
+        server._count('requests', command)
+
+        delay = server._latency()
+        if delay:
+            sleep(delay)
+
+        status = server._fault(params.get('apiuser', ''))
+        if url.path != '/command.php':
+            self._send(404, b'<html>not found</html>', 'text/html')
+        elif status == 429:
+            self._send(429, b'<html>slow down</html>', 'text/html', {
+                'Retry-After': '1'})
+        elif status:
+            self._send(status, b'<html>broken</html>', 'text/html')
+        else:
+            self._send(200, server.portfolio.handle(params), 'text/xml')
+
+    def _send(self, status, body, content_type, headers={}):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+
+        drip = self.server.drip
+        if drip is None:
+            self.wfile.write(body)
+            return
+        chunk_size, interval = drip
+        try:
+            for offset in range(0, len(body), chunk_size):
+                self.wfile.write(body[offset:offset + chunk_size])
+                self.wfile.flush()
+                sleep(interval)
+        except ConnectionError:
+            # The client gave up waiting.
+            self.close_connection = True
+
+    def log_message(self, *args):
+        pass
+
+
+class OxxapySimulator(ThreadingHTTPServer):
+    """
+    Local HTTP server that simulates the OXXA API
+
+    Fault injection (all optional, and settable as attributes):
+    - latency: seconds (or a function returning seconds, see
+      lognormal_latency()) to wait before answering;
+    - error_rate: fraction of the requests answered with an HTTP 503;
+    - fail_next(count): answer the next count requests with an HTTP 503;
+    - drip: (chunk_size, interval) to send the response in chunks of
+      chunk_size bytes, sleeping interval seconds after each;
+    - max_rate: requests per second per apiuser; more are answered with
+      HTTP 429.
+
+    The stats Counter holds the number of connections, requests (total
+    and per command), errors and throttled requests.
+    """
+    daemon_threads = True
+
+    def __init__(self, portfolio=None, address=('127.0.0.1', 0), latency=0,
+                 error_rate=0.0, drip=None, max_rate=None, seed=None):
+        super().__init__(address, _OxxapySimulatorHandler)
+        self.portfolio = portfolio or OxxapySimulatorPortfolio.generate()
+        self.latency = latency
+        self.error_rate = error_rate
+        self.drip = drip
+        self.max_rate = max_rate
+        self.stats = Counter()
+        self.url = 'http://{}:{}/command.php'.format(*self.server_address)
+        self._random = Random(seed)
+        self._failures = []
+        self._buckets = {}  # apiuser -> (tokens, updated_at)
+        self._lock = Lock()
+        self._thread = None
+
+    def start(self):
+        "Start serving in a background thread"
+        self._thread = Thread(
+            target=self.serve_forever, kwargs={'poll_interval': 0.05},
+            daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self):
+        if self._thread is not None:
+            self.shutdown()
+            self._thread = None
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def fail_next(self, count, status=503):
+        "Answer the next count requests with HTTP status"
+        with self._lock:
+            self._failures.extend([status] * count)
+
+    def _count(self, *keys):
+        with self._lock:
+            for key in keys:
+                self.stats[key] += 1
+
+    def _latency(self):
+        if callable(self.latency):
+            with self._lock:
+                return self.latency()
+        return self.latency
+
+    def _fault(self, apiuser):
+        "Return the HTTP error status to send, or None"
+        with self._lock:
+            if self.max_rate and not self._take_token(apiuser):
+                self.stats['throttled'] += 1
+                return 429
+            if self._failures:
+                status = self._failures.pop(0)
+            elif self.error_rate and self._random.random() < self.error_rate:
+                status = 503
+            else:
+                return None
+            self.stats['errors'] += 1
+            return status
+
+    def _take_token(self, apiuser):
+        # Token bucket; allows a burst of max_rate requests.
+        now = monotonic()
+        tokens, updated_at = self._buckets.get(apiuser, (self.max_rate, now))
+        tokens = min(
+            self.max_rate, tokens + (now - updated_at) * self.max_rate)
+        if tokens < 1:
+            self._buckets[apiuser] = (tokens, now)
+            return False
+        self._buckets[apiuser] = (tokens - 1, now)
+        return True
+
+
+def main():
+    from argparse import ArgumentParser
+    parser = ArgumentParser(description='Run a local OXXA API simulator.')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--domains', type=int, default=100)
+    parser.add_argument('--identities', type=int, default=10)
+    parser.add_argument(
+        '--latency', default='0',
+        help='seconds, or MEDIAN,P99 for a lognormal distribution')
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument(
+        '--drip', help='CHUNK_SIZE,INTERVAL to send responses slowly')
+    parser.add_argument(
+        '--max-rate', type=float, help='requests/second per apiuser')
+    parser.add_argument(
+        '--seed', type=int, help='random seed for latency and errors')
+    args = parser.parse_args()
+
+    if ',' in args.latency:
+        latency = lognormal_latency(
+            *[float(i) for i in args.latency.split(',')], seed=args.seed)
+    else:
+        latency = float(args.latency)
+    drip = None
+    if args.drip:
+        chunk_size, interval = args.drip.split(',')
+        drip = (int(chunk_size), float(interval))
+
+    simulator = OxxapySimulator(
+        OxxapySimulatorPortfolio.generate(
+            domains=args.domains, identities=args.identities),
+        address=('127.0.0.1', args.port), latency=latency,
+        error_rate=args.error_rate, drip=drip, max_rate=args.max_rate,
+        seed=args.seed)
+    print(f'Serving the OXXA API simulator on {simulator.url}', flush=True)
+    try:
+        simulator.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        simulator.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,256 @@
+# vim: set ts=8 sw=4 sts=4 et ai tw=79:
+"""
+OXXA API Library in Python (oxxapy), licensed under the LGPLv3+.
+
+Copyright (C) 2021 Walter Doekes, OSSO B.V.
+
+See README.rst for more info.
+"""
+import json
+import os
+from contextlib import contextmanager
+from functools import wraps
+from inspect import isgeneratorfunction
+from threading import Lock, local
+from time import perf_counter, time
+
+# The stack of active spans is per thread; use bind_span() to carry it
+# into worker threads.
+_local = local()
+
+
+def _stack():
+    try:
+        return _local.stack
+    except AttributeError:
+        _local.stack = []
+        return _local.stack
+
+
+def current_span():
+    "Return the innermost active OxxapySpan of this thread, or None"
+    stack = _stack()
+    return stack[-1] if stack else None
+
+
+def bind_span(func):
+    """
+    Return func wrapped so it runs below the current span
+
+    Use this when handing work to another thread:
+
+        executor.submit(bind_span(func), item)
+    """
+    parent = current_span()
+    if parent is None:
+        return func
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        stack = _stack()
+        stack.append(parent)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            stack.pop()
+    return wrapper
+
+
+class OxxapySpan:
+    "A timed operation, linked to its parent"
+    __slots__ = (
+        'trace_id', 'span_id', 'parent_id', 'name', 'attrs', 'start',
+        'duration', 'error', '_t0', '_ext')
+
+    def __init__(self, name, parent, attrs):
+        self.trace_id = parent.trace_id if parent else os.urandom(16).hex()
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent.span_id if parent else None
+        self.name = name
+        self.attrs = attrs
+        self.start = time()
+        self.duration = None
+        self.error = None
+        self._t0 = perf_counter()
+        self._ext = None  # exporter specific data
+
+    def set(self, key, value):
+        self.attrs[key] = value
+
+    def as_dict(self):
+        return {
+            'trace_id': self.trace_id, 'span_id': self.span_id,
+            'parent_id': self.parent_id, 'name': self.name,
+            'start': self.start, 'duration': self.duration,
+            'error': self.error, 'attrs': self.attrs}
+
+    def __repr__(self):
+        return f'<OxxapySpan({self.name}, {self.span_id})>'
+
+
+class OxxapyTracer:
+    """
+    Creates spans and passes them to the exporters
+
+    An exporter is any object with on_start(span) and on_end(span)
+    methods. Example:
+
+        tracer = OxxapyTracer(OxxapyJsonLinesExporter('trace.jsonl'))
+        api.set_tracer(tracer)
+
+        with tracer.span('nightly-job'):
+            for domain in api.domains.filter(reseller=reseller):
+                ...
+
+    The spans created by oxxapy itself are:
+    - manager methods, like "OxxapyDomains.filter";
+    - lazy hydrations, like "OxxapyDomain._update";
+    - API calls, like "call domain_inf" (attribute command).
+    """
+    def __init__(self, *exporters):
+        self.exporters = list(exporters)
+
+    @contextmanager
+    def span(self, name, **attrs):
+        span = self._start(name, attrs)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = type(e).__name__
+            raise
+        finally:
+            self._end(span)
+
+    def trace_generator(self, name, generator, **attrs):
+        """
+        Trace a generator as a single span
+
+        The span is only active while the generator runs, not while the
+        consumer handles the yielded values.
+        """
+        span = self._start(name, attrs, push=False)
+        stack = _stack()
+        try:
+            while True:
+                stack.append(span)
+                try:
+                    value = next(generator)
+                except StopIteration:
+                    return
+                finally:
+                    stack.pop()
+                yield value
+        except BaseException as e:
+            if not isinstance(e, GeneratorExit):
+                span.error = type(e).__name__
+            raise
+        finally:
+            generator.close()
+            span.duration = perf_counter() - span._t0
+            for exporter in self.exporters:
+                exporter.on_end(span)
+
+    def _start(self, name, attrs, push=True):
+        span = OxxapySpan(name, current_span(), attrs)
+        for exporter in self.exporters:
+            exporter.on_start(span)
+        if push:
+            _stack().append(span)
+        return span
+
+    def _end(self, span):
+        span.duration = perf_counter() - span._t0
+        stack = _stack()
+        if stack and stack[-1] is span:
+            stack.pop()
+        for exporter in self.exporters:
+            exporter.on_end(span)
+
+
+def traced(name=None):
+    """
+    Decorate a method of an object with a _core so it gets a span
+
+    Costs only an attribute lookup when no tracer is set.
+    """
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        if isgeneratorfunction(func):
+            @wraps(func)
+            def wrapper(self, *args, **kwargs):
+                tracer = getattr(self._core, '_tracer', None)
+                if tracer is None:
+                    return func(self, *args, **kwargs)
+                return tracer.trace_generator(
+                    span_name, func(self, *args, **kwargs),
+                    object=repr(self))
+        else:
+            @wraps(func)
+            def wrapper(self, *args, **kwargs):
+                tracer = getattr(self._core, '_tracer', None)
+                if tracer is None:
+                    return func(self, *args, **kwargs)
+                with tracer.span(span_name, object=repr(self)):
+                    return func(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class OxxapyJsonLinesExporter:
+    "Writes every finished span as a JSON line to a file (name)"
+    def __init__(self, file):
+        if isinstance(file, str):
+            file = open(file, 'a', encoding='utf-8')
+        self._fp = file
+        self._lock = Lock()
+
+    def on_start(self, span):
+        pass
+
+    def on_end(self, span):
+        line = json.dumps(span.as_dict(), default=str) + '\n'
+        with self._lock:
+            self._fp.write(line)
+            self._fp.flush()
+
+    def close(self):
+        self._fp.close()
+
+
+class OxxapyOpenTelemetryExporter:
+    """
+    Forwards the spans to OpenTelemetry
+
+    Needs the opentelemetry-api package; raises ImportError when it is
+    not installed.
+    """
+    def __init__(self, tracer_name='oxxapy'):
+        from opentelemetry import trace
+        self._trace = trace
+        self._tracer = trace.get_tracer(tracer_name)
+        self._spans = {}  # span_id -> otel span, for parent lookups
+        self._lock = Lock()
+
+    def on_start(self, span):
+        context = None
+        with self._lock:
+            parent = self._spans.get(span.parent_id)
+        if parent is not None:
+            context = self._trace.set_span_in_context(parent)
+        span._ext = self._tracer.start_span(
+            span.name, context=context,
+            start_time=int(span.start * 1e9))
+        with self._lock:
+            self._spans[span.span_id] = span._ext
+
+    def on_end(self, span):
+        with self._lock:
+            otel_span = self._spans.pop(span.span_id, None)
+        if otel_span is None:
+            return
+        for key, value in span.attrs.items():
+            otel_span.set_attribute(key, value)
+        if span.error:
+            otel_span.set_attribute('error.type', span.error)
+        otel_span.end(end_time=int((span.start + span.duration) * 1e9))
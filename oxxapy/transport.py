@@ -0,0 +1,228 @@
+# vim: set ts=8 sw=4 sts=4 et ai tw=79:
+"""
+OXXA API Library in Python (oxxapy), licensed under the LGPLv3+.
+
+Copyright (C) 2021 Walter Doekes, OSSO B.V.
+
+See README.rst for more info.
+"""
+from base64 import b64encode
+from http.client import HTTPConnection, HTTPSConnection, RemoteDisconnected
+from select import select
+from socket import SHUT_RDWR
+from threading import Lock, local
+from time import monotonic
+from urllib.parse import unquote, urlsplit
+from urllib.request import getproxies, proxy_bypass
+
+from .profiling import profiled
+
+_local = local()
+
+
+class OxxapyCancelScope:
+    """
+    Allows another thread to abort the fetch() running inside this scope
+
+    Example:
+
+        scope = OxxapyCancelScope()
+
+        def worker():
+            with scope:
+                api.raw('domain_inf', sld='example', tld='com')
+
+        # elsewhere:
+        scope.cancel()  # worker gets an OxxapyTransportError
+    """
+    def __init__(self):
+        self.cancelled = False
+        self._conn = None
+        self._lock = Lock()
+
+    def __enter__(self):
+        _local.scope = self
+        return self
+
+    def __exit__(self, *exc_info):
+        _local.scope = None
+
+    def cancel(self):
+        with self._lock:
+            self.cancelled = True
+            if self._conn is not None and self._conn.sock is not None:
+                try:
+                    self._conn.sock.shutdown(SHUT_RDWR)
+                except OSError:
+                    pass
+
+    def _register(self, conn):
+        with self._lock:
+            if self.cancelled:
+                raise ConnectionAbortedError('request cancelled')
+            self._conn = conn
+
+
+def get_proxy(urlreq):
+    """
+    Return (host:port, headers) of the proxy for urlreq, or None
+
+    Like urlopen(), this honors the http_proxy, https_proxy and
+    no_proxy environment variables (and the system settings). Proxy
+    credentials are sent as Proxy-Authorization.
+    """
+    proxy = getproxies().get(urlreq.type)
+    if not proxy or proxy_bypass(urlreq.host):
+        return None
+    if '://' not in proxy:
+        proxy = f'http://{proxy}'
+    proxy = urlsplit(proxy)
+    headers = {}
+    if proxy.username is not None:
+        credentials = '{}:{}'.format(
+            unquote(proxy.username), unquote(proxy.password or ''))
+        headers['Proxy-Authorization'] = 'Basic {}'.format(
+            b64encode(credentials.encode('utf-8')).decode('ascii'))
+    hostport = proxy.hostname
+    if proxy.port is not None:
+        hostport = f'{hostport}:{proxy.port}'
+    return hostport, headers
+
+
+class OxxapyHttpTransport:
+    """
+    Minimal HTTP(S) GET transport with keep-alive connection pooling
+
+    We use http.client directly instead of urlopen(), because urlopen()
+    only knows a single timeout and does not reuse connections. Here the
+    connect timeout is used for setting up the TCP/TLS connection and
+    the read timeout is used for every blocking read after that.
+
+    The transport is thread-safe and can be shared by several Oxxapy
+    instances (see OxxapyAccountPool). Up to max_idle connections per
+    host are kept open for reuse. Proxies are used like urlopen() does;
+    see get_proxy().
+    """
+    def __init__(self, max_idle=4):
+        self.max_idle = max_idle
+        self.connections_opened = 0
+        self._idle = {}
+        self._lock = Lock()
+
+    @profiled('network')
+    def fetch(self, urlreq, connect_timeout=None, read_timeout=None,
+              idempotent=False):
+        """
+        Do the urllib.request.Request
+
+        Returns (status, reason, data, timings), where timings is a dict
+        with the seconds spent in the connect, ttfb (time to first
+        byte) and download phases. Connect is 0 for a reused
+        connection.
+
+        If the server drops a reused connection, an idempotent request
+        is retried once on a fresh connection. Other requests are not:
+        the server may have processed them already.
+
+        Raises OSError (socket.timeout) or http.client.HTTPException on
+        failure.
+        """
+        proxy = get_proxy(urlreq)
+        key = (urlreq.type, urlreq.host, proxy and proxy[0])
+        conn = self._get_idle(key)
+        if conn is not None:
+            try:
+                return self._fetch(
+                    key, conn, urlreq, proxy, read_timeout, 0.0)
+            except (BrokenPipeError, ConnectionResetError,
+                    RemoteDisconnected):
+                if not idempotent:
+                    raise
+                # The server closed the idle connection, probably before
+                # it got our request. Retry once on a fresh connection.
+        t0 = monotonic()
+        conn = self._connect(urlreq, proxy, connect_timeout)
+        return self._fetch(
+            key, conn, urlreq, proxy, read_timeout, monotonic() - t0)
+
+    def close(self):
+        "Close all idle connections"
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for conns in idle.values():
+            for conn in conns:
+                conn.close()
+
+    def _connect(self, urlreq, proxy, connect_timeout):
+        host = urlreq.host if proxy is None else proxy[0]
+        if urlreq.type == 'https':
+            conn = HTTPSConnection(host, timeout=connect_timeout)
+            if proxy is not None:
+                # CONNECT through the proxy; TLS is end-to-end.
+                conn.set_tunnel(urlreq.host, headers=proxy[1])
+        elif urlreq.type == 'http':
+            conn = HTTPConnection(host, timeout=connect_timeout)
+        else:
+            raise NotImplementedError(urlreq.type)
+
+        scope = getattr(_local, 'scope', None)
+        try:
+            if scope is not None:
+                scope._register(conn)
+            conn.connect()
+        except Exception:
+            conn.close()
+            raise
+        with self._lock:
+            self.connections_opened += 1
+        return conn
+
+    def _fetch(self, key, conn, urlreq, proxy, read_timeout, connect_time):
+        selector, headers = urlreq.selector, dict(urlreq.header_items())
+        if proxy is not None and urlreq.type == 'http':
+            # A plain HTTP proxy gets the absolute URL.
+            selector = urlreq.full_url
+            headers.update(proxy[1])
+        scope = getattr(_local, 'scope', None)
+        try:
+            if scope is not None:
+                scope._register(conn)
+            conn.sock.settimeout(read_timeout)
+            t0 = monotonic()
+            conn.request(urlreq.get_method(), selector, headers=headers)
+            resp = conn.getresponse()
+            t1 = monotonic()
+            data = resp.read()
+            t2 = monotonic()
+        except Exception:
+            conn.close()
+            raise
+
+        if resp.will_close:
+            conn.close()
+        else:
+            self._put_idle(key, conn)
+        timings = {
+            'connect': connect_time, 'ttfb': (t1 - t0), 'download': (t2 - t1)}
+        return resp.status, resp.reason, data, timings
+
+    def _get_idle(self, key):
+        while True:
+            with self._lock:
+                conns = self._idle.get(key)
+                if not conns:
+                    return None
+                conn = conns.pop()
+            # An idle connection should have nothing to read. If it is
+            # readable, the server closed it (EOF): don't send on it.
+            if not select([conn.sock], [], [], 0)[0]:
+                return conn
+            conn.close()
+
+    def _put_idle(self, key, conn):
+        with self._lock:
+            conns = self._idle.setdefault(key, [])
+            if len(conns) < self.max_idle:
+                conns.append(conn)
+                return
+        conn.close()
@@ -0,0 +1,116 @@
+# vim: set ts=8 sw=4 sts=4 et ai tw=79:
+"""
+OXXA API Library in Python (oxxapy), licensed under the LGPLv3+.
+
+Copyright (C) 2021 Walter Doekes, OSSO B.V.
+
+See README.rst for more info.
+"""
+import logging
+import re
+from itertools import count
+
+# Never log these parameter values.
+REDACTED_PARAMS = frozenset(('apiuser', 'apipassword', 'trans_epp'))
+
+# Nor the values of these XML tags in a response body (the EPP codes of
+# cart_get/cart_list items and transfers).
+REDACTED_TAGS = ('epp', 'trans_epp', 'apipassword')
+_REDACTED_TAGS_RE = re.compile(
+    r'<({})>[^<]*</\1>'.format('|'.join(REDACTED_TAGS)))
+
+# The XML declaration says how the body is encoded (ISO-8859-1 for the
+# API); without one, XML is UTF-8. This is what the response parser uses.
+_XML_ENCODING_RE = re.compile(
+    rb'''^\s*<\?xml[^>]*\sencoding=["']([A-Za-z0-9._-]+)["']''')
+
+# A library should not print to stderr (through logging.lastResort)
+# when the application did not configure logging.
+logging.getLogger('oxxapy.wire').addHandler(logging.NullHandler())
+
+
+def redact_params(params):
+    "Return a copy of params with the credentials replaced by ***"
+    return dict(
+        (key, ('***' if key in REDACTED_PARAMS else value))
+        for key, value in params.items())
+
+
+def decode_body(data):
+    "Return the XML response body as text, decoded like the parser does"
+    match = _XML_ENCODING_RE.match(data)
+    encoding = match.group(1).decode('ascii') if match else 'utf-8'
+    try:
+        return data.decode(encoding, 'replace')
+    except LookupError:
+        return data.decode('utf-8', 'replace')
+
+
+def redact_body(body):
+    "Return the XML body with the secret tag values replaced by ***"
+    return _REDACTED_TAGS_RE.sub(r'<\1>***</\1>', body)
+
+
+class OxxapyWireLogger:
+    """
+    Logs the API requests and responses to the 'oxxapy.wire' logger
+
+    Logged are the request parameters (credentials redacted), the HTTP
+    status, the response size and the timings. With log_body, the XML
+    response is logged as well (EPP codes redacted).
+
+    To keep the volume down under load, only one in sample_every calls
+    is logged, plus every call that took at least slower_than_ms. Use
+    sample_every=0 to log only the slow calls. Failed calls are always
+    logged (at WARNING level).
+
+    Nothing is done (or formatted) unless the logger is enabled for
+    the level:
+
+        logging.getLogger('oxxapy.wire').setLevel(logging.DEBUG)
+        api.set_wire_logging(sample_every=100, slower_than_ms=2000)
+    """
+    def __init__(self, sample_every=1, slower_than_ms=None, log_body=False,
+                 level=logging.DEBUG, logger=None):
+        self.sample_every = sample_every
+        self.slower_than_ms = slower_than_ms
+        self.log_body = log_body
+        self.level = level
+        self.logger = logger or logging.getLogger('oxxapy.wire')
+        self._counter = count(1)
+
+    def _sampled(self, seconds):
+        # next() on itertools.count is atomic, so this is thread-safe.
+        num = next(self._counter)
+        if self.sample_every and num % self.sample_every == 0:
+            return True
+        return (
+            self.slower_than_ms is not None and
+            seconds * 1000 >= self.slower_than_ms)
+
+    def log_response(self, req, status, data, seconds, timings):
+        level = self.level
+        if status != 200:
+            level = logging.WARNING
+        elif not self.logger.isEnabledFor(level) or not self._sampled(
+                seconds):
+            return
+        self.logger.log(
+            level,
+            '%s %r -> HTTP %s, %d bytes, %.1f ms '
+            '(connect %.1f, ttfb %.1f, download %.1f)',
+            req.params.get('command'), redact_params(req.params), status,
+            len(data), seconds * 1000, timings['connect'] * 1000,
+            timings['ttfb'] * 1000, timings['download'] * 1000)
+        if self.log_body:
+            self.logger.log(
+                level, '%s response body:\n%s',
+                req.params.get('command'),
+                redact_body(decode_body(data)))
+
+    def log_error(self, req, error, seconds):
+        if not self.logger.isEnabledFor(logging.WARNING):
+            return
+        self.logger.warning(
+            '%s %r -> %s after %.1f ms', req.params.get('command'),
+            redact_params(req.params), error, seconds * 1000)
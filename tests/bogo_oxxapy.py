@@ -6,10 +6,77 @@ Copyright (C) 2021 Walter Doekes, OSSO B.V.
 
 See README.rst for more info.
 """
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+
 from oxxapy import Oxxapy
 from oxxapy.core import OxxapyRequest, OxxapyResponse
 from oxxapy.exceptions import OxxapyTransportError
 
+DOMAIN_LIST_NL = b'''\
+<?xml version="1.0" encoding="UTF-8"?>
+<channel>
+  <order>
+    <order_id>173714200</order_id><command>domain_list</command>
+    <status_code>XMLOK18</status_code>
+    <status_description>In DETAILS vind u de uitgebreide
+      informatie</status_description>
+    <price></price>
+    <details>
+      <domains_total>2</domains_total><domains_found>2</domains_found>
+      <domain>
+        <domainname>example1.nl</domainname><nsgroup>NSGR00000</nsgroup>
+        <identity-registrant>REGI00000</identity-registrant>
+        <identity-admin>ADMI00000</identity-admin>
+        <identity-tech>TECH00000</identity-tech>
+        <identity-billing>BILL00000</identity-billing>
+        <expire_date>2021-11-25</expire_date><autorenew>Y</autorenew>
+      </domain>
+      <domain>
+        <domainname>example2.nl</domainname><nsgroup>NSGR00000</nsgroup>
+        <identity-registrant>REGI00000</identity-registrant>
+        <identity-admin>ADMI00000</identity-admin>
+        <identity-tech>TECH00000</identity-tech>
+        <identity-billing>BILL00000</identity-billing>
+        <expire_date>2021-11-25</expire_date><autorenew>Y</autorenew>
+      </domain>
+    </details>
+    <order_complete>TRUE</order_complete><done>TRUE</done>
+  </order>
+</channel>
+'''
+
+
+def order_xml(command, status_code, description='', details=''):
+    "Return a minimal <channel><order> response as bytes"
+    return f'''\
+<?xml version="1.0" encoding="UTF-8"?>
+<channel>
+  <order>
+    <order_id>123456789</order_id><command>{command}</command>
+    <status_code>{status_code}</status_code>
+    <status_description>{description}</status_description>
+    <price>0</price>
+    {details}
+    <order_complete>TRUE</order_complete><done>TRUE</done>
+  </order>
+</channel>
+'''.encode('utf-8')
+
+
+DOMAIN_INF_NL = order_xml('domain_inf', 'XMLOK 7', 'Domein info', '''\
+    <details>
+      <identity-registrant>REGI00000</identity-registrant>
+      <identity-admin>ADMI00000</identity-admin>
+      <identity-billing>BILL00000</identity-billing>
+      <identity-tech>TECH00000</identity-tech>
+      <identity-reseller></identity-reseller>
+      <nsgroup>NSGR00000</nsgroup>
+      <expire_date>25-11-2021</expire_date>
+      <autorenew>Y</autorenew>
+      <dnssec>N</dnssec>
+    </details>''')
+
 
 class _BogoOxxapy(Oxxapy):
     def __init__(self, *args, **kwargs):
@@ -68,3 +135,67 @@ class OxxapyWithResponse(_BogoOxxapy):
             raise OxxapyTransportError(
                 200, str(e), req=req, binresp=binxml)
         return response
+
+
+class OxxapyWithPortfolio(_BogoOxxapy):
+    """
+    OXXA API bogus interface
+
+    Reimplements _xml_call() so the simulator portfolio answers, without
+    going through HTTP.
+    """
+    def __init__(self, portfolio, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.portfolio = portfolio
+
+    def _xmlcall(self, command, **params):
+        req = OxxapyRequest('https://BOGO-OXXAPY/command.php', command, params)
+        binxml = self.portfolio.handle(dict(
+            (key, ('Y' if value else 'N') if isinstance(value, bool)
+             else str(value))
+            for key, value in req.params.items()))
+        return OxxapyResponse.from_binstr(binxml, req).extract_order()
+
+
+class _StaticXmlHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive
+
+    def do_GET(self):
+        self.server.paths.append(self.path)
+        binxml = self.server.binxml
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/xml')
+        self.send_header('Content-Length', str(len(binxml)))
+        self.end_headers()
+        self.wfile.write(binxml)
+
+    def log_message(self, *args):
+        pass
+
+
+class StaticXmlServer(ThreadingHTTPServer):
+    """
+    Local HTTP server that answers every request with the same XML
+
+    Example:
+
+        server = StaticXmlServer(DOMAIN_LIST_NL)
+        api._apiurl = server.url
+        ...
+        server.close()
+    """
+    daemon_threads = True
+
+    def __init__(self, binxml=DOMAIN_LIST_NL):
+        super().__init__(('127.0.0.1', 0), _StaticXmlHandler)
+        self.binxml = binxml
+        self.paths = []
+        self.url = 'http://127.0.0.1:{}/command.php'.format(
+            self.server_address[1])
+        Thread(
+            target=self.serve_forever, kwargs={'poll_interval': 0.05},
+            daemon=True).start()
+
+    def close(self):
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,87 @@
+# vim: set ts=8 sw=4 sts=4 et ai tw=79:
+"""
+OXXA API Library in Python (oxxapy), licensed under the LGPLv3+.
+
+Copyright (C) 2021 Walter Doekes, OSSO B.V.
+
+See README.rst for more info.
+"""
+from unittest import TestCase
+
+from oxxapy.core import OxxapyRequest, OxxapyResponse
+from oxxapy.exceptions import OxxapyCircuitOpenError, OxxapyTransportError
+
+from bogo_oxxapy import DOMAIN_LIST_NL, OxxapyBrokenHttp
+
+
+class OxxapySometimesBrokenHttp(OxxapyBrokenHttp):
+    def __init__(self):
+        super().__init__()
+        self.broken = False
+        self.calls = 0
+
+    def _xmlcall(self, command, **params):
+        self.calls += 1
+        if self.broken:
+            return super()._xmlcall(command, **params)
+        req = OxxapyRequest('https://BOGO-OXXAPY/command.php', command, params)
+        return OxxapyResponse.from_binstr(DOMAIN_LIST_NL, req).extract_order()
+
+
+class OxxapyCircuitBreakerTestCase(TestCase):
+    def setUp(self):
+        self.api = OxxapySometimesBrokenHttp()
+        self.api.set_circuit_breaker(max_consecutive=3, reset_timeout=60)
+        self.breaker = self.api._breaker
+
+    def test_open_and_serve_stale(self):
+        self.api.raw('domain_inf', sld='example1', tld='nl')
+        self.api.raw('domain_list')
+
+        self.api.broken = True
+        for i in range(3):
+            self.assertRaises(
+                OxxapyTransportError, self.api.raw, 'domain_inf',
+                sld='example2', tld='nl')
+        self.assertEqual(self.breaker.state, self.breaker.OPEN)
+        self.assertEqual(self.api.calls, 5)
+
+        # Fail fast, without calling the API.
+        self.assertRaises(
+            OxxapyCircuitOpenError, self.api.raw, 'domain_inf',
+            sld='example2', tld='nl')
+        # But the lookup we did before is still available; listings
+        # are too large to keep.
+        self.api.raw('domain_inf', sld='example1', tld='nl')
+        self.assertRaises(
+            OxxapyCircuitOpenError, self.api.raw, 'domain_list')
+        self.assertEqual(self.api.calls, 5)
+
+    def test_half_open(self):
+        self.api.broken = True
+        for i in range(3):
+            self.assertRaises(
+                OxxapyTransportError, self.api.raw, 'domain_list')
+        self.breaker._opened_at -= 60
+
+        # One failing probe opens it again.
+        self.assertRaises(OxxapyTransportError, self.api.raw, 'domain_list')
+        self.assertEqual(self.breaker.state, self.breaker.OPEN)
+        self.assertEqual(self.api.calls, 4)
+
+        # One successful probe closes it.
+        self.breaker._opened_at -= 60
+        self.api.broken = False
+        self.api.raw('domain_list')
+        self.assertEqual(self.breaker.state, self.breaker.CLOSED)
+
+    def test_error_rate(self):
+        self.api.set_circuit_breaker(
+            max_consecutive=100, max_error_rate=0.5, window=4)
+        for broken in (False, True, False, True):
+            self.api.broken = broken
+            try:
+                self.api.raw('domain_list')
+            except OxxapyTransportError:
+                pass
+        self.assertEqual(self.api._breaker.state, self.breaker.OPEN)
@@ -0,0 +1,113 @@
+# vim: set ts=8 sw=4 sts=4 et ai tw=79:
+"""
+OXXA API Library in Python (oxxapy), licensed under the LGPLv3+.
+
+Copyright (C) 2021 Walter Doekes, OSSO B.V.
+
+See README.rst for more info.
+"""
+import json
+import os
+from tempfile import TemporaryDirectory
+from threading import Lock
+from time import monotonic
+from unittest import TestCase
+
+from oxxapy.bulk import OxxapyBulkJob
+from oxxapy.core import OxxapyRequest, OxxapyResponse
+
+from bogo_oxxapy import _BogoOxxapy, order_xml
+
+
+class OxxapyAutorenewApi(_BogoOxxapy):
+    "autorenew succeeds, except for already-set and unmanaged domains"
+    def __init__(self):
+        super().__init__()
+        self.called = []
+        self._lock = Lock()
+
+    def _xmlcall(self, command, **params):
+        assert command == 'autorenew', command
+        with self._lock:
+            self.called.append(params['sld'])
+        if params['sld'] == 'already':
+            binxml = order_xml(command, 'XMLERR 76', 'Reeds ingesteld')
+        elif params['sld'] == 'unmanaged':
+            binxml = order_xml(command, 'XMLERR 24', 'Niet onder beheer')
+        else:
+            binxml = order_xml(command, 'XMLOK 9', 'Autorenew aangepast')
+        req = OxxapyRequest('https://BOGO-OXXAPY/command.php', command, params)
+        return OxxapyResponse.from_binstr(binxml, req).extract_order()
+
+
+class OxxapyBulkJobTestCase(TestCase):
+    def test_journal_resume(self):
+        api = OxxapyAutorenewApi()
+        names = ['already.nl', 'unmanaged.nl'] + [
+            f'example{i}.nl' for i in range(20)]
+        domains = [api.domains.get(name) for name in names]
+
+        with TemporaryDirectory() as tmpdir:
+            journal = os.path.join(tmpdir, 'autorenew.journal')
+            result = api.domains.bulk_set_autorenew(
+                domains, True, journal=journal, workers=3)
+            self.assertEqual((result.ok, result.failed), (21, 1))
+            self.assertEqual(
+                list(result.failures),
+                [('unmanaged.nl', 24, 'Niet onder beheer')])
+
+            with open(journal) as fp:
+                records = [json.loads(line) for line in fp]
+            self.assertEqual(len(records), 22)
+            self.assertEqual(
+                set(i['status'] for i in records), set(['ok', 'failed']))
+
+            # Second run only retries the failure.
+            api.called = []
+            result = api.domains.bulk_set_autorenew(
+                domains, True, journal=journal)
+            self.assertEqual(api.called, ['unmanaged'])
+            self.assertEqual(
+                (result.ok, result.skipped, result.failed), (0, 21, 1))
+
+    def test_other_exceptions(self):
+        api = OxxapyAutorenewApi()
+        domains = [api.domains.get(f'example{i}.{tld}') for i, tld in (
+            (1, 'nl'), (2, 'com'), (3, 'nl'))]
+
+        def update(domain):
+            # TypeError for the non-NL domain.
+            if domain.name.endswith('.nl'):
+                domain.set_autorenew(True)
+            else:
+                domain.set_reseller(api.resellers.none())
+
+        with TemporaryDirectory() as tmpdir:
+            journal = os.path.join(tmpdir, 'reseller.journal')
+            result = OxxapyBulkJob(journal=journal, workers=2).run(
+                domains, update)
+            self.assertEqual((result.ok, result.failed), (2, 1))
+            self.assertEqual(result.failures[0][:2], ('example2.com', None))
+            self.assertTrue(result.failures[0][2].startswith('TypeError: '))
+            with open(journal) as fp:
+                self.assertEqual(len(fp.readlines()), 3)
+
+    def test_throttle_and_progress(self):
+        api = OxxapyAutorenewApi()
+        domains = [api.domains.get(f'example{i}.nl') for i in range(10)]
+        reports = []
+        job = OxxapyBulkJob(
+            workers=4, max_rate=100, progress=(lambda result: (
+                reports.append((result.summary(), result.eta)))),
+            progress_every=0)
+
+        t0 = monotonic()
+        result = job.run(
+            domains, (lambda domain: domain.set_autorenew(True)),
+            skip=(lambda domain: domain.name == 'example0.nl'))
+        # 9 calls at 100/s: the last one starts after 80ms.
+        self.assertGreaterEqual(monotonic() - t0, 0.08)
+        self.assertEqual((result.ok, result.skipped), (9, 1))
+        self.assertEqual(len(api.called), 9)
+        self.assertTrue(reports[-1][0].startswith('10/10 done (0 failed), '))
+        self.assertEqual(reports[-1][1], 0.0)
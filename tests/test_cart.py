@@ -0,0 +1,126 @@
+# vim: set ts=8 sw=4 sts=4 et ai tw=79:
+"""
+OXXA API Library in Python (oxxapy), licensed under the LGPLv3+.
+
+Copyright (C) 2021 Walter Doekes, OSSO B.V.
+
+See README.rst for more info.
+"""
+from collections import Counter
+from threading import Lock
+from unittest import TestCase
+
+from oxxapy.core import OxxapyRequest, OxxapyResponse
+from oxxapy.exceptions import OxxapyTransactionError
+from oxxapy.simulator import OxxapySimulatorPortfolio
+
+from bogo_oxxapy import OxxapyWithPortfolio, order_xml
+
+ENDUSERIP = '192.0.2.1'
+
+
+class OxxapyCartApi(OxxapyWithPortfolio):
+    "Count the calls; cart_add fails for 'refused' and breaks for 'crash'"
+    def __init__(self, portfolio):
+        super().__init__(portfolio)
+        self.calls = Counter()
+        self._lock = Lock()
+
+    def _xmlcall(self, command, **params):
+        with self._lock:
+            self.calls[command] += 1
+        if command == 'cart_add' and params['sld'] == 'crash':
+            raise RuntimeError('unexpected')
+        if command == 'cart_add' and params['sld'] == 'refused':
+            req = OxxapyRequest(
+                'https://BOGO-OXXAPY/command.php', command, params)
+            binxml = order_xml(command, 'XMLERR 2', 'Ongeldige tld')
+            return OxxapyResponse.from_binstr(binxml, req).extract_order()
+        return super()._xmlcall(command, **params)
+
+
+class OxxapyCartTestCase(TestCase):
+    def setUp(self):
+        self.portfolio = OxxapySimulatorPortfolio.generate(domains=3)
+        self.owned = sorted(self.portfolio.domains)[0]
+        self.api = OxxapyCartApi(self.portfolio)
+        self.contacts = {
+            'reg_c': self.api.identities.get('IDEN00000'),
+            'admin_c': 'IDEN00000', 'nsgroup': 'NSGR00000'}
+
+    def test_bulk_transfer(self):
+        orders = [
+            dict(domain=f'Moving{num}.nl', epp='S3cr3t', **self.contacts)
+            for num in range(12)]
+        orders.extend([
+            dict(domain='moving0.nl', **self.contacts),  # duplicate
+            dict(domain=self.owned, **self.contacts),  # XMLERR 20
+            dict(domain='refused.nl', **self.contacts),  # cart_add fails
+            dict(domain='unconfigured.nl', reg_c='IDEN00000'),
+            dict(domain='nodot')])
+
+        result = self.api.cart.bulk_order(
+            orders, ENDUSERIP, producttype='transfer', workers=3,
+            page_size=5)
+        self.assertEqual(
+            (result.ok, result.pending, result.failed), (0, 12, 4))
+        self.assertEqual(result.purchase_status, 50)
+        self.assertEqual(result.outcomes['moving11.nl'].code, 3)
+        self.assertEqual(result.outcomes[self.owned].code, 20)
+        self.assertEqual(result.outcomes['refused.nl'].itemid, None)
+        self.assertEqual(result.outcomes['refused.nl'].code, 2)
+        self.assertIn('configok', result.outcomes['unconfigured.nl'].message)
+        self.assertEqual(result.outcomes['nodot'].code, 0)
+
+        # One empty check, 15 adds, 3 pages of the 14 added items, one
+        # removal and one purchase.
+        self.assertEqual(self.api.calls, {
+            'cart_add': 15, 'cart_list': 4, 'cart_del': 1,
+            'cart_purchase': 1})
+        self.assertEqual(self.portfolio.cart, {})
+        self.assertEqual(len(self.portfolio.orders), 12)  # pending
+
+    def test_register_all_ok(self):
+        result = self.api.cart.bulk_order(
+            [dict(domain='new.nl', **self.contacts)], ENDUSERIP,
+            producttype='register')
+        self.assertEqual(result.purchase_status, 47)
+        self.assertEqual(
+            (result.ok, result.pending, result.failed), (1, 0, 0))
+
+    def test_cart_not_empty(self):
+        self.api.cart.add('other.nl', 'register', ENDUSERIP, **self.contacts)
+        with self.assertRaises(ValueError):
+            self.api.cart.bulk_order([dict(domain='new.nl')], ENDUSERIP)
+        self.assertEqual(len(self.portfolio.cart), 1)
+
+    def test_enduserip_required(self):
+        with self.assertRaises(OxxapyTransactionError) as cm:
+            self.api.raw(
+                'cart_add', sld='new', tld='nl', producttype='register')
+        self.assertEqual(cm.exception.args[0], 2)
+        self.assertIn('enduserip', cm.exception.args[1])
+        self.assertEqual(self.portfolio.cart, {})
+
+    def test_bad_orders(self):
+        orders = [dict(domain='new1.nl', **self.contacts)]
+        with self.assertRaises(TypeError):
+            self.api.cart.bulk_order(orders + [dict(
+                domain='new2.nl', extra_csv_column='x', **self.contacts)],
+                ENDUSERIP)
+        with self.assertRaises(TypeError):
+            self.api.cart.bulk_order(orders + [self.contacts], ENDUSERIP)
+        self.assertEqual(self.api.calls, {})
+
+        # An error halfway: the items that were added are removed.
+        orders = [
+            dict(domain=f'new{num}.nl', **self.contacts)
+            for num in range(10)]
+        orders.insert(5, dict(domain='crash.nl', **self.contacts))
+        with self.assertRaises(RuntimeError):
+            self.api.cart.bulk_order(orders, ENDUSERIP, workers=2)
+        self.assertGreater(self.api.calls['cart_add'], 1)
+        self.assertEqual(self.portfolio.cart, {})
+        self.assertEqual(
+            self.api.cart.bulk_order(orders[:5], ENDUSERIP).purchase_status,
+            47)
@@ -0,0 +1,89 @@
+# vim: set ts=8 sw=4 sts=4 et ai tw=79:
+"""
+OXXA API Library in Python (oxxapy), licensed under the LGPLv3+.
+
+Copyright (C) 2021 Walter Doekes, OSSO B.V.
+
+See README.rst for more info.
+"""
+import os
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from oxxapy.cassette import (
+    FOOTER, OxxapyCassette, OxxapyCassetteRecorder, cassette_key)
+from oxxapy.exceptions import OxxapyTransportError
+from oxxapy.simulator import OxxapySimulator, OxxapySimulatorPortfolio
+
+from bogo_oxxapy import _BogoOxxapy
+
+
+class OxxapyCassetteTestCase(TestCase):
+    def setUp(self):
+        self.tmpdir = TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'session.cas')
+
+        portfolio = OxxapySimulatorPortfolio.generate(domains=10)
+        with OxxapySimulator(portfolio) as sim:
+            api = _BogoOxxapy(
+                api_url=sim.url, transport=OxxapyCassetteRecorder(self.path))
+            self.names = [domain.name for domain in api.domains.all()]
+            domain = api.domains.get('domain000004.nl')
+            domain._update()
+            domain.set_autorenew(not domain.autorenew)
+            domain._update()
+            self.autorenew = domain.autorenew
+            api.close()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _replay(self):
+        cassette = OxxapyCassette(self.path)
+        self.assertEqual(len(cassette), 4)
+        api = _BogoOxxapy(transport=cassette)
+
+        domain = api.domains.get('DOMAIN000004.NL')
+        domain._update()
+        self.assertIsNot(domain.autorenew, self.autorenew)
+        domain._update()
+        self.assertIs(domain.autorenew, self.autorenew)
+        domain._update()  # the last answer is repeated
+        self.assertIs(domain.autorenew, self.autorenew)
+        self.assertEqual(
+            [domain.name for domain in api.domains.all()], self.names)
+
+        with self.assertLogs('oxxapy.wire', 'WARNING'):
+            with self.assertRaises(OxxapyTransportError) as cm:
+                api.raw('nsgroup_list')
+        self.assertEqual(cm.exception.args[0], 404)
+
+        api.close()
+        self.assertTrue(cassette._map.closed)
+
+    def test_replay(self):
+        with open(self.path, 'rb') as fp:
+            data = fp.read()
+        self.assertNotIn(b'MD5', data)
+        self.assertNotIn(b'USER', data)
+        self._replay()
+
+    def test_replay_without_index(self):
+        # Recording interrupted; cut the index and half the last record.
+        with open(self.path, 'rb') as fp:
+            data = fp.read()
+        with open(self.path, 'wb') as fp:
+            fp.write(data[:-(FOOTER.size + 4 * 16)])
+            fp.write(data[8:200])
+        self._replay()
+
+    def test_cassette_key(self):
+        self.assertEqual(
+            cassette_key({'command': 'domain_inf', 'TLD': 'NL ',
+                          'sld': 'Example', 'apipassword': 'MD5xyz'}),
+            cassette_key({'apipassword': 'MD5abc', 'sld': 'example',
+                          'command': 'domain_inf', 'tld': 'nl'}))
+        # But TXT data (and search values) are case-sensitive.
+        self.assertNotEqual(
+            cassette_key({'command': 'dnsrecord_add', 'data': 'v=DKIM1; k=A'}),
+            cassette_key({'command': 'dnsrecord_add', 'data': 'v=dkim1; k=a'}))
@@ -0,0 +1,140 @@
+# vim: set ts=8 sw=4 sts=4 et ai tw=79:
+"""
+OXXA API Library in Python (oxxapy), licensed under the LGPLv3+.
+
+Copyright (C) 2021 Walter Doekes, OSSO B.V.
+
+See README.rst for more info.
+"""
+from threading import Event, Thread
+from unittest import TestCase
+from warnings import catch_warnings, simplefilter
+
+from oxxapy.bulk import OxxapyBulkJob
+from oxxapy.diagnostics import OxxapyCallBudgetWarning, OxxapyNPlusOneWarning
+from oxxapy.dns import OxxapyDnsRecord as Record
+from oxxapy.exceptions import OxxapyCallBudgetExceeded
+
+from oxxapy.simulator import OxxapySimulatorPortfolio
+
+from bogo_oxxapy import (
+    DOMAIN_INF_NL, DOMAIN_LIST_NL, OxxapyWithPortfolio, OxxapyWithResponse)
+
+
+class OxxapyNPlusOneTestCase(TestCase):
+    def test_reseller_in_loop(self):
+        api = OxxapyWithResponse()
+        api.set_n_plus_one_detection(threshold=2)
+        api.push_reqresp(
+            dict(command='domain_list', records=-1), DOMAIN_LIST_NL)
+        for sld in ('example1', 'example2'):
+            api.push_reqresp(
+                dict(command='domain_inf', sld=sld, tld='nl'), DOMAIN_INF_NL)
+
+        with catch_warnings(record=True) as caught:
+            simplefilter('always')
+            for domain in api.domains.all():
+                domain.reseller  # the N+1 line
+        self.assertEqual(len(caught), 1)
+        self.assertIs(caught[0].category, OxxapyNPlusOneWarning)
+        self.assertEqual(caught[0].filename, __file__)
+        self.assertIn('2 different domain_inf calls', str(caught[0].message))
+
+        report = api.n_plus_one_report()
+        self.assertEqual(report[0][0], __file__)
+        self.assertEqual(report[0][2:], ('domain_inf', 2))
+
+    def test_bulk_helpers(self):
+        portfolio = OxxapySimulatorPortfolio.generate(
+            domains=30, identities=30)
+        api = OxxapyWithPortfolio(portfolio)
+        api.set_n_plus_one_detection(threshold=10)
+        domains = list(api.domains.all())
+        names = [domain.name for domain in domains]
+        moving = [f'moving{num}.nl' for num in range(30)]
+
+        with catch_warnings(record=True) as caught:
+            simplefilter('always')
+            # What BULK_ALTERNATIVES recommends does not warn itself.
+            list(api.domains.check_many(f'free{num}.nl' for num in range(30)))
+            api.identities.hydrate(domain.reg_c for domain in domains)
+            api.dns.bulk_sync(
+                (name, [Record(name, 'A', '192.0.2.1')]) for name in names)
+            OxxapyBulkJob().run(domains, (lambda domain: domain._update()))
+            api.cart.bulk_order(
+                ({'domain': name, 'reg_c': 'IDEN00000',
+                  'admin_c': 'IDEN00000', 'nsgroup': 'NSGR00000'}
+                 for name in moving), '127.0.0.1', producttype='transfer')
+            tracker = api.orders.tracker(page_size=2)
+            for name in moving:
+                tracker.track(name)
+            tracker.poll()
+        self.assertEqual([str(warning.message) for warning in caught], [])
+        self.assertEqual(
+            sorted(site[2] for site in api.n_plus_one_report()),
+            ['cart_list', 'cart_purchase', 'domain_list'])
+
+        # A loop of the user still warns.
+        with catch_warnings(record=True) as caught:
+            simplefilter('always')
+            for name in names:
+                api.domains.get(name)._update()
+        self.assertEqual(len(caught), 1)
+
+
+class OxxapyCallBudgetTestCase(TestCase):
+    def test_raise(self):
+        api = OxxapyWithResponse()
+        api.push_reqresp(
+            dict(command='domain_list', records=-1), DOMAIN_LIST_NL)
+        with api.call_budget(max_calls=1) as budget:
+            domains = list(api.domains.all())
+            self.assertRaises(
+                OxxapyCallBudgetExceeded, getattr, domains[0], 'reseller')
+        self.assertEqual(budget.commands, {'domain_list': 1})
+        self.assertEqual(api._budgets_var.get(), ())
+
+    def test_warn(self):
+        api = OxxapyWithResponse()
+        api.push_reqresp(
+            dict(command='domain_list', records=-1), DOMAIN_LIST_NL)
+        with catch_warnings(record=True) as caught:
+            simplefilter('always')
+            with api.call_budget(max_calls=0, action='warn') as budget:
+                list(api.domains.all())
+        self.assertEqual(budget.calls, 1)
+        self.assertEqual(len(caught), 1)
+        self.assertIs(caught[0].category, OxxapyCallBudgetWarning)
+
+    def test_per_thread(self):
+        api = OxxapyWithPortfolio(
+            OxxapySimulatorPortfolio.generate(domains=20))
+        entered, done = Event(), Event()
+        errors = []
+
+        def limited():
+            try:
+                with api.call_budget(max_calls=0):
+                    entered.set()
+                    done.wait(5)
+            except Exception as e:
+                errors.append(e)
+
+        thread = Thread(target=limited)
+        thread.start()
+        entered.wait(5)
+        try:
+            # Not limited by the budget of the other thread.
+            self.assertEqual(len(list(api.domains.all())), 20)
+        finally:
+            done.set()
+            thread.join()
+        self.assertEqual(errors, [])
+
+        # The workers of check_many() do count against it.
+        with api.call_budget(max_calls=10, action='warn') as budget:
+            with catch_warnings():
+                simplefilter('ignore')
+                list(api.domains.check_many(
+                    f'free{num}.nl' for num in range(12)))
+        self.assertEqual(budget.commands, {'domain_check': 12})
@@ -0,0 +1,96 @@
+# vim: set ts=8 sw=4 sts=4 et ai tw=79:
+"""
+OXXA API Library in Python (oxxapy), licensed under the LGPLv3+.
+
+Copyright (C) 2021 Walter Doekes, OSSO B.V.
+
+See README.rst for more info.
+"""
+import json
+import os
+from collections import Counter
+from tempfile import TemporaryDirectory
+from threading import Lock
+from unittest import TestCase
+
+from oxxapy.dns import OxxapyDnsRecord as Record
+from oxxapy.simulator import OxxapySimulatorPortfolio
+
+from bogo_oxxapy import OxxapyWithPortfolio
+
+
+class OxxapyCountingApi(OxxapyWithPortfolio):
+    def __init__(self, portfolio):
+        super().__init__(portfolio)
+        self.calls = Counter()
+        self._lock = Lock()
+
+    def _xmlcall(self, command, **params):
+        with self._lock:
+            self.calls[command] += 1
+        return super()._xmlcall(command, **params)
+
+
+def zone(name, num):
+    return [
+        Record(name, 'A', f'192.0.2.{num}'),
+        Record(f'www.{name}', 'CNAME', name),
+        Record(name, 'MX', f'mail.{name}', priority=10)]
+
+
+class OxxapyDnsTestCase(TestCase):
+    def setUp(self):
+        self.portfolio = OxxapySimulatorPortfolio.generate(domains=12)
+        self.names = sorted(self.portfolio.domains)
+        self.api = OxxapyCountingApi(self.portfolio)
+
+    def test_sync(self):
+        name = self.names[0]
+        for record in zone(name, 1):
+            self.api.dns.add(name, record)
+        self.api.dns.add(name, Record(name, 'TXT', 'stale'))
+        self.api.calls.clear()
+
+        desired = zone(name, 2)[:1] + zone(name, 1)[1:]
+        added, deleted = self.api.dns.sync(name.upper(), desired)
+        self.assertEqual(added, [Record(name, 'A', '192.0.2.2')])
+        self.assertEqual(sorted(deleted), [
+            Record(name, 'A', '192.0.2.1'), Record(name, 'TXT', 'stale')])
+        self.assertEqual(self.api.calls, {
+            'dnsrecord_list': 1, 'dnsrecord_add': 1, 'dnsrecord_del': 2})
+        self.assertEqual(
+            sorted(self.api.dns.records(name, page_size=2)), sorted(desired))
+
+        # Same desired records: nothing is called at all.
+        self.api.calls.clear()
+        self.assertIsNone(self.api.dns.sync(name, reversed(desired)))
+        self.assertEqual(self.api.calls, {})
+        self.assertEqual(
+            self.api.dns.sync(name, desired, force=True), ([], []))
+
+    def test_bulk_sync(self):
+        zones = [(name, zone(name, num)) for num, name in enumerate(
+            self.names)]
+        zones.append(('unknown.nl', zone('unknown.nl', 0)))
+
+        with TemporaryDirectory() as tmpdir:
+            hashes_file = os.path.join(tmpdir, 'dns.json')
+            result = self.api.dns.bulk_sync(
+                zones, workers=3, hashes_file=hashes_file)
+            self.assertEqual(
+                (result.ok, result.skipped, result.failed), (12, 0, 1))
+            self.assertEqual(result.failures[0][:2], ('unknown.nl', 9))
+            self.assertEqual(self.api.calls, {
+                'dnsrecord_list': 13, 'dnsrecord_add': 36})
+            with open(hashes_file) as fp:
+                self.assertEqual(len(json.load(fp)), 12)
+
+            # A new run (new API object) only syncs the changed zone.
+            api = OxxapyCountingApi(self.portfolio)
+            zones[3] = (self.names[3], zone(self.names[3], 99))
+            result = api.dns.bulk_sync(
+                zones[:12], hashes_file=hashes_file)
+            self.assertEqual(
+                (result.ok, result.skipped, result.failed), (1, 11, 0))
+            self.assertEqual(api.calls, {
+                'dnsrecord_list': 1, 'dnsrecord_add': 1, 'dnsrecord_del': 1})
@@ -6,14 +6,39 @@ Copyright (C) 2021 Walter Doekes, OSSO B.V.
 
 See README.rst for more info.
 """
+from collections import Counter
+from decimal import Decimal
+from threading import Lock
+from time import monotonic
 from unittest import TestCase
 
+from oxxapy.core import OxxapyRequest, OxxapyResponse
 from oxxapy.domain import OxxapyDomain
+from oxxapy.simulator import OxxapySimulatorPortfolio
 
 # Internals!
 from oxxapy.response import ElementTree, _OxxapyXml
 
-from bogo_oxxapy import OxxapyWithResponse
+from bogo_oxxapy import OxxapyWithPortfolio, OxxapyWithResponse, order_xml
+
+
+class OxxapyCheckingApi(OxxapyWithPortfolio):
+    "Count the domain_check calls; fail for the 'broken' sld"
+    def __init__(self, portfolio):
+        super().__init__(portfolio)
+        self.checked = []
+        self._lock = Lock()
+
+    def _xmlcall(self, command, **params):
+        if command == 'domain_check':
+            with self._lock:
+                self.checked.append('{sld}.{tld}'.format(**params))
+            if params['sld'] == 'broken':
+                req = OxxapyRequest(
+                    'https://BOGO-OXXAPY/command.php', command, params)
+                binxml = order_xml(command, 'XMLERR 2', 'Ongeldige tld')
+                return OxxapyResponse.from_binstr(binxml, req).extract_order()
+        return super()._xmlcall(command, **params)
 
 
 class OxxapyDomainTestCase(TestCase):
@@ -102,3 +127,184 @@ class OxxapyDomainTestCase(TestCase):
         self.assertEqual(example_com.tech_c, api.identities.get('TECH00000'))
         self.assertEqual(example_com.bill_c, api.identities.get('BILL00000'))
         self.assertEqual(example_com.reseller, api.resellers.none())
+
+
+class OxxapyDomainCheckManyTestCase(TestCase):
+    def test_check_many(self):
+        portfolio = OxxapySimulatorPortfolio.generate(domains=6)
+        portfolio.taken.add('taken.com')
+        api = OxxapyCheckingApi(portfolio)
+        owned = sorted(portfolio.domains)[0]
+        list(api.domains.all())  # fills the portfolio index
+
+        names = [
+            ' Free.NL. ', 'free.nl', 'taken.com', owned.upper(),
+            'b\xfccher.de', 'broken.nl', 'nodot']
+        checks = dict(
+            (check.name, check) for check in api.domains.check_many(
+                names, workers=3))
+        self.assertEqual(sorted(api.checked), [
+            'broken.nl', 'free.nl', 'taken.com', 'xn--bcher-kva.de'])
+
+        self.assertEqual(checks['free.nl'].free, True)
+        self.assertEqual(checks['free.nl'].price, Decimal('3.07'))
+        self.assertEqual(checks['free.nl'].source, 'api')
+        self.assertEqual(checks['taken.com'].free, False)
+        self.assertEqual(checks['xn--bcher-kva.de'].price, Decimal('4.50'))
+        self.assertEqual(checks[owned].free, False)
+        self.assertEqual(checks[owned].source, 'portfolio')
+        self.assertEqual(checks['broken.nl'].free, None)
+        self.assertEqual(checks['broken.nl'].error, (2, 'Ongeldige tld'))
+        self.assertEqual(checks['nodot'].error[0], 0)
+
+        # Second time, the successful checks come from the cache.
+        api.checked.clear()
+        checks = dict(
+            (check.name, check) for check in api.domains.check_many(
+                ['free.nl', 'taken.com', 'broken.nl']))
+        self.assertEqual(api.checked, ['broken.nl'])
+        self.assertEqual(checks['free.nl'].source, 'cache')
+        self.assertEqual(checks['free.nl'].price, Decimal('3.07'))
+        self.assertEqual(checks['taken.com'].free, False)
+
+        # Unless they have expired.
+        api.checked.clear()
+        list(api.domains.check_many(['free.nl'], ttl=0))
+        self.assertEqual(api.checked, ['free.nl'])
+        self.assertTrue(api.domains.get('free.nl').is_free())
+
+    def test_check_bad_price(self):
+        portfolio = OxxapySimulatorPortfolio.generate(domains=0)
+        portfolio.prices['nl'] = '12,50'
+        api = OxxapyCheckingApi(portfolio)
+        checks = list(api.domains.check_many(['free.nl', 'free.com']))
+        self.assertEqual(
+            sorted((check.name, check.free, check.price) for check in checks),
+            [('free.com', True, Decimal(portfolio.prices['com'])),
+             ('free.nl', True, None)])
+
+    def test_check_cache(self):
+        portfolio = OxxapySimulatorPortfolio.generate(domains=0)
+        api = OxxapyCheckingApi(portfolio)
+        api.domains._checks.max_size = 5
+        names = [f'free{i}.nl' for i in range(8)]
+        t0 = monotonic()
+        list(api.domains.check_many(names, workers=2, max_rate=100))
+        self.assertGreaterEqual(monotonic() - t0, 0.07)  # 8 at 100/s
+        self.assertEqual(len(api.domains._checks), 5)
+
+        # Expired checks are evicted.
+        self.assertIsNone(api.domains._checks.get('free7.nl', ttl=0))
+        self.assertEqual(len(api.domains._checks), 0)
+
+
+class OxxapyNsgroupMigrationTestCase(TestCase):
+    def test_migrate_nsgroup(self):
+        portfolio = OxxapySimulatorPortfolio.generate(domains=60, nsgroups=3)
+        calls = Counter()
+
+        class OxxapyCountingApi(OxxapyWithPortfolio):
+            def _xmlcall(self, command, **params):
+                calls[command] += 1
+                return super()._xmlcall(command, **params)
+
+        api = OxxapyCountingApi(portfolio)
+        old, new = api.nsgroups.get('NSGR00000'), api.nsgroups.get('NSGR00001')
+        on_old = sorted(
+            name for name, domain in portfolio.domains.items()
+            if domain['nsgroup'] == old.handle)
+        on_new = sorted(
+            name for name, domain in portfolio.domains.items()
+            if domain['nsgroup'] == new.handle)
+
+        # One is migrated already, on the API but not in our listing.
+        list(api.domains.all())
+        api.domains.get(on_old[0]).set_nsgroup(new, dnssec_delete=True)
+        self.assertFalse(portfolio.domains[on_old[0]]['dnssec'])
+        calls.clear()
+
+        result = api.domains.migrate_nsgroup(old, new, workers=3)
+        self.assertEqual(result.ok, len(on_old))
+        self.assertEqual(result.skipped, len(on_new))
+        self.assertEqual(calls, {'domain_ns_upd': len(on_old)})
+        self.assertFalse(any(
+            domain['nsgroup'] == old.handle
+            for domain in portfolio.domains.values()))
+
+        # The cached listing was updated: a rerun does nothing.
+        calls.clear()
+        result = api.domains.migrate_nsgroup(old, new)
+        self.assertEqual(
+            (result.ok, result.skipped), (0, len(on_old) + len(on_new)))
+        self.assertEqual(calls, {})
+
+
+class OxxapyDomainQuerySetTestCase(TestCase):
+    def setUp(self):
+        self.portfolio = OxxapySimulatorPortfolio.generate(domains=50)
+        self.calls = calls = []
+
+        class OxxapyRecordingApi(OxxapyWithPortfolio):
+            def _xmlcall(self, command, **params):
+                calls.append((command, params))
+                return super()._xmlcall(command, **params)
+
+        self.api = OxxapyRecordingApi(self.portfolio)
+
+    def test_lazy_slice(self):
+        query = self.api.domains.filter(tld='nl').filter(autorenew=True)
+        soonest = query.order_by('expire_date')[:5][1:]
+        self.assertEqual(self.calls, [])
+
+        expected = sorted(
+            (domain['expire_date'], name)
+            for name, domain in self.portfolio.domains.items()
+            if name.endswith('.nl') and domain['autorenew'])
+        self.assertEqual(
+            [domain.name for domain in soonest],
+            [name for expire_date, name in expected[1:5]])
+        self.assertEqual(self.calls, [('domain_list', {
+            'tld': 'nl', 'autorenew': True, 'sortname': 'expire_date',
+            'sortorder': 'ASC', 'start': 1, 'records': 4})])
+
+        self.assertEqual(
+            query.order_by('-name')[0].name, max(
+                name for expire_date, name in expected))
+        self.assertEqual(len(list(query)), len(expected))
+        self.assertEqual(list(query[3:3]), [])
+        self.assertEqual(self.calls[-1][1]['records'], -1)
+        self.assertEqual(len(self.calls), 3)
+
+    def test_count(self):
+        total = len(self.portfolio.domains)
+        self.assertEqual(self.api.domains.all().count(), total)
+        self.assertEqual(self.api.domains.all()[10:].count(), total - 10)
+        self.assertEqual(self.api.domains.all()[5:8].count(), 3)
+        self.assertTrue(self.api.domains.filter(tld='nl').exists())
+        self.assertFalse(self.api.domains.filter(domain='nosuch').exists())
+        self.assertEqual(
+            [params['records'] for command, params in self.calls],
+            [1, 1, 1, 1, 1])
+
+    def test_merge(self):
+        query = self.api.domains.filter(tld='nl')
+        self.assertIs(query.filter(tld='nl')._filters['tld'], 'nl')
+        with self.assertRaises(ValueError):
+            query.filter(tld='com')
+        with self.assertRaises(NotImplementedError):
+            query.filter(domain='example.nl')
+        with self.assertRaises(TypeError):
+            query[:10].filter(autorenew=True)
+        with self.assertRaises(TypeError):
+            query.filter(identity='IDEN00000')
+        self.assertEqual(self.calls, [])
+
+    def test_reseller_slice(self):
+        query = self.api.domains.filter(
+            tld='nl', reseller=self.api.resellers.none())
+        self.assertEqual(len(list(query[2:4])), 2)
+        # The slice is taken locally: the domain_inf calls stop early.
+        self.assertEqual(
+            [command for command, params in self.calls],
+            ['domain_list'] + ['domain_inf'] * 4)
+        self.assertEqual(self.calls[0][1], {'tld': 'nl', 'records': -1})
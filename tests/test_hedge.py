@@ -0,0 +1,92 @@
+# vim: set ts=8 sw=4 sts=4 et ai tw=79:
+"""
+OXXA API Library in Python (oxxapy), licensed under the LGPLv3+.
+
+Copyright (C) 2021 Walter Doekes, OSSO B.V.
+
+See README.rst for more info.
+"""
+from threading import Lock
+from time import sleep
+from unittest import TestCase
+
+from oxxapy.core import OxxapyRequest
+from oxxapy.response import OxxapyResponse
+
+# Internals!
+from oxxapy.transport import _local
+
+from bogo_oxxapy import _BogoOxxapy
+
+DOMAIN_CHECK_TAKEN = b'''\
+<?xml version="1.0" encoding="UTF-8"?>
+<channel>
+  <order>
+    <order_id>123457890</order_id><command>domain_check</command>
+    <sld>example</sld><tld>com</tld>
+    <status_code>XMLOK 10</status_code>
+    <status_description>Domeinnaam is bezet.</status_description>
+    <price/>
+    <order_complete>TRUE</order_complete><done>TRUE</done>
+  </order>
+</channel>
+'''
+
+
+class OxxapySlowFirst(_BogoOxxapy):
+    "The first call hangs until it is cancelled; the rest are fast"
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+        self.cancelled = []
+        self._lock = Lock()
+
+    def _xmlcall(self, command, **params):
+        with self._lock:
+            self.calls += 1
+            first = (self.calls == 1)
+        if first:
+            scope = getattr(_local, 'scope', None)
+            for i in range(100):
+                if scope is not None and scope.cancelled:
+                    self.cancelled.append(scope)
+                    raise ConnectionAbortedError('request cancelled')
+                sleep(0.01)
+        req = OxxapyRequest('https://BOGO-OXXAPY/command.php', command, params)
+        return OxxapyResponse.from_binstr(
+            DOMAIN_CHECK_TAKEN, req).extract_order()
+
+
+class OxxapyHedgeTestCase(TestCase):
+    def setUp(self):
+        self.api = OxxapySlowFirst()
+
+    def _warm_up(self, seconds):
+        for i in range(20):
+            self.api._hedger.tracker.add('domain_check', seconds)
+
+    def test_hedged_wins(self):
+        self.api.set_hedging(max_rate=1.0)
+        self._warm_up(0.01)
+        self.assertFalse(self.api.domains.get('example.com').is_free())
+        self.assertEqual(self.api.calls, 2)
+        sleep(0.05)  # give the loser time to notice
+        self.assertEqual(len(self.api.cancelled), 1)
+        self.assertEqual(list(self.api._hedger._history), [1])
+        # Measured from the start of the call, not of the hedge.
+        self.assertGreaterEqual(
+            self.api._hedger.tracker._samples['domain_check'][-1], 0.01)
+
+    def test_rate_cap(self):
+        self.api.set_hedging(max_rate=0.0)
+        self._warm_up(0.01)
+        self.assertFalse(self.api.domains.get('example.com').is_free())
+        self.assertEqual(self.api.calls, 1)
+        self.assertEqual(self.api._hedger.hedge_rate, 0.0)
+        self.assertEqual(list(self.api._hedger._history), [0])
+
+    def test_not_for_mutations(self):
+        self.assertRaises(
+            ValueError, self.api.set_hedging, commands=('domain_upd',))
+        self.api.set_hedging(commands=())
+        self.assertIsNone(self.api._hedger)
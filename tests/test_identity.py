@@ -0,0 +1,108 @@
+# vim: set ts=8 sw=4 sts=4 et ai tw=79:
+"""
+OXXA API Library in Python (oxxapy), licensed under the LGPLv3+.
+
+Copyright (C) 2021 Walter Doekes, OSSO B.V.
+
+See README.rst for more info.
+"""
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from time import sleep
+from unittest import TestCase
+
+from oxxapy.identity import OxxapyIdentity
+from oxxapy.simulator import OxxapySimulatorPortfolio
+
+from bogo_oxxapy import OxxapyWithPortfolio
+
+
+class OxxapyCountingApi(OxxapyWithPortfolio):
+    "Count the calls; identity_get is slow, to let threads overlap"
+    def __init__(self, portfolio):
+        super().__init__(portfolio)
+        self.calls = Counter()
+        self._lock = Lock()
+
+    def _xmlcall(self, command, **params):
+        with self._lock:
+            self.calls[command] += 1
+        if command == 'identity_get':
+            sleep(0.01)
+        return super()._xmlcall(command, **params)
+
+
+class OxxapyIdentityTestCase(TestCase):
+    def setUp(self):
+        self.portfolio = OxxapySimulatorPortfolio.generate(
+            domains=300, identities=20)
+        self.api = OxxapyCountingApi(self.portfolio)
+
+    def test_lazy(self):
+        identity = self.api.identities.get('IDEN00003')
+        self.assertEqual(
+            identity.nameaddr, 'Firstname3 Lastname3 <iden00003@example.org>')
+        self.assertEqual(identity.company_name, 'Company 3 B.V.')
+        self.assertEqual(identity.tel, '0123456789')
+        self.assertEqual(self.api.calls, {'identity_get': 1})
+
+        # Listing keeps the hydrated identity.
+        self.api.identities.all()
+        self.assertIs(self.api.identities.get('IDEN00003'), identity)
+        identity.email
+        self.assertEqual(
+            self.api.calls, {'identity_get': 1, 'identity_list': 1})
+
+    def test_ttl(self):
+        identity = self.api.identities.get('IDEN00003')
+        identity.email
+        self.api.identities.ttl = 0
+        identity.email
+        self.assertEqual(self.api.calls, {'identity_get': 2})
+
+    def test_domain_contacts(self):
+        domains = list(self.api.domains.all())
+        handles = set(domain.reg_c.handle for domain in domains)
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            nameaddrs = list(executor.map(
+                (lambda domain: domain.reg_c.nameaddr), domains))
+        self.assertEqual(len(nameaddrs), 300)
+        self.assertEqual(
+            self.api.calls, {'domain_list': 1, 'identity_get': len(handles)})
+
+    def test_hydrate(self):
+        domains = list(self.api.domains.all())
+        result = self.api.identities.hydrate(
+            domain.admin_c for domain in domains)
+        self.assertEqual(
+            (result.ok, result.skipped, result.failed),
+            (self.api.calls['identity_get'], 0, 0))
+
+        result = self.api.identities.hydrate(
+            ['IDEN00000', 'IDEN00019', 'NOSUCH', 'NOSUCH'], workers=2)
+        self.assertEqual((result.ok + result.skipped, result.failed), (2, 1))
+        self.assertEqual(result.failures[0][:2], ('NOSUCH', 11))
+
+        calls = self.api.calls['identity_get']
+        for domain in domains:
+            domain.admin_c.nameaddr
+        self.assertEqual(self.api.calls['identity_get'], calls)
+
+
+    def test_cache_race(self):
+        created = []
+
+        def slow_identity():
+            created.append(1)
+            sleep(0.01)  # let the other threads get to the check
+            return OxxapyIdentity(self.api, 'IDEN00003')
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            identities = list(executor.map(
+                (lambda _: self.api._cache_get(
+                    OxxapyIdentity, 'IDEN00003', slow_identity)),
+                range(8)))
+        self.assertEqual(len(created), 1)
+        self.assertTrue(all(
+            identity is identities[0] for identity in identities))
@@ -0,0 +1,99 @@
+# vim: set ts=8 sw=4 sts=4 et ai tw=79:
+"""
+OXXA API Library in Python (oxxapy), licensed under the LGPLv3+.
+
+Copyright (C) 2021 Walter Doekes, OSSO B.V.
+
+See README.rst for more info.
+"""
+from unittest import TestCase
+
+from oxxapy.identity import OxxapyIdentity
+from oxxapy.simulator import OxxapySimulatorPortfolio
+
+from bogo_oxxapy import OxxapyWithPortfolio
+
+
+class OxxapyRecordingApi(OxxapyWithPortfolio):
+    def __init__(self, portfolio):
+        super().__init__(portfolio)
+        self.calls = []
+
+    def _xmlcall(self, command, **params):
+        self.calls.append((command, params))
+        return super()._xmlcall(command, **params)
+
+
+def handles(objects):
+    return [obj.handle for obj in objects]
+
+
+class OxxapyListingManagerTestCase(TestCase):
+    def setUp(self):
+        self.portfolio = OxxapySimulatorPortfolio.generate(
+            domains=0, identities=30, nsgroups=3, resellers=2)
+        self.api = OxxapyRecordingApi(self.portfolio)
+
+    def test_pushdown(self):
+        hydrated = self.api.identities.get('IDEN00001')
+        hydrated.email
+        self.api.calls.clear()
+
+        ret = self.api.identities.filter(alias='alias1')
+        self.assertEqual(handles(ret), [
+            'IDEN00001', 'IDEN00010', 'IDEN00011', 'IDEN00012', 'IDEN00013',
+            'IDEN00014', 'IDEN00015', 'IDEN00016', 'IDEN00017', 'IDEN00018',
+            'IDEN00019'])
+        self.assertEqual(self.api.calls, [
+            ('identity_list', {'alias': 'alias1', 'records': -1})])
+        # Merged into the cache: the hydrated identity is kept.
+        self.assertIs(ret[0], hydrated)
+        self.assertEqual(
+            len(self.api._caches[OxxapyIdentity.__name__]), 11)
+
+        ret = self.api.identities.filter(
+            name='firstname2', sortname='alias', sortorder='DESC', start=2,
+            records=3)
+        self.assertEqual(
+            handles(ret), ['IDEN00027', 'IDEN00026', 'IDEN00025'])
+        self.assertEqual(self.api.calls[-1], ('identity_list', {
+            'name': 'firstname2', 'sortname': 'alias', 'sortorder': 'DESC',
+            'start': 2, 'records': 3}))
+
+        self.assertEqual(
+            handles(self.api.nsgroups.filter(handle='NSGR00001')),
+            ['NSGR00001'])
+        self.assertEqual(self.api.calls[-1], ('nsgroup_list', {
+            'nsgroup': 'NSGR00001', 'records': -1}))
+
+    def test_cached_listing(self):
+        self.assertEqual(len(self.api.identities.all()), 30)
+        self.api.calls.clear()
+
+        queries = (
+            dict(alias='ALIAS1'),
+            dict(name='firstname2', company_name='company'),
+            dict(handle='iden0002', sortname='alias', sortorder='DESC',
+                 start=2, records=3),
+            dict(handle='NOSUCH'))
+        local = [self.api.identities.filter(**query) for query in queries]
+        self.assertEqual(self.api.calls, [])
+
+        # The same as the API says.
+        self.api.identities.listing_ttl = 0
+        for query, ret in zip(queries, local):
+            self.assertEqual(
+                handles(ret), handles(self.api.identities.filter(**query)))
+        self.assertEqual(len(self.api.calls), 4)
+
+    def test_not_answered_by_listing(self):
+        self.api.identities.all()
+        self.api.resellers.all()
+        self.api.calls.clear()
+
+        self.api.identities.filter(global_search='company 1')
+        self.api.identities.filter(alias='alias1', sortname='email')
+        self.api.resellers.filter(name='reseller')
+        self.assertEqual(
+            [command for command, params in self.api.calls],
+            ['identity_list', 'identity_list', 'resellerlist'])
@@ -0,0 +1,70 @@
+# vim: set ts=8 sw=4 sts=4 et ai tw=79:
+"""
+OXXA API Library in Python (oxxapy), licensed under the LGPLv3+.
+
+Copyright (C) 2021 Walter Doekes, OSSO B.V.
+
+See README.rst for more info.
+"""
+import gc
+import tracemalloc
+from unittest import TestCase
+
+from oxxapy.simulator import OxxapySimulatorPortfolio
+
+from bogo_oxxapy import OxxapyWithPortfolio
+
+# Budgets in bytes, with some headroom above the measured values (on
+# CPython 3.11: 437, 2302, 418 and 508). A failing test means that
+# something now keeps XML nodes, requests or responses alive, or that a
+# feature made every object a lot bigger.
+DOMAIN_LISTED_BUDGET = 500
+DOMAIN_LISTING_PEAK_BUDGET = 3500
+DOMAIN_HYDRATED_BUDGET = 550
+CACHED_OBJECT_BUDGET = 700
+
+DOMAINS = 1000
+
+
+class OxxapyMemoryTestCase(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.portfolio = OxxapySimulatorPortfolio.generate(
+            domains=DOMAINS, identities=500, nsgroups=50, resellers=50)
+
+    def setUp(self):
+        self.api = OxxapyWithPortfolio(self.portfolio)
+        gc.collect()
+        tracemalloc.start()
+
+    def tearDown(self):
+        tracemalloc.stop()
+
+    def _traced(self):
+        "Return (current, peak) traced bytes"
+        gc.collect()
+        return tracemalloc.get_traced_memory()
+
+    def test_listing(self):
+        domains = list(self.api.domains.all())
+        current, peak = self._traced()
+        self.assertEqual(len(domains), DOMAINS)
+        self.assertLess(current / DOMAINS, DOMAIN_LISTED_BUDGET)
+        self.assertLess(peak / DOMAINS, DOMAIN_LISTING_PEAK_BUDGET)
+
+    def test_hydration(self):
+        domains = list(self.api.domains.all())
+        for domain in domains:
+            domain._update()
+        current, peak = self._traced()
+        self.assertLess(current / DOMAINS, DOMAIN_HYDRATED_BUDGET)
+
+    def test_core_cache(self):
+        objects = (
+            len(self.api.identities.all()) + len(self.api.nsgroups.all()) +
+            len(self.api.resellers.all()))
+        current, peak = self._traced()
+        self.assertEqual(objects, 600)
+        self.assertEqual(
+            sum(len(cache) for cache in self.api._caches.values()), 600)
+        self.assertLess(current / objects, CACHED_OBJECT_BUDGET)
@@ -0,0 +1,73 @@
+# vim: set ts=8 sw=4 sts=4 et ai tw=79:
+"""
+OXXA API Library in Python (oxxapy), licensed under the LGPLv3+.
+
+Copyright (C) 2021 Walter Doekes, OSSO B.V.
+
+See README.rst for more info.
+"""
+from unittest import TestCase
+
+from oxxapy.exceptions import OxxapyTransactionError
+from oxxapy.metrics import OxxapyMetrics
+
+from bogo_oxxapy import DOMAIN_LIST_NL, OxxapyWithResponse, order_xml
+
+
+class OxxapyMetricsTestCase(TestCase):
+    def test_call_metrics(self):
+        api = OxxapyWithResponse()
+        api.push_reqresp(
+            dict(command='domain_list', records=-1), DOMAIN_LIST_NL)
+        api.push_reqresp(
+            dict(command='domain_inf', sld='example', tld='nl'),
+            order_xml('domain_inf', 'XMLERR 24', 'Niet onder beheer'))
+
+        self.assertEqual(len(list(api.domains.all())), 2)
+        self.assertRaises(
+            OxxapyTransactionError, api.raw, 'domain_inf',
+            sld='example', tld='nl')
+
+        snapshot = api.metrics.snapshot()
+        self.assertEqual(snapshot['domain_list']['calls'], 1)
+        self.assertEqual(snapshot['domain_list']['errors'], {})
+        self.assertEqual(snapshot['domain_inf']['calls'], 1)
+        self.assertEqual(snapshot['domain_inf']['errors'], {24: 1})
+        self.assertEqual(
+            snapshot['domain_inf']['latency']['total']['count'], 1)
+
+    def test_other_exceptions(self):
+        api = OxxapyWithResponse()
+        api.push_reqresp(
+            dict(command='domain_inf', sld='example', tld='nl'),
+            order_xml('domain_inf', 'BOGUS 1', 'Onbekend'))
+        self.assertRaises(
+            NotImplementedError, api.raw, 'domain_inf',
+            sld='example', tld='nl')
+        self.assertEqual(
+            api.metrics.snapshot()['domain_inf']['errors'], {'exception': 1})
+
+    def test_render(self):
+        metrics = OxxapyMetrics()
+        metrics.observe_call('domain_inf', 0.2)
+        metrics.observe_call('domain_inf', 0.3, error=24)
+        metrics.observe_transfer(
+            'domain_inf', {'connect': 0.0, 'ttfb': 0.15, 'download': 0.01},
+            size=1500, parse=0.001)
+
+        text = metrics.render_openmetrics()
+        self.assertIn('oxxapy_calls_total{command="domain_inf"} 2\n', text)
+        self.assertIn(
+            'oxxapy_errors_total{command="domain_inf",code="24"} 1\n', text)
+        self.assertIn(
+            'oxxapy_latency_seconds_bucket{command="domain_inf",'
+            'phase="ttfb",le="0.25"} 1\n', text)
+        self.assertIn(
+            'oxxapy_latency_seconds_bucket{command="domain_inf",'
+            'phase="total",le="+Inf"} 2\n', text)
+        self.assertIn(
+            'oxxapy_response_bytes_bucket{command="domain_inf",'
+            'le="1024.0"} 0\n', text)
+        self.assertIn(
+            'oxxapy_response_bytes_count{command="domain_inf"} 1\n', text)
+        self.assertTrue(text.endswith('# EOF\n'))
@@ -0,0 +1,138 @@
+# vim: set ts=8 sw=4 sts=4 et ai tw=79:
+"""
+OXXA API Library in Python (oxxapy), licensed under the LGPLv3+.
+
+Copyright (C) 2021 Walter Doekes, OSSO B.V.
+
+See README.rst for more info.
+"""
+from collections import Counter
+from unittest import TestCase
+
+from oxxapy.exceptions import OxxapyDeadlineExceeded
+from oxxapy.simulator import OxxapySimulatorPortfolio
+
+from bogo_oxxapy import OxxapyWithPortfolio
+
+
+class OxxapyCountingApi(OxxapyWithPortfolio):
+    def __init__(self, portfolio):
+        super().__init__(portfolio)
+        self.calls = Counter()
+
+    def _xmlcall(self, command, **params):
+        self.calls[command] += 1
+        return super()._xmlcall(command, **params)
+
+
+class OxxapyOrderTrackerTestCase(TestCase):
+    def setUp(self):
+        self.portfolio = OxxapySimulatorPortfolio.generate(domains=0)
+        self.api = OxxapyCountingApi(self.portfolio)
+        self.names = [f'moving{num}.nl' for num in range(30)]
+        result = self.api.cart.bulk_order(
+            ({'domain': name, 'reg_c': 'IDEN00000', 'admin_c': 'IDEN00000',
+              'nsgroup': 'NSGR00000'} for name in self.names),
+            '127.0.0.1', producttype='transfer')
+        self.assertEqual(result.pending, 30)
+        self.api.calls.clear()
+
+    def test_listing(self):
+        orders = list(self.api.orders.filter(state='P', page_size=7))
+        self.assertEqual(len(orders), 30)
+        self.assertEqual(self.api.calls, {'order_list': 5})
+        self.assertEqual(
+            (orders[0].name, orders[0].type, orders[0].state),
+            ('moving0.nl', 'transfer', 'P'))
+
+    def test_tracker(self):
+        tracker = self.api.orders.tracker(
+            interval=0.001, max_interval=0.01, page_size=10)
+        done = []
+        futures = [
+            tracker.track(name, callback=done.append) for name in self.names]
+        self.assertEqual(tracker.poll(), [])
+        self.assertEqual(self.api.calls, {'order_list': 3})
+
+        # 20 succeed and 5 fail; 5 stay pending.
+        for name in self.names[:20]:
+            self.portfolio.complete_order(name)
+        for name in self.names[20:25]:
+            self.portfolio.complete_order(name, success=False)
+        self.api.calls.clear()
+        outcomes = tracker.poll()
+        self.assertEqual(len(outcomes), 25)
+        # One page of P, then the outcomes from 2 pages of S and 1 of E.
+        self.assertEqual(self.api.calls, {'order_list': 4})
+        self.assertEqual(len(tracker), 5)
+        self.assertEqual(futures[0].result().status, 'ok')
+        self.assertEqual(futures[20].result().status, 'failed')
+        self.assertEqual(
+            futures[20].result().message,
+            'Verhuizing geweigerd door huidige registrar')
+        self.assertFalse(futures[29].done())
+        self.assertEqual(len(done), 25)
+        self.assertIn('moving0.nl', self.portfolio.domains)
+
+        # Nothing happens until the deadline.
+        with self.assertRaises(OxxapyDeadlineExceeded) as cm:
+            with self.api.deadline(0.05):
+                list(tracker.as_completed())
+        self.assertEqual(cm.exception.args[1], sorted(self.names[25:]))
+
+        for name in self.names[25:]:
+            self.portfolio.complete_order(name)
+        outcomes = list(tracker.as_completed())
+        self.assertEqual(len(outcomes), 5)
+        self.assertEqual(len(tracker), 0)
+        self.assertTrue(all(future.done() for future in futures))
+
+    def test_tracker_fallback(self):
+        tracker = self.api.orders.tracker(page_size=10)
+        future = tracker.track(self.names[0])
+        self.assertEqual(tracker.poll(), [])
+
+        # Gone from all listings: ask transfer_status.
+        del self.portfolio.orders[max(
+            order_id for order_id, order in self.portfolio.orders.items()
+            if order['domainname'] == self.names[0])]
+        self.api.calls.clear()
+        self.assertEqual(len(tracker.poll()), 1)
+        # Three pages of P, then one order_list for the domain.
+        self.assertEqual(
+            self.api.calls, {'order_list': 4, 'transfer_status': 1})
+        self.assertEqual(future.result().status, 'failed')
+
+    def test_tracker_history(self):
+        # 20 orders finished before tracking started.
+        for name in self.names[:20]:
+            self.portfolio.complete_order(name)
+        tracker = self.api.orders.tracker(page_size=10)
+        for name in self.names[20:]:
+            tracker.track(name)
+        self.assertEqual(tracker.poll(), [])
+
+        for name in self.names[20:25]:
+            self.portfolio.complete_order(name)
+        self.api.calls.clear()
+        self.assertEqual(len(tracker.poll()), 5)
+        # P, then the first page of S only: the rest is older.
+        self.assertEqual(self.api.calls, {'order_list': 2})
+
+    def test_tracker_not_seen_pending(self):
+        name = self.names[0]
+        self.portfolio.complete_order(name, success=False)  # long ago
+        self.api.cart.bulk_order(
+            [{'domain': name, 'reg_c': 'IDEN00000', 'admin_c': 'IDEN00000',
+              'nsgroup': 'NSGR00000'}], '127.0.0.1',
+            producttype='transfer')
+        self.portfolio.complete_order(name)  # before the first poll
+
+        tracker = self.api.orders.tracker(page_size=10)
+        future = tracker.track(name)
+        self.api.calls.clear()
+        self.assertEqual(len(tracker.poll()), 1)
+        # Not the old failure from the listings, but transfer_status.
+        self.assertEqual(future.result().status, 'ok')
+        self.assertEqual(
+            self.api.calls, {'order_list': 3, 'transfer_status': 1})
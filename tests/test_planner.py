@@ -0,0 +1,138 @@
+# vim: set ts=8 sw=4 sts=4 et ai tw=79:
+"""
+OXXA API Library in Python (oxxapy), licensed under the LGPLv3+.
+
+Copyright (C) 2021 Walter Doekes, OSSO B.V.
+
+See README.rst for more info.
+"""
+from collections import Counter
+from threading import Lock
+from unittest import TestCase
+
+from oxxapy.planner import OxxapyQueryPlan, calls_cost, cheapest, explain
+from oxxapy.simulator import OxxapySimulatorPortfolio
+
+from bogo_oxxapy import OxxapyWithPortfolio
+
+
+class OxxapyCountingApi(OxxapyWithPortfolio):
+    def __init__(self, portfolio):
+        super().__init__(portfolio)
+        self.calls = Counter()
+        self._lock = Lock()
+
+    def _xmlcall(self, command, **params):
+        with self._lock:
+            self.calls[command] += 1
+        return super()._xmlcall(command, **params)
+
+
+def names(domains):
+    return [domain.name for domain in domains]
+
+
+class OxxapyQueryPlanTestCase(TestCase):
+    def test_cost(self):
+        self.assertEqual(calls_cost(0, 8), 0.0)
+        self.assertEqual(calls_cost(2), 2.0)
+        self.assertEqual(calls_cost(2, 8), 2.0)  # overhead, no gain
+        self.assertEqual(calls_cost(40, 8), 6.0)
+        self.assertEqual(calls_cost(None), 100.0)
+
+    def test_explain(self):
+        api = OxxapyQueryPlan('api', 40)
+        api.add('domain_list', 1)
+        api.add('domain_inf', 40, 8)
+        cache = OxxapyQueryPlan('cache')
+        cache.add('local')
+        cache.add('domain_inf', None)
+        self.assertIs(cheapest([cache, api]), api)
+        self.assertEqual(api.api_calls, 41)
+        self.assertIsNone(cache.api_calls)
+        self.assertEqual(explain([cache, api]), (
+            '  cache: ~? rows, ? API calls, cost 100.0\n'
+            '    - local (0 calls)\n'
+            '    - domain_inf (? calls)\n'
+            '* api: ~40 rows, 41 API calls, cost 7.0\n'
+            '    - domain_list (1 calls)\n'
+            '    - domain_inf (40 calls, 8 workers)'))
+
+
+class OxxapyDomainPlannerTestCase(TestCase):
+    def setUp(self):
+        self.portfolio = OxxapySimulatorPortfolio.generate(domains=200)
+        self.api = OxxapyCountingApi(self.portfolio)
+
+    def test_no_cache_by_default(self):
+        query = self.api.domains.filter(tld='nl')
+        list(self.api.domains.all())
+        self.assertEqual(query.plan().strategy, 'api')
+
+        # A full listing, and a refreshing migration, always refetch.
+        self.api.domains.listing_ttl = 300
+        self.assertEqual(query.plan().strategy, 'cache')
+        self.assertEqual(self.api.domains.all().plan().strategy, 'api')
+        self.api.calls.clear()
+        list(self.api.domains.all())
+        nsgroup = self.api.nsgroups.get('NSGR00001')
+        self.api.domains.migrate_nsgroup(nsgroup, nsgroup, refresh=True)
+        self.assertEqual(self.api.calls, {'domain_list': 2})
+
+    def test_cached_listing(self):
+        self.api.domains.listing_ttl = 300
+        queries = (
+            self.api.domains.filter(tld='nl', autorenew=True),
+            self.api.domains.filter(domain='example1').order_by(
+                '-expire_date')[3:7],
+            self.api.domains.filter(nsgroup='NSGR00001').order_by('nsgroup'),
+            self.api.domains.filter(
+                identity=self.api.identities.get('IDEN00002')))
+        self.assertEqual(
+            [query.plan().strategy for query in queries], ['api'] * 4)
+        list(self.api.domains.all())
+        self.api.calls.clear()
+
+        local = [names(query) for query in queries]
+        self.assertEqual(queries[0].count(), len(local[0]))
+        self.assertEqual(
+            [query.plan().strategy for query in queries], ['cache'] * 4)
+        self.assertEqual(self.api.calls, {})
+
+        # The same as the API says.
+        self.api.domains.listing_ttl = 0
+        self.assertEqual([names(query) for query in queries], local)
+        self.assertEqual(self.api.calls, {'domain_list': 4})
+
+    def test_reseller_hydration(self):
+        reseller = self.api.resellers.none()
+        query = self.api.domains.filter(tld='nl', reseller=reseller)
+        nl_domains = sum(
+            1 for name in self.portfolio.domains if name.endswith('.nl'))
+        expected = sorted(
+            name for name, domain in self.portfolio.domains.items()
+            if name.endswith('.nl') and not domain['identity-reseller'])
+
+        # Nothing known: the unknown number of domain_inf calls is
+        # cheapest when done concurrently.
+        self.assertEqual(query.plan().strategy, 'api+hydrate')
+        self.assertEqual(names(query), expected)
+        self.assertEqual(
+            self.api.calls, {'domain_list': 1, 'domain_inf': nl_domains})
+
+        # With a fresh listing, the resellers are fetched into it once.
+        self.api.domains.listing_ttl = 300
+        list(self.api.domains.all())
+        self.api.calls.clear()
+        self.assertEqual(query.plan().strategy, 'cache+hydrate')
+        self.assertEqual(names(query), expected)
+        self.assertEqual(self.api.calls, {'domain_inf': nl_domains})
+
+        self.api.calls.clear()
+        self.assertTrue(query.explain().startswith(
+            f'* cache: ~{nl_domains} rows, 0 API calls, cost 0.0\n'))
+        self.assertIn(
+            f'api+hydrate: ~{nl_domains} rows, {nl_domains + 1} API '
+            f'calls', query.explain())
+        self.assertEqual(names(query), expected)
+        self.assertEqual(self.api.calls, {})
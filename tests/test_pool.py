@@ -0,0 +1,126 @@
+# vim: set ts=8 sw=4 sts=4 et ai tw=79:
+"""
+OXXA API Library in Python (oxxapy), licensed under the LGPLv3+.
+
+Copyright (C) 2021 Walter Doekes, OSSO B.V.
+
+See README.rst for more info.
+"""
+from http.client import RemoteDisconnected
+from threading import Thread
+from time import sleep
+from unittest import TestCase
+from urllib.request import Request
+
+from oxxapy import OxxapyAccountPool
+from oxxapy.pool import OxxapyFairScheduler
+from oxxapy.transport import OxxapyHttpTransport
+
+from bogo_oxxapy import StaticXmlServer, _StaticXmlHandler
+
+
+class _DroppingHandler(_StaticXmlHandler):
+    "Drops the connection on its second request, without answering it"
+    def handle_one_request(self):
+        self.requests = getattr(self, 'requests', 0) + 1
+        if self.requests == 2:
+            self.raw_requestline = self.rfile.readline()
+            self.server.dropped += 1
+            self.close_connection = True
+            return
+        super().handle_one_request()
+
+
+class OxxapyFairSchedulerTestCase(TestCase):
+    def test_round_robin(self):
+        scheduler = OxxapyFairScheduler(1)
+        scheduler.acquire('bulk')
+        granted = []
+
+        def worker(account):
+            with scheduler.slot(account):
+                granted.append(account)
+
+        threads = []
+        for account in ('bulk', 'bulk', 'bulk', 'small'):
+            threads.append(Thread(target=worker, args=(account,)))
+            threads[-1].start()
+            sleep(0.02)  # enqueue in order
+
+        scheduler.release()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(granted, ['bulk', 'small', 'bulk', 'bulk'])
+
+    def test_timeout(self):
+        scheduler = OxxapyFairScheduler(1)
+        self.assertTrue(scheduler.acquire('a'))
+        self.assertFalse(scheduler.acquire('b', timeout=0.01))
+        scheduler.release()
+        self.assertTrue(scheduler.acquire('b', timeout=0.01))
+
+
+class OxxapyAccountPoolTestCase(TestCase):
+    def setUp(self):
+        self.server = StaticXmlServer()
+        self.pool = OxxapyAccountPool(max_concurrency=2)
+        self.pool.add('a', 'USERA', 'MD57a95bf926a0333f57705aeac07a362a2')
+        self.pool.add('b', 'USERB', 'MD57a95bf926a0333f57705aeac07a362a2')
+        for name in self.pool:
+            self.pool[name]._apiurl = self.server.url
+
+    def tearDown(self):
+        self.pool.close()
+        self.server.close()
+
+    def test_shared_transport(self):
+        api_a, api_b = self.pool['a'], self.pool['b']
+        self.assertIs(api_a, self.pool.get('a'))
+        self.assertIs(api_a._transport, api_b._transport)
+        self.assertIsNot(api_a._caches, api_b._caches)
+
+        self.assertEqual(len(list(api_a.domains.all())), 2)
+        self.assertEqual(len(list(api_b.domains.all())), 2)
+        self.assertEqual(len(list(api_a.domains.all())), 2)
+        self.assertEqual(api_a._transport.connections_opened, 1)
+
+
+class _ClosingHandler(_StaticXmlHandler):
+    "Closes the connection after answering, without telling the client"
+    def do_GET(self):
+        super().do_GET()
+        self.close_connection = True
+
+
+class OxxapyHttpTransportTestCase(TestCase):
+    def setUp(self):
+        self.server = StaticXmlServer()
+        self.server.RequestHandlerClass = _DroppingHandler
+        self.server.dropped = 0
+        self.transport = OxxapyHttpTransport()
+
+    def tearDown(self):
+        self.transport.close()
+        self.server.close()
+
+    def fetch(self, **kwargs):
+        return self.transport.fetch(Request(self.server.url), **kwargs)[0]
+
+    def test_retry_only_idempotent(self):
+        self.assertEqual(self.fetch(), 200)
+        # Dropped after it was sent: it may have been done already.
+        self.assertRaises(RemoteDisconnected, self.fetch)
+        self.assertEqual(self.server.dropped, 1)
+
+        self.assertEqual(self.fetch(), 200)
+        self.assertEqual(self.fetch(idempotent=True), 200)
+        self.assertEqual(self.server.dropped, 2)
+        self.assertEqual(len(self.server.paths), 3)
+
+    def test_closed_idle_connection(self):
+        self.server.RequestHandlerClass = _ClosingHandler
+        self.assertEqual(self.fetch(), 200)
+        sleep(0.05)  # the server closes it now
+        # Not sent on the closed idle connection, so nothing to retry.
+        self.assertEqual(self.fetch(), 200)
+        self.assertEqual(self.transport.connections_opened, 2)
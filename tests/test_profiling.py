@@ -0,0 +1,52 @@
+# vim: set ts=8 sw=4 sts=4 et ai tw=79:
+"""
+OXXA API Library in Python (oxxapy), licensed under the LGPLv3+.
+
+Copyright (C) 2021 Walter Doekes, OSSO B.V.
+
+See README.rst for more info.
+"""
+from unittest import TestCase
+
+from oxxapy import profiling
+
+from bogo_oxxapy import StaticXmlServer, _BogoOxxapy
+
+
+class OxxapyProfilerTestCase(TestCase):
+    def setUp(self):
+        self.server = StaticXmlServer()
+        self.api = _BogoOxxapy()
+        self.api._apiurl = self.server.url
+        self.assertIsNone(profiling._profiler)
+
+    def tearDown(self):
+        profiling.disable()
+        self.api.close()
+        self.server.close()
+
+    def test_layers(self):
+        profiling.enable(top=1, at_exit=False)
+        for domain in self.api.domains.all():
+            domain.reg_c
+        self.api.raw('domain_list', tld='nl')
+        profiler = profiling.disable()
+
+        self.assertEqual(profiler.counts['network'], 2)
+        self.assertEqual(profiler.counts['parse'], 4)  # binstr+order
+        self.assertEqual(profiler.counts['build'], 4)  # 2x from_xml+update
+        # The listing: values, clear and 2x set; then 2x get for reg_c.
+        self.assertEqual(profiler.counts['cache'], 6)
+        for name in profiling.LAYERS:
+            self.assertGreater(profiler.totals[name], 0.0)
+
+        report = profiler.report()
+        self.assertIn('peak memory', report)
+        self.assertIn('slowest 1 calls:', report)
+        self.assertTrue(
+            "domain_list {'records': -1}" in report or
+            "domain_list {'tld': 'nl'}" in report, report)
+
+    def test_disabled(self):
+        self.assertIs(profiling.layer('network'), profiling._NULL)
+        list(self.api.domains.all())
@@ -0,0 +1,133 @@
+# vim: set ts=8 sw=4 sts=4 et ai tw=79:
+"""
+OXXA API Library in Python (oxxapy), licensed under the LGPLv3+.
+
+Copyright (C) 2021 Walter Doekes, OSSO B.V.
+
+See README.rst for more info.
+"""
+from collections import Counter
+from difflib import SequenceMatcher
+from unittest import TestCase
+from unittest.mock import patch
+
+from oxxapy.search import FUZZY_CANDIDATES, OxxapySearchIndex, tokenize
+from oxxapy.simulator import OxxapySimulatorPortfolio
+
+from bogo_oxxapy import OxxapyWithPortfolio
+
+
+class OxxapyCountingApi(OxxapyWithPortfolio):
+    def __init__(self, portfolio):
+        super().__init__(portfolio)
+        self.calls = Counter()
+
+    def _xmlcall(self, command, **params):
+        self.calls[command] += 1
+        return super()._xmlcall(command, **params)
+
+
+class OxxapyCountingMatcher(SequenceMatcher):
+    "Count the tokens that fuzzy lookups compare with the query word"
+    compared = 0
+
+    def set_seq1(self, a):
+        OxxapyCountingMatcher.compared += 1
+        super().set_seq1(a)
+
+
+class OxxapySearchIndexTestCase(TestCase):
+    def setUp(self):
+        self.index = OxxapySearchIndex(
+            key=(lambda item: item[0]), fields=(lambda item: item[1:]))
+        self.index.update([
+            ('A', 'ACME Inc', 'Doe, John'),
+            ('B', 'Acme Hosting', 'Müller, Jürgen'),
+            ('C', 'Managed DNS service', None)], complete=True)
+
+    def keys(self, query, **kwargs):
+        return [item[0] for item in self.index.search(query, **kwargs)]
+
+    def test_tokenize(self):
+        self.assertEqual(tokenize('Müller, Jürgen B.V.'), [
+            'muller', 'jurgen', 'b', 'v'])
+
+    def test_search(self):
+        self.assertEqual(self.keys('acme'), ['A', 'B'])
+        self.assertEqual(self.keys('ac'), ['A', 'B'])
+        self.assertEqual(self.keys('acme hos'), ['B'])
+        self.assertEqual(self.keys('MULLER'), ['B'])
+        self.assertEqual(self.keys('manged dns'), ['C'])  # misspelt
+        self.assertEqual(self.keys('manged dns', fuzzy=False), [])
+        self.assertEqual(self.keys('acme', limit=1), ['A'])
+        self.assertEqual(self.keys('nothing'), [])
+        self.assertEqual(self.keys(' , '), [])
+
+    def test_update(self):
+        self.index.update([('A', 'Example Corp', 'Doe, John')])
+        self.assertEqual(self.keys('acme'), ['B'])
+        self.assertEqual(self.keys('exam'), ['A'])
+        self.assertEqual(len(self.index), 3)
+
+        self.index.update([('B', 'Acme Hosting', None)], complete=True)
+        self.assertEqual(self.keys('doe'), [])
+        self.assertEqual(self.keys('acme'), ['B'])
+        self.assertEqual(self.index._tokens, ['acme', 'hosting'])
+
+        self.index.remove(('B',))
+        self.assertEqual(len(self.index), 0)
+        self.assertEqual(self.index._trigrams, {})
+
+
+class OxxapyManagerSearchTestCase(TestCase):
+    def setUp(self):
+        self.portfolio = OxxapySimulatorPortfolio.generate(
+            domains=0, identities=5000, nsgroups=3, resellers=2)
+        self.api = OxxapyCountingApi(self.portfolio)
+
+    def test_identities(self):
+        self.assertEqual(
+            self.api.identities.search('lastname1234'),
+            [self.api.identities.get('IDEN01234')])
+        # Exact matches rank above the prefix matches (IDEN00420...).
+        self.assertEqual(
+            self.api.identities.search('company 42 firstname42')[0],
+            self.api.identities.get('IDEN00042'))
+        self.assertEqual(self.api.calls, {'identity_list': 1})
+
+        # Fuzzy lookups only compare a few of the 5000 lastname tokens
+        # (benchmarks/bench_parsing.py times the lookups).
+        OxxapyCountingMatcher.compared = 0
+        with patch('oxxapy.search.SequenceMatcher', OxxapyCountingMatcher):
+            for num in range(100):
+                self.assertEqual(
+                    self.api.identities.search(f'alias{num}')[0].alias,
+                    f'alias{num}')
+                self.assertIn(
+                    self.api.identities.get(f'IDEN{num:05d}'),
+                    self.api.identities.search(f'lastnmae{num}'))
+        self.assertGreater(OxxapyCountingMatcher.compared, 0)
+        self.assertLessEqual(
+            OxxapyCountingMatcher.compared, 100 * FUZZY_CANDIDATES)
+        self.assertEqual(self.api.calls, {'identity_list': 1})
+
+        # Relisting refreshes the index.
+        self.portfolio.add_identity('NEWW00000', alias='newcomer')
+        del self.portfolio.identities['IDEN01234']
+        self.api.identities.all()
+        self.assertEqual(
+            [identity.handle for identity in self.api.identities.search(
+                'newc')], ['NEWW00000'])
+        self.assertEqual(
+            self.api.identities.search('lastname1234', fuzzy=False), [])
+
+    def test_nsgroups_and_resellers(self):
+        self.api.nsgroups.all()
+        self.assertEqual(
+            self.api.nsgroups.search('dns2'),
+            [self.api.nsgroups.get('NSGR00002')])
+        self.assertEqual(
+            self.api.resellers.search('reseller 1 b.v.'),
+            [self.api.resellers.get('RESE00001')])
+        self.assertEqual(
+            self.api.calls, {'nsgroup_list': 1, 'resellerlist': 1})
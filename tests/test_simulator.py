@@ -0,0 +1,99 @@
+# vim: set ts=8 sw=4 sts=4 et ai tw=79:
+"""
+OXXA API Library in Python (oxxapy), licensed under the LGPLv3+.
+
+Copyright (C) 2021 Walter Doekes, OSSO B.V.
+
+See README.rst for more info.
+"""
+from unittest import TestCase
+
+from oxxapy.exceptions import OxxapyTransactionError, OxxapyTransportError
+from oxxapy.simulator import OxxapySimulator, OxxapySimulatorPortfolio
+
+from bogo_oxxapy import _BogoOxxapy
+
+
+class OxxapySimulatorTestCase(TestCase):
+    def setUp(self):
+        self.portfolio = OxxapySimulatorPortfolio.generate(domains=30)
+        self.sim = OxxapySimulator(self.portfolio, seed=1).start()
+        self.api = _BogoOxxapy(api_url=self.sim.url)
+
+    def tearDown(self):
+        self.api.close()
+        self.sim.close()
+
+    def test_listing(self):
+        domains = list(self.api.domains.all())
+        self.assertEqual(len(domains), 30)
+        self.assertEqual(domains[0].name, 'domain000000.be')
+        self.assertEqual(len(list(self.api.domains.filter(tld='nl'))), 5)
+        self.assertEqual(len(self.api.identities.all()), 10)
+        self.assertEqual(len(self.api.nsgroups.all()), 3)
+        self.assertEqual(len(self.api.resellers.all()), 2)
+
+        resp = self.api.raw('domain_list', records=10, start=25)
+        details = resp.get_child('details')
+        self.assertEqual(details.get_int_value('domains_total'), 30)
+        self.assertEqual(details.get_int_value('domains_found'), 5)
+
+    def test_mutations(self):
+        domain = self.api.domains.get('domain000004.nl')
+        domain.set_autorenew(False)
+        self.assertIs(self.portfolio.domains[domain.name]['autorenew'], False)
+        domain._update()
+        self.assertIs(domain.autorenew, False)
+
+        domain.set_reseller(self.api.resellers.get('RESE00001'))
+        domain._update()
+        self.assertEqual(domain.reseller.handle, 'RESE00001')
+        self.assertRaises(
+            OxxapyTransactionError, self.api.domains.get('nope.nl')._update)
+
+        self.assertFalse(domain.is_free())
+        self.assertTrue(self.api.domains.get('example.nl').is_free())
+        self.api.raw(
+            'cart_add', sld='example', tld='nl', producttype='register',
+            nsgroup='NSGR00000', enduserip='127.0.0.1',
+            **{'identity-registrant': 'IDEN00000',
+               'identity-admin': 'IDEN00000'})
+        self.api.raw(
+            'cart_add', sld='domain000004', tld='nl', producttype='register',
+            enduserip='127.0.0.1')
+        resp = self.api.raw('cart_purchase', cart_id='ALL')
+        self.assertEqual(resp.status[1], 50)
+        items = resp.get_child('details').get_children('cartitem')
+        self.assertEqual(
+            [item.get_str_value('status_code') for item in items],
+            ['XMLOK 1', 'XMLERR 48'])
+        self.assertFalse(self.api.domains.get('example.nl').is_free())
+
+    def test_faults(self):
+        with self.assertLogs('oxxapy.wire', 'WARNING'):
+            self.sim.fail_next(2)
+            for i in range(2):
+                with self.assertRaises(OxxapyTransportError) as cm:
+                    self.api.raw('nsgroup_list')
+                self.assertEqual(cm.exception.args[0], 503)
+            self.api.raw('nsgroup_list')
+            self.assertEqual(self.sim.stats['errors'], 2)
+
+            self.sim.max_rate = 2
+            codes = []
+            for i in range(4):
+                try:
+                    self.api.raw('nsgroup_list')
+                except OxxapyTransportError as e:
+                    codes.append(e.args[0])
+        self.assertEqual(codes, [429, 429])
+        self.assertEqual(self.sim.stats['throttled'], 2)
+
+    def test_drip(self):
+        self.sim.drip = (256, 0.01)
+        self.assertEqual(len(self.api.identities.all()), 10)
+        self.sim.drip = (256, 0.2)
+        self.api.set_timeout(1, 0.1)
+        with self.assertLogs('oxxapy.wire', 'WARNING'):
+            self.assertRaises(
+                OxxapyTransportError, self.api.identities.all)
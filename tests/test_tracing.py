@@ -0,0 +1,72 @@
+# vim: set ts=8 sw=4 sts=4 et ai tw=79:
+"""
+OXXA API Library in Python (oxxapy), licensed under the LGPLv3+.
+
+Copyright (C) 2021 Walter Doekes, OSSO B.V.
+
+See README.rst for more info.
+"""
+import json
+from io import StringIO
+from unittest import TestCase
+
+from oxxapy.tracing import OxxapyJsonLinesExporter, OxxapyTracer
+
+from bogo_oxxapy import DOMAIN_INF_NL, DOMAIN_LIST_NL, OxxapyWithResponse
+
+
+class _Collector:
+    def __init__(self):
+        self.started = []
+        self.ended = []
+
+    def on_start(self, span):
+        self.started.append(span)
+
+    def on_end(self, span):
+        self.ended.append(span)
+
+
+class OxxapyTracingTestCase(TestCase):
+    def test_hydration_spans(self):
+        api = OxxapyWithResponse()
+        api.push_reqresp(
+            dict(command='domain_list', records=-1), DOMAIN_LIST_NL)
+        for sld in ('example1', 'example2'):
+            api.push_reqresp(
+                dict(command='domain_inf', sld=sld, tld='nl'), DOMAIN_INF_NL)
+
+        collector, fp = _Collector(), StringIO()
+        tracer = OxxapyTracer(collector, OxxapyJsonLinesExporter(fp))
+        api.set_tracer(tracer)
+        with tracer.span('job') as job:
+            domains = list(api.domains.filter(reseller=api.resellers.none()))
+        self.assertEqual(len(domains), 2)
+
+        by_name = {}
+        for span in collector.ended:
+            by_name.setdefault(span.name, []).append(span)
+        filter_span = by_name['OxxapyDomains.filter'][0]
+        self.assertEqual(filter_span.parent_id, job.span_id)
+        self.assertEqual(
+            by_name['call domain_list'][0].parent_id, filter_span.span_id)
+        self.assertEqual(len(by_name['OxxapyDomain._update']), 2)
+        for update_span in by_name['OxxapyDomain._update']:
+            self.assertEqual(update_span.parent_id, filter_span.span_id)
+        for call_span in by_name['call domain_inf']:
+            self.assertIn(call_span.parent_id, [
+                i.span_id for i in by_name['OxxapyDomain._update']])
+            self.assertEqual(call_span.attrs['command'], 'domain_inf')
+            self.assertEqual(call_span.attrs['status'], 7)
+            self.assertEqual(call_span.trace_id, job.trace_id)
+
+        lines = [json.loads(i) for i in fp.getvalue().splitlines()]
+        self.assertEqual(len(lines), len(collector.ended))
+        self.assertEqual(lines[-1]['name'], 'job')
+        self.assertGreaterEqual(lines[-1]['duration'], 0)
+
+    def test_no_tracer(self):
+        api = OxxapyWithResponse()
+        api.push_reqresp(
+            dict(command='domain_list', records=-1), DOMAIN_LIST_NL)
+        self.assertEqual(len(list(api.domains.all())), 2)
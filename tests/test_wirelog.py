@@ -0,0 +1,82 @@
+# vim: set ts=8 sw=4 sts=4 et ai tw=79:
+"""
+OXXA API Library in Python (oxxapy), licensed under the LGPLv3+.
+
+Copyright (C) 2021 Walter Doekes, OSSO B.V.
+
+See README.rst for more info.
+"""
+import logging
+from unittest import TestCase
+
+from oxxapy.wirelog import decode_body, redact_body, redact_params
+
+from bogo_oxxapy import StaticXmlServer, _BogoOxxapy
+
+
+class OxxapyWireLoggerTestCase(TestCase):
+    def setUp(self):
+        self.server = StaticXmlServer()
+        self.api = _BogoOxxapy()
+        self.api._apiurl = self.server.url
+
+    def tearDown(self):
+        self.api.close()
+        self.server.close()
+
+    def _log_lines(self, calls):
+        logger = logging.getLogger('oxxapy.wire')
+        with self.assertLogs(logger, logging.DEBUG) as cm:
+            logger.debug('start')
+            for i in range(calls):
+                self.api.raw('domain_list', trans_epp='SECRET-EPP')
+        return cm.output[1:]
+
+    def test_redacted(self):
+        self.api.set_wire_logging(log_body=True)
+        lines = self._log_lines(1)
+        self.assertEqual(len(lines), 2)
+        self.assertIn("'command': 'domain_list'", lines[0])
+        self.assertIn("'trans_epp': '***'", lines[0])
+        self.assertIn('HTTP 200', lines[0])
+        self.assertIn('<domainname>example1.nl</domainname>', lines[1])
+
+        self.assertIn('apipassword=MD5', self.server.paths[0])
+        for line in lines:
+            self.assertNotIn('MD5', line)
+            self.assertNotIn('SECRET-EPP', line)
+
+    def test_sampling(self):
+        self.api.set_wire_logging(sample_every=2)
+        self.assertEqual(len(self._log_lines(4)), 2)
+        self.api.set_wire_logging(sample_every=0, slower_than_ms=0)
+        self.assertEqual(len(self._log_lines(3)), 3)
+        self.api.set_wire_logging(sample_every=0, slower_than_ms=60000)
+        self.assertEqual(len(self._log_lines(3)), 0)
+
+    def test_redact_params(self):
+        self.assertEqual(
+            redact_params({'apiuser': 'u', 'apipassword': 'p', 'sld': 'x'}),
+            {'apiuser': '***', 'apipassword': '***', 'sld': 'x'})
+        self.assertEqual(
+            redact_body('<item><epp>S3cr3t</epp><sld>x</sld></item>'),
+            '<item><epp>***</epp><sld>x</sld></item>')
+
+    def test_decode_body(self):
+        # The API sends ISO-8859-1, as the XML declaration says.
+        self.assertEqual(
+            decode_body(
+                b'<?xml version="1.0" encoding="ISO-8859-1" ?>\n'
+                b'<city>M\xfcnster</city>'),
+            '<?xml version="1.0" encoding="ISO-8859-1" ?>\n'
+            '<city>M\xfcnster</city>')
+        self.assertEqual(
+            decode_body('<city>M\xfcnster</city>'.encode('utf-8')),
+            '<city>M\xfcnster</city>')
+
+    def test_quiet_without_logging_config(self):
+        # Failures are WARNINGs; without a configured handler they must
+        # not reach stderr through logging.lastResort.
+        self.assertIn(logging.NullHandler, [
+            type(handler)
+            for handler in logging.getLogger('oxxapy.wire').handlers])
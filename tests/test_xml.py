@@ -10,7 +10,10 @@ from datetime import date
 from unittest import TestCase
 
 from oxxapy.exceptions import OxxapyApplicationError
-from oxxapy.response import ElementTree, _OxxapyXml
+from oxxapy.response import (
+    ElementTree, OxxapyResponse, _OxxapyXml, split_status_code)
+
+from bogo_oxxapy import order_xml
 
 
 class OxxapyXmlTestCase(TestCase):
@@ -62,3 +65,13 @@ class OxxapyXmlTestCase(TestCase):
         <identity><street>Weg der A &amp; B</street></identity>
         '''.encode('ascii')), req=None)
         self.assertEqual(xml.get_str_value('street'), 'Weg der A & B')
+
+    def test_status(self):
+        self.assertEqual(split_status_code('XMLOK18'), ('XMLOK', 18))
+        self.assertEqual(split_status_code('XMLERR 19'), ('XMLERR', 19))
+        self.assertRaises(NotImplementedError, split_status_code, 'OK 1')
+
+        order = OxxapyResponse.from_binstr(order_xml(
+            'transfer_status', 'XMLPEN 4', 'Transfer Pending'),
+            req=None).extract_order()
+        self.assertEqual(order.status, (None, 4, 'Transfer Pending'))